@@ -0,0 +1,76 @@
+"""
+Stress benchmark of Version, Range and VersionIndex shared by several threads
+
+Usage: python benchmarks/thread_scaling.py [seconds per thread count]
+
+Prints operations per second for increasing numbers of threads; throughput only scales
+with the thread count on free-threaded Python builds (3.13t and later).
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from semver_range import Range, ShardedCache, Version, VersionIndex  # noqa: E402
+
+
+def workload(seed):
+    rng = random.Random(seed)
+    versions = ['%d.%d.%d' % (rng.randrange(5), rng.randrange(10), rng.randrange(10)) for _ in range(500)]
+    patterns = ['^%d.%d.0' % (rng.randrange(5), rng.randrange(10)) for _ in range(50)]
+    patterns += ['~%d.%d || ^%d.0.0' % (rng.randrange(5), rng.randrange(10), rng.randrange(5)) for _ in range(50)]
+    return versions, patterns
+
+
+def run(threads, duration, versions, patterns):
+    index = VersionIndex(versions)
+    ranges = [Range(pattern, lazy=True) for pattern in patterns]
+    parsed = [Version(version) for version in versions]
+    cache = ShardedCache()
+    counts = [0] * threads
+    stop = threading.Event()
+    start = threading.Barrier(threads + 1)
+
+    def worker(n):
+        rng = random.Random(n)
+        start.wait()
+        count = 0
+        while not stop.is_set():
+            for _ in range(100):
+                version_range = rng.choice(ranges)
+                rng.choice(parsed) in version_range
+                index.highest_version(rng.choice(patterns))
+                pattern = rng.choice(patterns)
+                cache.get(pattern, lambda: Range(pattern))
+            count += 300
+        counts[n] = count
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    time.sleep(duration)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - began)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('Python %s, GIL %s' % (sys.version.split()[0], 'enabled' if gil else 'disabled'))
+    versions, patterns = workload(36)
+    baseline = None
+    for threads in (1, 2, 4, 8):
+        throughput = run(threads, duration, versions, patterns)
+        baseline = baseline or throughput
+        print('%d threads: %10.0f ops/s  (%.2fx)' % (threads, throughput, throughput / baseline))
+
+
+if __name__ == '__main__':
+    main()
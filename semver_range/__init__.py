@@ -0,0 +1,1531 @@
+import bisect
+import collections
+import enum
+import functools
+import heapq
+import itertools
+import operator
+import re
+import threading
+
+__version__ = '0.0.3'
+COMPILED_FORMAT = 1  # bump whenever the compiled form of ranges or its serialisation changes
+
+
+def parse_int(name, value, loose=False):
+    if not loose and value.startswith('0') and value != '0':
+        raise ValueError('%s has leading zeros' % name)
+    value = int(value)
+    if value < 0:
+        raise ValueError('%s is not a natural number' % name)
+    return value
+
+
+_NO_IDENTIFIERS = 1,
+
+
+def identifiers_key(identifiers):
+    """
+    Sort key for pre-release or build identifiers: an empty list sorts last,
+    numeric identifiers are compared numerically and sort before alphanumeric ones
+    """
+    if not identifiers:
+        return _NO_IDENTIFIERS
+    return 0, tuple((0, int(i)) if i.isdigit() else (1, i) for i in identifiers)
+
+
+def compare_identifiers(a, b, comparator='__eq__'):
+    return getattr(identifiers_key(a), comparator)(identifiers_key(b))
+
+
+class ParseError(enum.IntEnum):
+    """
+    Reasons for a version or range string being invalid
+    """
+    NOT_A_STRING = 1
+    EMPTY = 2
+    NOT_NUMERIC = 3
+    LEADING_ZERO = 4
+    INVALID_PRE_RELEASE = 5
+    INVALID_BUILD = 6
+    INVALID_SUFFIX = 7
+    INVALID_RANGE = 8
+
+
+_PARSE_ERROR_MESSAGES = {
+    ParseError.NOT_A_STRING: 'Invalid version %r',
+    ParseError.EMPTY: 'Empty version %r',
+    ParseError.NOT_NUMERIC: '%s does not contain numeric major, minor and patch versions',
+    ParseError.LEADING_ZERO: 'Major, minor or patch version has leading zeros in %s',
+    ParseError.INVALID_PRE_RELEASE: 'Pre-release version is invalid in %s',
+    ParseError.INVALID_BUILD: 'Build version is invalid in %s',
+    ParseError.INVALID_SUFFIX: 'Invalid version %s',
+    ParseError.INVALID_RANGE: 'Invalid range %s',
+}
+_NUMBER = r'(?:0|[1-9]\d*)'
+_PRE_RELEASE_IDENTIFIER = r'(?:%s|\d*[A-Za-z-][0-9A-Za-z-]*)' % _NUMBER
+_IDENTIFIERS = r'[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*'
+_STRICT_VERSION = re.compile(r'^(%s)\.(%s)\.(%s)(?:-(%s(?:\.%s)*))?(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?$' % (
+    _NUMBER, _NUMBER, _NUMBER, _PRE_RELEASE_IDENTIFIER, _PRE_RELEASE_IDENTIFIER
+))
+_VERSION = re.compile(r'^(\d+)\.(\d+)\.(\d+)(.*)$')
+_IDENTIFIER = re.compile(r'^[0-9A-Za-z-]+$')
+_INVALID_NUMERIC_IDENTIFIER = re.compile(r'^0\d+$')
+
+
+def _parse_version(version, loose=False):
+    """
+    Non-raising core of version parsing: returns (major, minor, patch, pre_release, build) or a ParseError
+    """
+    if not isinstance(version, str):
+        return ParseError.NOT_A_STRING
+    if not loose:
+        match = _STRICT_VERSION.match(version)
+        if match:
+            major, minor, patch, pre_release, build = match.groups()
+            return int(major), int(minor), int(patch), pre_release, build
+    else:
+        version = version.lstrip()
+        if version[:1] in ('v', '='):
+            version = version[1:].lstrip()
+    if not version:
+        return ParseError.EMPTY
+    match = _VERSION.match(version)
+    if not match:
+        return ParseError.NOT_NUMERIC
+    major, minor, patch, etc = match.groups()
+    if not loose and any(part[0] == '0' and part != '0' for part in (major, minor, patch)):
+        return ParseError.LEADING_ZERO
+    suffix = _parse_suffix(etc, loose)
+    if isinstance(suffix, ParseError):
+        return suffix
+    return (int(major), int(minor), int(patch)) + suffix
+
+
+def _parse_suffix(etc, loose):
+    # pre-release and build parts of a version or a ParseError
+    pre_release = build = None
+    if etc and loose and etc[0] not in ('-', '+'):
+        etc = '-' + etc
+    if etc.startswith('-'):
+        pre_release, plus, etc = etc[1:].partition('+')
+        etc = plus + etc
+        identifiers = pre_release.split('.')
+        if not pre_release or not all(map(_IDENTIFIER.match, identifiers)) or \
+                (not loose and any(map(_INVALID_NUMERIC_IDENTIFIER.match, identifiers))):
+            return ParseError.INVALID_PRE_RELEASE
+    if etc.startswith('+'):
+        build = etc[1:]
+        if not build or not all(map(_IDENTIFIER.match, build.split('.'))):
+            return ParseError.INVALID_BUILD
+    elif etc:
+        return ParseError.INVALID_SUFFIX
+    return pre_release, build
+
+
+# binary format helpers: unsigned LEB128 varints and length-prefixed utf-8 strings
+
+def _write_varint(out, value):
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _write_string(out, value):
+    value = value.encode('utf-8')
+    _write_varint(out, len(value))
+    out += value
+
+
+def _read_string(data, offset):
+    length, offset = _read_varint(data, offset)
+    end = offset + length
+    if end > len(data):
+        raise IndexError('string is truncated')
+    return bytes(data[offset:end]).decode('utf-8'), end
+
+
+def _write_identifiers_key(out, key):
+    if key == _NO_IDENTIFIERS:
+        _write_varint(out, 0)
+        return
+    _write_varint(out, len(key[1]))
+    for alphanumeric, identifier in key[1]:
+        if alphanumeric:
+            identifier = identifier.encode('ascii')
+            _write_varint(out, len(identifier) << 1 | 1)
+            out += identifier
+        else:
+            _write_varint(out, identifier << 1)
+
+
+def _read_identifiers_key(data, offset):
+    count, offset = _read_varint(data, offset)
+    if not count:
+        return _NO_IDENTIFIERS, offset
+    identifiers = []
+    for _ in range(count):
+        value, offset = _read_varint(data, offset)
+        if value & 1:
+            end = offset + (value >> 1)
+            identifiers.append((1, bytes(data[offset:end]).decode('ascii')))
+            offset = end
+        else:
+            identifiers.append((0, value >> 1))
+    return (0, tuple(identifiers)), offset
+
+
+def _from_bytes(cls, data, read):
+    # decodes a whole buffer with a class's _read method, reporting malformed data as ValueError
+    try:
+        value, offset = read(data, 0)
+    except (IndexError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('Invalid serialised %s: %s' % (cls.__name__, e))
+    if offset != len(data):
+        raise ValueError('Invalid serialised %s: unexpected trailing data' % cls.__name__)
+    return value
+
+
+@functools.total_ordering  # for stable sorting of versions
+class Version:
+    """
+    Implements Semantic Versioning 2.0.0
+    http://semver.org/spec/v2.0.0.html
+    """
+
+    @classmethod
+    def from_parts(cls, *parts):
+        if len(parts) == 3:
+            return cls('%s.%s.%s' % parts)
+        if len(parts) == 4:
+            return cls('%s.%s.%s-%s' % parts)
+        if len(parts) == 5:
+            if parts[3] is None and parts[4] is None:
+                return cls('%s.%s.%s' % parts[:3])
+            if parts[4] is None:
+                return cls('%s.%s.%s-%s' % parts[:4])
+            if parts[3] is None:
+                return cls('{0}.{1}.{2}+{4}'.format(*parts))
+            return cls('%s.%s.%s-%s+%s' % parts)
+        raise ValueError('Invalid version')
+
+    def __init__(self, version, loose=False):
+        parsed = _parse_version(version, loose=loose)
+        if isinstance(parsed, ParseError):
+            raise ValueError(_PARSE_ERROR_MESSAGES[parsed] % (version,))
+        self._set_parts(version, loose, parsed)
+
+    @classmethod
+    def _from_parsed(cls, version, loose, parts):
+        # creates a version from the result of _parse_version without parsing again
+        self = cls.__new__(cls)
+        self._set_parts(version, loose, parts)
+        return self
+
+    def _set_parts(self, version, loose, parts):
+        # versions are immutable, this is the only place assigning their attributes
+        set_attribute = object.__setattr__
+        set_attribute(self, 'version', version)
+        set_attribute(self, 'loose', loose)
+        for name, part in zip(('major', 'minor', 'patch', 'pre_release', 'build'), parts):
+            set_attribute(self, name, part)
+        set_attribute(self, '_key', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __str__(self):
+        if self.pre_release and self.build:
+            return '%d.%d.%d-%s+%s' % (self.major, self.minor, self.patch, self.pre_release, self.build)
+        if self.pre_release:
+            return '%d.%d.%d-%s' % (self.major, self.minor, self.patch, self.pre_release)
+        if self.build:
+            return '%d.%d.%d+%s' % (self.major, self.minor, self.patch, self.build)
+        return '%d.%d.%d' % (self.major, self.minor, self.patch)
+
+    def __repr__(self):
+        return '<Version "%s">' % self
+
+    @property
+    def is_stable(self):
+        return self.major > 0
+
+    @property
+    def pre_release_identifiers(self):
+        return self.pre_release.split('.') if self.pre_release else []
+
+    @property
+    def build_identifiers(self):
+        return self.build.split('.') if self.build else []
+
+    def increment(self, level):
+        if level == 'major':
+            return self.increment_major()
+        if level == 'minor':
+            return self.increment_minor()
+        if level == 'patch':
+            return self.increment_patch()
+        if level == 'premajor':
+            return self.increment_premajor()
+        if level == 'preminor':
+            return self.increment_preminor()
+        if level == 'prepatch' or (not self.pre_release and level == 'prerelease'):
+            return self.increment_prepatch()
+        if level == 'prerelease':
+            return self.increment_prerelease()
+        raise ValueError('Unknown level %s' % level)
+
+    def increment_major(self):
+        if self.pre_release and self.patch == 0:
+            # TODO: check pre-release incrementing
+            return self.from_parts(self.major, self.minor, self.patch)
+        return self.from_parts(self.major + 1, 0, 0)
+
+    def increment_minor(self):
+        if self.pre_release and self.patch == 0:
+            # TODO: check pre-release incrementing
+            return self.from_parts(self.major, self.minor, self.patch)
+        return self.from_parts(self.major, self.minor + 1, 0)
+
+    def increment_patch(self):
+        if self.pre_release:
+            return self.from_parts(self.major, self.minor, self.patch)
+        return self.from_parts(self.major, self.minor, self.patch + 1)
+
+    def increment_premajor(self):
+        return self.from_parts(self.major + 1, 0, 0, 0)
+
+    def increment_preminor(self):
+        return self.from_parts(self.major, self.minor + 1, 0, 0)
+
+    def increment_prepatch(self):
+        return self.from_parts(self.major, self.minor, self.patch + 1, 0)
+
+    def increment_prerelease(self):
+        if not self.pre_release:
+            return self.increment_prepatch()
+        pre = self.pre_release_identifiers
+        found_numeric = False
+        for i in range(len(pre) - 1, -1, -1):
+            if pre[i].isdigit():
+                pre[i] = str(int(pre[i]) + 1)
+                found_numeric = True
+                break
+        if not found_numeric:
+            pre.append('0')
+        return self.from_parts(self.major, self.minor, self.patch, '.'.join(pre))
+
+    def to_parts(self):
+        return self.major, self.minor, self.patch, self.pre_release, self.build
+
+    def __reduce__(self):
+        return self._from_parsed, (self.version, self.loose, self.to_parts())
+
+    def to_bytes(self):
+        """
+        Compact binary form, see from_bytes
+        """
+        out = bytearray(b'V')
+        self._write(out)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return _from_bytes(cls, data, cls._read)
+
+    def _write(self, out):
+        original = self.version != str(self)
+        out.append(self.loose | bool(self.pre_release) << 1 | bool(self.build) << 2 | original << 3)
+        _write_varint(out, self.major)
+        _write_varint(out, self.minor)
+        _write_varint(out, self.patch)
+        if self.pre_release:
+            _write_string(out, self.pre_release)
+        if self.build:
+            _write_string(out, self.build)
+        if original:
+            _write_string(out, self.version)
+
+    @classmethod
+    def _read(cls, data, offset, tagged=True):
+        if tagged:
+            if data[offset:offset + 1] != b'V':
+                raise ValueError('not a version')
+            offset += 1
+        flags = data[offset]
+        major, offset = _read_varint(data, offset + 1)
+        minor, offset = _read_varint(data, offset)
+        patch, offset = _read_varint(data, offset)
+        pre_release = build = version = None
+        if flags & 2:
+            pre_release, offset = _read_string(data, offset)
+        if flags & 4:
+            build, offset = _read_string(data, offset)
+        if flags & 8:
+            version, offset = _read_string(data, offset)
+        parts = major, minor, patch, pre_release, build
+        if version is None:
+            version = str(cls._from_parsed(None, False, parts))
+        return cls._from_parsed(version, bool(flags & 1), parts), offset
+
+    @property
+    def _sort_key(self):
+        # total ordering used by __eq__ and __lt__, includes pre_release and build versions
+        # NB: computed at most a few times when threads race, all results being equal
+        key = self._key
+        if key is None:
+            key = (
+                self.major, self.minor, self.patch,
+                identifiers_key(self.pre_release_identifiers), identifiers_key(self.build_identifiers),
+            )
+            object.__setattr__(self, '_key', key)
+        return key
+
+    @property
+    def without_build(self):
+        return self.from_parts(*self.to_parts()[:-1])
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __copy__(self):
+        return self.__class__(str(self), loose=self.loose)
+
+    def __eq__(self, other):
+        """
+        Strict equality considers pre_release and build versions
+        """
+        cls = type(self)
+        if isinstance(other, str):
+            other = cls(other, loose=self.loose)
+        elif not isinstance(other, cls):
+            raise TypeError('%r is not a version' % other)
+        return self._sort_key == other._sort_key
+
+    def __lt__(self, other):
+        """
+        Strict ordering considers pre_release and build versions
+        """
+        cls = type(self)
+        if isinstance(other, str):
+            other = cls(other, loose=self.loose)
+        elif not isinstance(other, cls):
+            raise TypeError('%r is not a version' % other)
+        return self._sort_key < other._sort_key
+
+    @property
+    def precedence_key(self):
+        """
+        Key for the looser ordering of has_same_precedence and precedes: (major, minor, patch, is not pre-release)
+        """
+        return self.major, self.minor, self.patch, not self.pre_release
+
+    def has_same_precedence(self, other):
+        """
+        A looser form of __eq__, build version is ignored and different pre_release versions are considered equal
+        """
+        cls = type(self)
+        if isinstance(other, str):
+            other = cls(other, loose=self.loose)
+        elif not isinstance(other, cls):
+            raise TypeError('%r is not a version' % other)
+        return self.precedence_key == other.precedence_key
+
+    def precedes(self, other):
+        """
+        A looser form of __lt__, build version is ignored and different pre_release versions are considered equal
+        """
+        cls = type(self)
+        if isinstance(other, str):
+            other = cls(other, loose=self.loose)
+        elif not isinstance(other, cls):
+            raise TypeError('%r is not a version' % other)
+        return self.precedence_key < other.precedence_key
+
+
+_OPERATORS = {
+    '__eq__': operator.eq,
+    '__ge__': operator.ge,
+    '__gt__': operator.gt,
+    '__lt__': operator.lt,
+    '__le__': operator.le,
+}
+_OPERATOR_CODES = (operator.eq, operator.ge, operator.gt, operator.lt, operator.le)  # for serialisation
+_OPERATOR_SYMBOLS = {
+    operator.eq: '',
+    operator.ge: '>=',
+    operator.gt: '>',
+    operator.lt: '<',
+    operator.le: '<=',
+}
+_INCLUSIVE_OPERATORS = {operator.eq, operator.ge, operator.le}
+_UPPER_OPERATORS = {operator.lt, operator.le}
+_LOWEST_PRE_RELEASE = 0, 0, 0, identifiers_key(['0']), _NO_IDENTIFIERS
+
+
+def _describe_key(key):
+    # inverse of Version._sort_key for comparator descriptions
+    version = '%d.%d.%d' % key[:3]
+    if key[3] != _NO_IDENTIFIERS:
+        version += '-' + '.'.join(str(identifier) for _, identifier in key[3][1])
+    if key[4] != _NO_IDENTIFIERS:
+        version += '+' + '.'.join(str(identifier) for _, identifier in key[4][1])
+    return version
+
+
+def _group_contains(group, version):
+    return _group_contains_key(group, version._sort_key)
+
+
+def _group_contains_key(group, key):
+    if key[3] != _NO_IDENTIFIERS:
+        # a pre-release only matches comparators with pre-releases of the same version, build is ignored
+        key = key[:4]
+        return any(
+            operator in _INCLUSIVE_OPERATORS and limit[3] != _NO_IDENTIFIERS and operator(key, limit[:4])
+            for operator, limit in group
+        )
+    return all(operator(key, limit) for operator, limit in group)
+
+
+def _ranges_contain(ranges, version):
+    return _ranges_contain_key(ranges, version._sort_key)
+
+
+def _ranges_contain_key(ranges, key):
+    for group in ranges:
+        if _group_contains_key(group, key):
+            return True
+    return False
+
+
+_X = r'[xX*]'
+_SIMPLE_VERSION = r'(?:%s\.%s\.%s(?:-%s(?:\.%s)*)?(?:\+%s)?|%s(?:\.%s)?(?:\.%s)?|%s\.%s(?:\.%s)?|%s)' % (
+    _NUMBER, _NUMBER, _NUMBER, _PRE_RELEASE_IDENTIFIER, _PRE_RELEASE_IDENTIFIER, _IDENTIFIERS,
+    _NUMBER, _NUMBER, _X, _NUMBER, _X, _X, _X
+)
+_SIMPLE_COMPARATOR = r'(?:\^|~>?|[<>]=?|=)?%s' % _SIMPLE_VERSION
+# a conservative subset of valid alternatives, those not matching are compiled eagerly in lazy ranges
+_SIMPLE_ALTERNATIVE = re.compile(r'^\s*(?:%s(?:\s+%s)*)?\s*$' % (_SIMPLE_COMPARATOR, _SIMPLE_COMPARATOR))
+
+
+_LOCKS = tuple(threading.Lock() for _ in range(64))
+
+
+def _lock_for(obj):
+    # shared pool of locks so that objects do not need one each
+    return _LOCKS[(id(obj) >> 4) % len(_LOCKS)]
+
+
+_MISSING = object()
+
+
+class ShardedCache:
+    """
+    Thread-safe mapping for interning parsed objects: reads do not lock and writes only lock one of several shards;
+    a shard is emptied once it holds max_size / shards items
+    """
+
+    def __init__(self, shards=16, max_size=None):
+        self._shards = tuple({} for _ in range(shards))
+        self._locks = tuple(threading.Lock() for _ in range(shards))
+        self._shard_size = max(1, max_size // shards) if max_size else None
+
+    def __len__(self):
+        return sum(map(len, self._shards))
+
+    def get(self, key, factory):
+        """
+        Returns the value cached for a key, calling factory() to create it when missing;
+        racing threads may both call the factory but all get the same value
+        """
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+        value = shard.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = factory()
+        with self._locks[index]:
+            if self._shard_size is not None and len(shard) >= self._shard_size:
+                shard.clear()
+            return shard.setdefault(key, value)
+
+    def clear(self):
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                shard.clear()
+
+
+class ComparatorSet(tuple):
+    """
+    One ||-separated group of a Range: a tuple of (operator, Version sort key) comparators that must all hold
+    """
+    __slots__ = ()
+
+    def __call__(self, version):
+        return _group_contains(self, version)
+
+    @property
+    def desc(self):
+        return ' '.join('%s%s' % (_OPERATOR_SYMBOLS[operator], _describe_key(limit)) for operator, limit in self)
+
+    @property
+    def extent(self):
+        """
+        Sort key of the lowest matching version and (sort key, inclusive) of the upper limit, None if unbounded,
+        ignoring build metadata; None if no version matches
+        """
+        lowest, highest = [], []
+        release = self._release_floor()
+        if _group_contains_key(self, release):
+            lowest.append(release)
+            highest.append(self._release_ceiling())
+        self._add_pre_release_limits(lowest, highest)
+        if not lowest:
+            return None
+        return min(lowest), None if None in highest else max(highest)
+
+    @property
+    def bounds(self):
+        """
+        Limits for searching sorted sort keys: a key below those of all matching versions, including ones with
+        build metadata, and (sort key, inclusive) above them, None if unbounded
+        """
+        # a release's build metadata sorts between its pre-releases and itself and pre-releases match regardless
+        # of theirs, so pre-release limits are cut to a prefix below and raised to no build metadata above
+        lowest, highest = [self._release_floor()[:3]], [self._release_ceiling()]
+        pre_release_lowest, pre_release_highest = [], []
+        self._add_pre_release_limits(pre_release_lowest, pre_release_highest)
+        lowest.extend(key[:4] for key in pre_release_lowest)
+        highest.extend(
+            None if limit is None else (limit[0][:4] + (_NO_IDENTIFIERS,), True) for limit in pre_release_highest
+        )
+        return min(lowest), None if None in highest else max(highest)
+
+    def _release_floor(self):
+        floor = 0, 0, 0, _NO_IDENTIFIERS, _NO_IDENTIFIERS
+        for comparison, limit in self:
+            if comparison in _UPPER_OPERATORS:
+                continue
+            release = limit[:3] + (_NO_IDENTIFIERS, _NO_IDENTIFIERS)
+            if comparison is operator.gt and limit[3] == _NO_IDENTIFIERS:
+                release = limit[0], limit[1], limit[2] + 1, _NO_IDENTIFIERS, _NO_IDENTIFIERS
+            floor = max(floor, release)
+        return floor
+
+    def _release_ceiling(self):
+        return min((
+            (limit, comparison is not operator.lt) for comparison, limit in self
+            if comparison in _UPPER_OPERATORS or comparison is operator.eq
+        ), default=None)
+
+    def _add_pre_release_limits(self, lowest, highest):
+        for comparison, limit in self:
+            # pre-releases match inclusive comparators with pre-releases regardless of the others
+            if comparison in _INCLUSIVE_OPERATORS and limit[3] != _NO_IDENTIFIERS:
+                lowest.append(_LOWEST_PRE_RELEASE if comparison is operator.le else limit)
+                highest.append(None if comparison is operator.ge else (limit, True))
+
+
+class Range:
+    """
+    Implements npm-style semantic version matching
+    https://docs.npmjs.com/misc/semver
+    """
+    identifier = r'[0-9A-Za-z-]+'
+    identifiers = r'%s(\.%s)*' % (identifier, identifier)
+    part = r'(\d+|x|X|\*)'
+    partial = r'%s+(\.%s(\.%s(\-%s)?(\+%s)?)?)?' % (part, part, part, identifiers, identifiers)
+    partial_loose = r'v?\s*%s+(\.%s(\.%s(\-?%s)?(\+%s)?)?)?' % (part, part, part, identifiers, identifiers)
+
+    __slots__ = ('pattern', 'loose', '_ranges', '_pending')
+
+    def __init__(self, pattern, loose=False, lazy=False):
+        """
+        With lazy=True, ||-separated alternatives that are certainly valid are only compiled
+        when needed to match a version
+        """
+        set_attribute = object.__setattr__
+        set_attribute(self, 'pattern', pattern)
+        set_attribute(self, 'loose', loose)
+        set_attribute(self, '_pending', None)
+        if not lazy:
+            set_attribute(self, '_ranges', self._sort_ranges(map(self._parse_range, pattern.split('||'))))
+            return
+        ranges, pending = [], []
+        for group in pattern.split('||'):
+            if _SIMPLE_ALTERNATIVE.match(group):
+                pending.append(group)
+            else:
+                ranges.append(self._parse_range(group))
+        set_attribute(self, '_ranges', self._sort_ranges(ranges))
+        set_attribute(self, '_pending', tuple(pending) or None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is immutable' % type(self).__name__)
+
+    @property
+    def ranges(self):
+        """
+        Compiled ||-separated groups of comparators
+        """
+        # NB: pending is an empty tuple once __contains__ compiled all alternatives but not in eager order
+        if self._pending is not None:
+            with _lock_for(self):
+                if self._pending is not None:
+                    ranges = self._sort_ranges(map(self._parse_range, self.pattern.split('||')))
+                    object.__setattr__(self, '_ranges', ranges)
+                    object.__setattr__(self, '_pending', None)
+        return self._ranges
+
+    def _contains_pending(self, version):
+        # compiles pending alternatives of a lazy range one at a time until one contains the version
+        with _lock_for(self):
+            if _ranges_contain(self._ranges, version):
+                # compiled by another thread after the caller checked
+                return True
+            while self._pending:
+                group = self._parse_range(self._pending[0])
+                object.__setattr__(self, '_ranges', self._ranges + (group,))
+                object.__setattr__(self, '_pending', self._pending[1:])
+                if _group_contains(group, version):
+                    return True
+            return False
+
+    @property
+    def _partial(self):
+        return self.partial_loose if self.loose else self.partial
+
+    def _parse_range(self, group):
+        group = self._expand_hyphen_ranges(group.strip() or '*')
+        group = self._expand_advanced_operators(group)
+        return self._create_comparators(group)
+
+    def _parse_partial_version(self, version):
+        # NB: allows partial versions, drops pre_release and build parts
+        blank = {'*', 'x', 'X'}
+        split_version = version
+        if self.loose and split_version.startswith('v'):
+            split_version = split_version[1:]
+        split_version = split_version.split('.', 2)
+        if len(split_version) == 3:
+            split_version[2] = re.sub(r'[+-].*$', '', split_version[2])
+            if self.loose:
+                split_version[2] = re.sub(r'^(\d+).*$', '\\1', split_version[2])
+
+        def parse(item):
+            part, name = item
+            if part in blank:
+                return None
+            return parse_int(name, part, loose=self.loose)
+
+        split_version = map(parse, zip(split_version, ('major', 'minor', 'patch')))
+        split_version = list(itertools.islice(itertools.chain(split_version, itertools.repeat(None)), 3))
+        incomplete = None
+        for i in range(3):
+            if split_version[i] is not None:
+                continue
+            incomplete = i
+            if any(subsequent is not None for subsequent in split_version[i + 1:]):
+                raise ValueError('Partial version %s is invalid' % version)
+            break
+        if incomplete is None:
+            split_version_zeroed = split_version
+        else:
+            split_version_zeroed = split_version[:incomplete] + [0] * (3 - incomplete)
+        return split_version_zeroed, incomplete
+
+    def _expand_hyphen_ranges(self, group):
+        def convert_limit(match, end):
+            version = match.group(end)
+            zeroed, incomplete = self._parse_partial_version(version)
+            if incomplete == 0:
+                if end == 'lower':
+                    version = '0.0.0'
+                else:
+                    version = '*.*.*'
+            elif incomplete is not None:
+                if end == 'higher':
+                    zeroed[incomplete - 1] += 1
+                version = '.'.join(map(str, zeroed))
+            if end == 'lower':
+                comparator = '>='
+            elif incomplete is None:
+                comparator = '<='
+            else:
+                comparator = '<'
+            return comparator, version
+
+        def hyphen_range(match):
+            lower_comparator, lower = convert_limit(match, 'lower')
+            higher_comparator, higher = convert_limit(match, 'higher')
+            if higher == '*.*.*':
+                return '%s%s' % (lower_comparator, lower)
+            return '%s%s %s%s' % (lower_comparator, lower, higher_comparator, higher)
+
+        return re.sub(
+            r'(?P<lower>%s)\s+-\s+(?P<higher>%s)' % (self._partial, self._partial),
+            hyphen_range,
+            group
+        )
+
+    def _expand_advanced_operators(self, group):
+        def advanced_operator(match):
+            operator = match.group('operator')
+            version = match.group('version')
+            version_max, incomplete = self._parse_partial_version(version)
+            version_min = version if incomplete is None else '.'.join(map(str, version_max))
+
+            if operator.startswith('~'):
+                if incomplete in (0, 1):
+                    version_max[0] += 1
+                    version_max[1] = 0
+                else:
+                    version_max[1] += 1
+                version_max[2] = 0
+                return '>=%s <%s' % (version_min, '.'.join(map(str, version_max)))
+
+            if operator == '^':
+                if incomplete == 0:
+                    # presumably ^* matches anything
+                    return '>=0.0.0'
+                elif version_max[0] != 0 or incomplete == 1:
+                    version_max[0] += 1
+                    version_max[1] = 0
+                    version_max[2] = 0
+                elif version_max[0] == 0 and (version_max[1] != 0 or incomplete == 2):
+                    version_max[1] += 1
+                    version_max[2] = 0
+                else:
+                    version_max[2] += 1
+                return '>=%s <%s' % (version_min, '.'.join(map(str, version_max)))
+
+            raise ValueError('Unknown operator %s' % operator)
+
+        return re.sub(
+            r'(?P<operator>~>?|\^)\s*(?P<version>%s)' % self._partial,
+            advanced_operator,
+            group
+        )
+
+    def _create_comparators(self, group):
+        group = re.sub(r'(<|>|<=|>=|=)\s+', r'\1', group)
+        comparators = []
+        for comparator in group.split():
+            if comparator.startswith('>='):
+                self._create_comparator(comparators, '__ge__', comparator[2:])
+            elif comparator.startswith('>'):
+                self._create_comparator(comparators, '__gt__', comparator[1:])
+            elif comparator.startswith('<='):
+                self._create_comparator(comparators, '__le__', comparator[2:])
+            elif comparator.startswith('<'):
+                self._create_comparator(comparators, '__lt__', comparator[1:])
+            elif comparator.startswith('='):
+                self._create_comparator(comparators, '__eq__', comparator[1:])
+            else:
+                self._create_comparator(comparators, '__eq__', comparator)
+        return ComparatorSet(self._sort_comparators(comparators))
+
+    def _create_comparator(self, comparators, operator, limit):
+        parsed = _parse_version(limit, loose=self.loose)
+        pre_release = None if isinstance(parsed, ParseError) else parsed[3]
+        limit, incomplete = self._parse_partial_version(limit)
+        if incomplete is not None:
+            pre_release = ''
+            operator, limit = self._adjust_comparator(comparators, operator, limit, incomplete)
+        limit = '.'.join(map(str, limit))
+        if pre_release:
+            limit = '%s-%s' % (limit, pre_release)
+        limit = Version(limit, loose=self.loose)
+        comparators.append((operator, limit))
+
+    def _adjust_comparator(self, comparators, operator, limit, incomplete):
+        if incomplete == 0:
+            # TODO: fix * handling so that comparator simplification can take it into account
+            return '__lt__' if operator in ('__lt__', '__gt__') else '__ge__', [0, 0, 0]
+        if operator in ('__lt__', '__le__'):
+            if operator == '__le__':
+                limit = self._increment_limit(limit, incomplete)
+            operator = '__lt__'
+        elif operator in ('__gt__', '__ge__'):
+            if operator == '__gt__':
+                limit = self._increment_limit(limit, incomplete)
+            operator = '__ge__'
+        elif operator == '__eq__':
+            if incomplete in (1, 2):
+                upper = self._increment_limit(limit, incomplete)
+                comparators.append(('__lt__', Version('.'.join(map(str, upper)), loose=self.loose)))
+            operator = '__ge__'
+        return operator, limit
+
+    def _increment_limit(self, limit, incomplete):
+        limit = limit.copy()
+        limit[incomplete - 1] += 1
+        for i in range(incomplete, 3):
+            limit[i] = 0
+        return limit
+
+    def _sort_comparators(self, comparators):
+        # TODO: simplify overlapping comparators
+        precedence = {
+            '__eq__': 0,
+            '__ge__': 1,
+            '__gt__': 2,
+            '__lt__': 3,
+            '__le__': 4,
+        }
+        comparators = sorted(comparators, key=lambda comparator: (comparator[1], precedence[comparator[0]]))
+        return [(_OPERATORS[operator], limit._sort_key) for operator, limit in comparators]
+
+    def _sort_ranges(self, ranges):
+        # TODO: improve de-duplication? e.g. when one range entirely covers another range's comparators
+        used_groups = set()
+        new_ranges = []
+        for group in ranges:
+            if group in used_groups:
+                continue
+            new_ranges.append(group)
+            used_groups.add(group)
+        return tuple(new_ranges)
+
+    def __str__(self):
+        # TODO: improve normalisation?
+        pattern = self.pattern.strip()
+        pattern = pattern.replace('||', ' || ')
+        pattern = pattern.replace('~>', '~')
+        pattern = re.sub(r'(<|>|<=|>=|=|\^|~)\s+', r'\1', pattern)
+        pattern = re.sub(r'\s+', ' ', pattern)
+        return pattern
+
+    def __repr__(self):
+        return '<Range "%s">' % self
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __copy__(self):
+        raise self.__class__(str(self), loose=self.loose)
+
+    @classmethod
+    def _from_parsed(cls, pattern, loose, ranges):
+        # creates a range from already compiled groups without parsing the pattern again
+        self = cls.__new__(cls)
+        set_attribute = object.__setattr__
+        set_attribute(self, 'pattern', pattern)
+        set_attribute(self, 'loose', loose)
+        set_attribute(self, '_ranges', tuple(ComparatorSet(
+            (_OPERATOR_CODES[code], limit) for code, limit in group
+        ) for group in ranges))
+        set_attribute(self, '_pending', None)
+        return self
+
+    def __reduce__(self):
+        ranges = tuple(tuple((_OPERATOR_CODES.index(comparison), limit) for comparison, limit in group)
+                       for group in self.ranges)
+        return self._from_parsed, (self.pattern, self.loose, ranges)
+
+    def to_bytes(self):
+        """
+        Compact binary form of the compiled range, see from_bytes
+        """
+        out = bytearray(b'R')
+        out.append(self.loose)
+        _write_string(out, self.pattern)
+        _write_varint(out, len(self.ranges))
+        for group in self.ranges:
+            _write_varint(out, len(group))
+            for comparison, limit in group:
+                out.append(_OPERATOR_CODES.index(comparison))
+                for part in limit[:3]:
+                    _write_varint(out, part)
+                _write_identifiers_key(out, limit[3])
+                _write_identifiers_key(out, limit[4])
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return _from_bytes(cls, data, cls._read)
+
+    @classmethod
+    def _read(cls, data, offset):
+        if data[offset:offset + 1] != b'R':
+            raise ValueError('not a range')
+        loose = bool(data[offset + 1])
+        pattern, offset = _read_string(data, offset + 2)
+        count, offset = _read_varint(data, offset)
+        ranges = []
+        for _ in range(count):
+            size, offset = _read_varint(data, offset)
+            group = []
+            for _ in range(size):
+                code = data[offset]
+                major, offset = _read_varint(data, offset + 1)
+                minor, offset = _read_varint(data, offset)
+                patch, offset = _read_varint(data, offset)
+                pre_release, offset = _read_identifiers_key(data, offset)
+                build, offset = _read_identifiers_key(data, offset)
+                group.append((code, (major, minor, patch, pre_release, build)))
+            ranges.append(group)
+        return cls._from_parsed(pattern, loose, ranges), offset
+
+    def __contains__(self, version):
+        if not isinstance(version, Version):
+            version = Version(version, loose=self.loose)
+        # NB: pending is read first, as compiling the last pending alternatives extends _ranges before clearing it
+        pending = self._pending
+        if _ranges_contain(self._ranges, version):
+            return True
+        return bool(pending) and self._contains_pending(version)
+
+    def __or__(self, other):
+        cls = type(self)
+        if isinstance(other, str):
+            other = cls(other)
+        elif not isinstance(other, cls):
+            raise TypeError('%r is not a range' % other)
+        return cls('%s||%s' % (self, other), loose=self.loose or other.loose)
+
+    def _extents(self):
+        return [extent for extent in (group.extent for group in self.ranges) if extent is not None]
+
+    def min_version(self):
+        """
+        Lowest version, without build metadata, that satisfies the range or None if none can, like npm's minVersion
+        """
+        keys = [lowest for lowest, _ in self._extents()]
+        if keys:
+            return Version(_describe_key(min(keys)), loose=self.loose)
+
+    def is_greater_than(self, version):
+        """
+        Whether the version is higher than any that can satisfy the range, like npm's gtr
+        """
+        if not isinstance(version, Version):
+            version = Version(version, loose=self.loose)
+        key = version._sort_key
+        return all(
+            highest is not None and (key > highest[0] or key == highest[0] and not highest[1])
+            for _, highest in self._extents()
+        )
+
+    def is_less_than(self, version):
+        """
+        Whether the version is lower than any that can satisfy the range, like npm's ltr
+        """
+        if not isinstance(version, Version):
+            version = Version(version, loose=self.loose)
+        key = version._sort_key
+        return all(key < lowest for lowest, _ in self._extents())
+
+    def outside(self, version, direction):
+        """
+        is_greater_than if direction is '>' or is_less_than if it is '<', like npm's outside
+        """
+        if direction == '>':
+            return self.is_greater_than(version)
+        if direction == '<':
+            return self.is_less_than(version)
+        raise ValueError('Direction must be > or <')
+
+    def lowest_version(self, versions):
+        versions = map(
+            lambda version: version if isinstance(version, Version) else Version(version, loose=self.loose),
+            versions
+        )
+        versions = sorted(filter(lambda version: version in self, versions))
+        if versions:
+            return versions[0]
+
+    def highest_version(self, versions):
+        versions = map(
+            lambda version: version if isinstance(version, Version) else Version(version, loose=self.loose),
+            versions
+        )
+        versions = sorted(filter(lambda version: version in self, versions))
+        if versions:
+            return versions[-1]
+
+    def top_satisfying(self, versions, k, highest=True):
+        """
+        The k highest (or lowest) versions satisfying the range, best first;
+        selected with a heap of at most k versions so any iterable can be consumed once
+        """
+        versions = map(
+            lambda version: version if isinstance(version, Version) else Version(version, loose=self.loose),
+            versions
+        )
+        select = heapq.nlargest if highest else heapq.nsmallest
+        return select(k, filter(self.__contains__, versions), key=_SORT_KEY)
+
+    def simplify(self, versions):
+        """
+        Shortest range matching the same of the given versions, like npm's simplifyRange: runs of consecutive
+        satisfying versions become pins, bounds or hyphen ranges; returns this range itself if that is not shorter
+        or, because of the pre-release rules, would not match exactly the same versions
+        """
+        versions = sorted(map(
+            lambda version: version if isinstance(version, Version) else Version(version, loose=self.loose),
+            versions
+        ), key=_SORT_KEY)
+        included = [version in self for version in versions]
+        simplified = type(self)(' || '.join(_simplified_alternatives(versions, included)), loose=self.loose)
+        if len(str(simplified)) >= len(str(self)) or [version in simplified for version in versions] != included:
+            return self
+        return simplified
+
+
+def _simplified_alternatives(versions, included):
+    runs, start = [], None
+    for i, inside in enumerate(included):
+        if inside and start is None:
+            start = i
+        elif not inside and start is not None:
+            runs.append((start, i - 1))
+            start = None
+    if start is not None:
+        runs.append((start, None))
+    for start, end in runs:
+        lowest = versions[start]
+        if end is None:
+            yield '*' if start == 0 else '>=%s' % lowest
+        elif versions[end] == lowest:
+            yield str(lowest)
+        elif start == 0:
+            yield '<=%s' % versions[end]
+        else:
+            yield '%s - %s' % (lowest, versions[end])
+
+
+_SORT_KEY = operator.attrgetter('_sort_key')
+
+
+def parse_versions_many(strings, loose=False):
+    """
+    Parses version strings without raising exceptions, returning parallel lists
+    of Versions and ParseErrors with None in place of whichever is missing
+    """
+    versions, errors = [], []
+    parse, create = _parse_version, Version._from_parsed
+    for string in strings:
+        parsed = parse(string, loose)
+        if isinstance(parsed, ParseError):
+            versions.append(None)
+            errors.append(parsed)
+        else:
+            versions.append(create(string, loose, parsed))
+            errors.append(None)
+    return versions, errors
+
+
+def parse_ranges_many(patterns, loose=False):
+    """
+    Parses range patterns without raising exceptions, returning parallel lists
+    of Ranges and ParseErrors with None in place of whichever is missing; identical patterns share a Range
+    """
+    ranges, errors, parsed = [], [], {}
+    for pattern in patterns:
+        if not isinstance(pattern, str):
+            ranges.append(None)
+            errors.append(ParseError.NOT_A_STRING)
+            continue
+        if pattern not in parsed:
+            try:
+                parsed[pattern] = Range(pattern, loose=loose)
+            except ValueError:
+                parsed[pattern] = ParseError.INVALID_RANGE
+        result = parsed[pattern]
+        if isinstance(result, ParseError):
+            ranges.append(None)
+            errors.append(result)
+        else:
+            ranges.append(result)
+            errors.append(None)
+    return ranges, errors
+
+
+def _pre_release_channel(version):
+    # pre-release identifiers before the first numeric one, e.g. "beta" for 2.0.0-beta.3
+    if not version.pre_release:
+        return None
+    return '.'.join(itertools.takewhile(lambda identifier: not identifier.isdigit(), version.pre_release_identifiers))
+
+
+_RELEASE_LINES = {
+    'major': operator.attrgetter('major'),
+    'minor': operator.attrgetter('major', 'minor'),
+    'prerelease': _pre_release_channel,
+}
+
+
+def group_latest(versions, by='minor', include_prerelease=False, loose=False):
+    """
+    Latest version of each release line in one pass, as an OrderedDict from oldest to newest line keyed by
+    major for by='major', (major, minor) for by='minor' or pre-release channel, e.g. "beta", for by='prerelease'
+    with None for releases; pre-releases are skipped unless include_prerelease is set or grouping by channel
+    """
+    try:
+        line_of = _RELEASE_LINES[by]
+    except KeyError:
+        raise ValueError('Cannot group versions by %s' % by)
+    include_prerelease = include_prerelease or by == 'prerelease'
+    latest = {}
+    for version in versions:
+        if not isinstance(version, Version):
+            version = Version(version, loose=loose)
+        if version.pre_release and not include_prerelease:
+            continue
+        line = line_of(version)
+        best = latest.get(line)
+        if best is None or best._sort_key < version._sort_key:
+            latest[line] = version
+    return collections.OrderedDict(sorted(latest.items(), key=lambda item: item[1]._sort_key))
+
+
+_DUPLICATE_KEYS = {
+    None: None,
+    'strict': _SORT_KEY,
+    'precedence': operator.attrgetter('precedence_key'),
+    'release': operator.attrgetter('major', 'minor', 'patch'),
+}
+
+
+def unique(versions, by='strict', loose=False):
+    """
+    Versions (or version strings) without duplicates, keeping the first of each in their original order;
+    by='strict' compares pre-release and build versions, by='precedence' compares as has_same_precedence
+    and by='release' only compares major, minor and patch versions
+    """
+    if by not in _DUPLICATE_KEYS or by is None:
+        raise ValueError('Unknown deduplication %s' % by)
+    duplicate_key = _DUPLICATE_KEYS[by]
+    seen, unique_versions = set(), []
+    for version in versions:
+        if not isinstance(version, Version):
+            version = Version(version, loose=loose)
+        key = duplicate_key(version)
+        if key not in seen:
+            seen.add(key)
+            unique_versions.append(version)
+    return unique_versions
+
+
+def merge_sorted(*iterables, dedupe='strict', loose=False):
+    """
+    Lazily merges iterables of versions (or version strings) that are each already sorted, in precedence order;
+    dedupe='strict' drops versions equal to the previous one, dedupe='precedence' also drops those
+    with the same precedence according to has_same_precedence, dedupe='release' those with the same
+    major, minor and patch versions and dedupe=None keeps duplicates
+    """
+    if dedupe not in _DUPLICATE_KEYS:
+        raise ValueError('Unknown deduplication %s' % dedupe)
+    streams = [
+        map(lambda version: version if isinstance(version, Version) else Version(version, loose=loose), iterable)
+        for iterable in iterables
+    ]
+    merged = heapq.merge(*streams, key=_SORT_KEY)
+    duplicate_key = _DUPLICATE_KEYS[dedupe]
+    if duplicate_key is None:
+        return merged
+    # sorted duplicates are adjacent, the first of each run is kept
+    return (next(duplicates) for _, duplicates in itertools.groupby(merged, duplicate_key))
+
+
+def dump_versions(versions):
+    """
+    Serialises versions into one compact binary blob, see load_versions
+    """
+    versions = list(versions)
+    out = bytearray(b'S')
+    _write_varint(out, len(versions))
+    for version in versions:
+        version._write(out)
+    return bytes(out)
+
+
+def _read_versions(data, offset):
+    if data[offset:offset + 1] != b'S':
+        raise ValueError('not a version list')
+    count, offset = _read_varint(data, offset + 1)
+    versions = []
+    for _ in range(count):
+        version, offset = Version._read(data, offset, tagged=False)
+        versions.append(version)
+    return versions, offset
+
+
+def load_versions(data):
+    return _from_bytes(list, data, _read_versions)
+
+
+_UNKNOWN = object()
+
+
+def _search_keys(keys, ranges, highest):
+    # index of the lowest or highest key of a sorted sequence of sort keys that the ranges contain, or None:
+    # a binary search for the extent of each group, then a scan from its far end for the first match
+    found = None
+    for group in ranges:
+        start, end = _slice_keys(keys, group.bounds)
+        if found is not None:
+            start, end = (max(start, found + 1), end) if highest else (start, min(end, found))
+        indices = range(end - 1, start - 1, -1) if highest else range(start, end)
+        found = next((i for i in indices if _group_contains_key(group, keys[i])), found)
+    return found
+
+
+def _slice_keys(keys, bounds):
+    lowest, highest = bounds
+    start = bisect.bisect_left(keys, lowest)
+    if highest is None:
+        return start, len(keys)
+    limit, inclusive = highest
+    return start, (bisect.bisect_right if inclusive else bisect.bisect_left)(keys, limit)
+
+
+class VersionIndex:
+    """
+    Mutable sorted set of versions, e.g. of one package, that memoizes
+    the lowest and highest versions satisfying the max_ranges most recently memoized range patterns;
+    safe to share between threads, memoized answers are read without locking
+    """
+
+    def __init__(self, versions=(), loose=False, max_ranges=4096):
+        self.loose = loose
+        self.max_ranges = max_ranges
+        versions = sorted(map(self._coerce_version, versions), key=_SORT_KEY)
+        self._versions = []
+        self._keys = []
+        for version in versions:
+            if not self._keys or self._keys[-1] != version._sort_key:
+                self._versions.append(version)
+                self._keys.append(version._sort_key)
+        self._lock = threading.RLock()
+        self._ranges = ShardedCache(max_size=max_ranges)
+        # (pattern, loose) → (range, [lowest, highest]), either may be _UNKNOWN until queried
+        self._cache = collections.OrderedDict()
+
+    def _coerce_version(self, version):
+        if isinstance(version, Version):
+            return version
+        return Version(version, loose=self.loose)
+
+    def _coerce_range(self, version_range):
+        if isinstance(version_range, Range):
+            return version_range
+        if not isinstance(version_range, str):
+            raise TypeError('%r is not a range' % version_range)
+        return self._ranges.get(version_range, lambda: Range(version_range, loose=self.loose))
+
+    def __repr__(self):
+        return '<VersionIndex of %d versions>' % len(self)
+
+    def __len__(self):
+        return len(self._versions)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._versions))
+
+    def __reversed__(self):
+        with self._lock:
+            return reversed(list(self._versions))
+
+    def __contains__(self, version):
+        key = self._coerce_version(version)._sort_key
+        with self._lock:
+            i = bisect.bisect_left(self._keys, key)
+            return i < len(self._keys) and self._keys[i] == key
+
+    def add(self, version):
+        """
+        Inserts a version, updating only the memoized answers of ranges that contain it
+        """
+        version = self._coerce_version(version)
+        key = version._sort_key
+        with self._lock:
+            i = bisect.bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                return
+            self._keys.insert(i, key)
+            self._versions.insert(i, version)
+            for version_range, answers in self._cache.values():
+                if version not in version_range:
+                    continue
+                lowest, highest = answers
+                if lowest is not _UNKNOWN and (lowest is None or key < lowest._sort_key):
+                    answers[0] = version
+                if highest is not _UNKNOWN and (highest is None or key > highest._sort_key):
+                    answers[1] = version
+
+    def remove(self, version):
+        """
+        Removes a version, forgetting only the memoized answers that were this version
+        """
+        version = self._coerce_version(version)
+        key = version._sort_key
+        with self._lock:
+            i = bisect.bisect_left(self._keys, key)
+            if i == len(self._keys) or self._keys[i] != key:
+                raise KeyError(version)
+            del self._keys[i]
+            del self._versions[i]
+            for _, answers in self._cache.values():
+                for j, answer in enumerate(answers):
+                    if answer is not _UNKNOWN and answer is not None and answer._sort_key == key:
+                        answers[j] = _UNKNOWN
+
+    def discard(self, version):
+        try:
+            self.remove(version)
+        except KeyError:
+            pass
+
+    def _answers(self, version_range):
+        # memoized by pattern rather than by Range, as equal ranges are often parsed again
+        version_range = self._coerce_range(version_range)
+        key = version_range.pattern, version_range.loose
+        cached = self._cache.get(key)
+        if cached is None:
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is None:
+                    if len(self._cache) >= self.max_ranges:
+                        self._cache.popitem(last=False)
+                    cached = self._cache[key] = version_range, [_UNKNOWN, _UNKNOWN]
+        return cached
+
+    def _answer(self, version_range, which):
+        version_range, answers = self._answers(version_range)
+        answer = answers[which]
+        if answer is _UNKNOWN:
+            with self._lock:
+                answer = answers[which]
+                if answer is _UNKNOWN:
+                    answer = answers[which] = self._search(version_range, highest=bool(which))
+        return answer
+
+    def _search(self, version_range, highest):
+        found = _search_keys(self._keys, version_range.ranges, highest)
+        return None if found is None else self._versions[found]
+
+    def lowest_version(self, version_range):
+        return self._answer(version_range, 0)
+
+    def highest_version(self, version_range):
+        return self._answer(version_range, 1)
+
+    def latest(self, major=None, include_prerelease=False):
+        """
+        Highest version, or highest of a major version, skipping pre-releases unless include_prerelease is set
+        """
+        with self._lock:
+            keys = self._keys
+            end = len(keys) if major is None else bisect.bisect_left(keys, (major + 1,))
+            for i in range(end - 1, -1, -1):
+                if major is not None and keys[i][0] != major:
+                    break
+                if include_prerelease or keys[i][3] == _NO_IDENTIFIERS:
+                    return self._versions[i]
+        return None
+
+
+# NB: look-behinds follow the first digit so that the regex engine can skip ahead to digits
+_VERSION_TOKEN = r'(\d(?<![\d.]\d)\d{0,15})\.(\d{1,16})\.(\d{1,16})(?:-(%s))?(?:\+(%s))?(?!\d)' % (
+    _IDENTIFIERS, _IDENTIFIERS
+)
+_PARTIAL_VERSION_TOKEN = r'(\d(?<![\d.]\d)\d{0,15})(?:\.(\d{1,16}))?(?:\.(\d{1,16}))?(?:-%s)?(?:\+%s)?(?!\d)' % (
+    _IDENTIFIERS, _IDENTIFIERS
+)
+# like npm's coerce, a token may follow anything but a digit, e.g. the dot of ".5.6.7"
+_COERCE_TOKEN = re.compile(r'(\d(?<!\d\d)\d{0,15})(?:\.(\d{1,16}))?(?:\.(\d{1,16}))?(?!\d)')
+_SCANNERS = {
+    (str, False): re.compile(_VERSION_TOKEN),
+    (str, True): re.compile(_PARTIAL_VERSION_TOKEN),
+    (bytes, False): re.compile(_VERSION_TOKEN.encode('ascii')),
+    (bytes, True): re.compile(_PARTIAL_VERSION_TOKEN.encode('ascii')),
+}
+_MAX_TOKEN = 1024  # longer tokens are not recognised when split across chunks
+
+
+def _token_version(match, partial, cache=None):
+    token = match.group(0)
+    if cache is not None:
+        version = cache.get(token)
+        if version is not None:
+            return version
+        if len(cache) >= 4096:
+            cache.clear()
+        version = cache[token] = _token_version(match, partial)
+        return version
+    if isinstance(token, bytes):
+        token = token.decode('ascii')
+    if partial:
+        major, minor, patch = match.groups()
+        return Version('%d.%d.%d' % (int(major), int(minor or 0), int(patch or 0)))
+    return Version(token, loose=True)
+
+
+def coerce(text):
+    """
+    Like npm's semver.coerce: the first major[.minor[.patch]] found in a string as a Version
+    without pre-release or build parts, None if there is none or text is not a string; like npm,
+    numbers are coerced as their string
+    """
+    if isinstance(text, Version):
+        return text
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        text = str(text)
+    if not isinstance(text, str):
+        return None
+    match = _COERCE_TOKEN.search(text)
+    if match:
+        return _token_version(match, True)
+
+
+def scan_versions(source, chunk_size=1 << 20, partial=False):
+    """
+    Yields (offset, Version) for versions found in a text or binary file object or an iterable of
+    str or bytes chunks; offsets count characters or bytes respectively. With partial=True tokens
+    are coerced like coerce() does, otherwise only full versions including pre-release and build parts are found
+    """
+    if hasattr(source, 'read'):
+        source = iter(functools.partial(source.read, chunk_size), source.read(0))
+    buffer, base, pos, scanner, cache = None, 0, 0, None, {}  # logs tend to repeat the same versions
+    for chunk in source:
+        if scanner is None:
+            buffer, scanner = chunk[:0], _SCANNERS[type(chunk), partial]
+        buffer += chunk
+        deferred = None
+        for match in scanner.finditer(buffer, pos):
+            if len(buffer) - match.end() < 2:
+                # the token could continue in the next chunk
+                deferred = match.start()
+                break
+            yield base + match.start(), _token_version(match, partial, cache)
+            pos = match.end()
+        start = max(pos, len(buffer) - _MAX_TOKEN, 0)
+        if deferred is not None and deferred >= start:
+            start = deferred
+        context = 1 if start else 0  # one character is kept for the look-behind
+        buffer, base, pos = buffer[start - context:], base + start - context, context
+    if buffer:
+        for match in scanner.finditer(buffer, pos):
+            yield base + match.start(), _token_version(match, partial, cache)
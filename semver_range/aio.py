@@ -0,0 +1,200 @@
+"""
+asyncio front end for matching ranges against asynchronous package metadata sources
+"""
+import asyncio
+import collections
+
+from semver_range import Range, Version
+from semver_range.resolver import ResolutionError
+
+try:
+    _running_loop = asyncio.get_running_loop
+except AttributeError:  # Python < 3.7
+    _running_loop = asyncio.get_event_loop
+
+
+class MetadataCache:
+    """
+    Wraps an async metadata source with `versions(package)` and `dependencies(package, version)` coroutines,
+    limiting concurrent requests, sharing in-flight requests for the same key and caching parsed results.
+    May be used from one event loop after another, e.g. by successive asyncio.run calls; requests still in flight
+    on a previous loop are dropped and made again
+    """
+
+    def __init__(self, source, concurrency=8, loose=False):
+        self.source = source
+        self.concurrency = concurrency
+        self.loose = loose
+        self._loop = None
+        self._semaphore = None
+        self._ranges = {}
+        self._versions = {}
+        self._dependencies = {}
+
+    def range(self, pattern):
+        version_range = self._ranges.get(pattern)
+        if version_range is None:
+            version_range = self._ranges[pattern] = Range(pattern, loose=self.loose)
+        return version_range
+
+    def _bind_loop(self):
+        # the semaphore and futures belong to the loop they were created on: results are carried over
+        # to futures of the running loop and unfinished requests dropped
+        loop = _running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        for cache in (self._versions, self._dependencies):
+            for key, future in list(cache.items()):
+                del cache[key]
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    cache[key] = loop.create_future()
+                    cache[key].set_result(future.result())
+
+    def _request(self, cache, key, fetch):
+        self._bind_loop()
+        future = cache.get(key)
+        if future is None:
+            future = cache[key] = asyncio.ensure_future(fetch())
+
+            def forget_failure(done):
+                if cache.get(key) is done and (done.cancelled() or done.exception() is not None):
+                    del cache[key]
+
+            future.add_done_callback(forget_failure)
+        return future
+
+    async def _call(self, method, *args):
+        self._bind_loop()
+        async with self._semaphore:
+            return await method(*args)
+
+    def versions(self, package):
+        """
+        Future of a package's versions, highest first, mapped to the source's version strings
+        """
+        async def fetch():
+            candidates = {}
+            for version in await self._call(self.source.versions, package):
+                try:
+                    candidates[Version(version, loose=self.loose)] = version
+                except ValueError:
+                    continue
+            return collections.OrderedDict(
+                (version, candidates[version]) for version in sorted(candidates, reverse=True)
+            )
+
+        return self._request(self._versions, package, fetch)
+
+    def dependencies(self, package, version):
+        """
+        Future of a version's dependencies as a tuple of (package, Range) pairs
+        """
+        async def fetch():
+            source = (await self.versions(package))[version]
+            dependencies = await self._call(self.source.dependencies, package, source) or {}
+            return tuple((name, self.range(dependencies[name])) for name in sorted(dependencies))
+
+        return self._request(self._dependencies, (package, version), fetch)
+
+    async def highest_version(self, package, version_range):
+        if not isinstance(version_range, Range):
+            version_range = self.range(version_range)
+        # shielded as other callers may be waiting for the same request
+        for version in await asyncio.shield(self.versions(package)):
+            if version in version_range:
+                return version
+
+    def prefetch(self, package, version=None):
+        """
+        Starts fetching metadata without waiting for it
+        """
+        if version is None:
+            return self.versions(package)
+        return self.dependencies(package, version)
+
+
+def resolve_iter(source, requirements, concurrency=8, loose=False):
+    """
+    Returns an async iterator over the (package, Version) pairs needed by a mapping of package name → range
+    pattern, yielding each one as soon as it settles; like npm's nested installs, every requirement gets
+    its own highest satisfying version. Dependencies of chosen versions are fetched while other requirements
+    are still being matched and lists of their versions are prefetched as soon as they are known.
+    Use it as an async context manager, or await its aclose(), to cancel the remaining work when stopping early.
+    """
+    if not isinstance(source, MetadataCache):
+        source = MetadataCache(source, concurrency=concurrency, loose=loose)
+    return _Resolution(source, requirements)
+
+
+_IDLE = object()
+
+
+class _Resolution:
+    def __init__(self, cache, requirements):
+        self.cache = cache
+        self.requirements = requirements
+        self._queue = None
+        self._pending = 0
+        self._seen = set()
+        self._tasks = set()
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def aclose(self):
+        """
+        Cancels requirements that are still being settled
+        """
+        tasks = [task for task in self._tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def __anext__(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            for package in sorted(self.requirements):
+                self._require(package, self.requirements[package])
+        while self._pending or not self._queue.empty():
+            result = await self._queue.get()
+            if result is _IDLE:
+                continue
+            if isinstance(result, Exception):
+                await self.aclose()
+                raise result
+            return result
+        raise StopAsyncIteration
+
+    def _require(self, package, version_range):
+        self.cache.prefetch(package)
+        self._pending += 1
+        task = asyncio.ensure_future(self._settle(package, version_range))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _settle(self, package, version_range):
+        try:
+            version = await self.cache.highest_version(package, version_range)
+            if version is None:
+                raise ResolutionError('No version of %s satisfies %s' % (package, version_range))
+            if (package, version) not in self._seen:
+                self._seen.add((package, version))
+                dependencies = self.cache.prefetch(package, version)
+                self._queue.put_nowait((package, version))
+                for dependency, dependency_range in await asyncio.shield(dependencies):
+                    self._require(dependency, dependency_range)
+        except Exception as e:
+            self._queue.put_nowait(e)
+        finally:
+            self._pending -= 1
+            if not self._pending:
+                self._queue.put_nowait(_IDLE)
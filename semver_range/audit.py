@@ -0,0 +1,224 @@
+"""
+Auditing of versions installed according to npm lockfiles against the ranges declared by their dependents
+"""
+import collections
+import concurrent.futures
+import json
+import os
+
+from semver_range import Range, Version
+
+VIOLATION = 'violation'  # installed version does not satisfy the declared range
+LOOSE_MATCH = 'loose-match'  # satisfied only when the range and version are parsed loosely
+PRE_RELEASE = 'pre-release'  # installed pre-release is excluded only because the range does not opt into it
+MISSING = 'missing'  # required dependency is not installed
+UNSUPPORTED = 'unsupported'  # declared specifier is not a semver range, e.g. a git url or a dist-tag
+
+Finding = collections.namedtuple('Finding', 'kind file parent package declared installed')
+
+LOCKFILE_NAMES = ('npm-shrinkwrap.json', 'package-lock.json')
+NON_SEMVER_PREFIXES = ('file:', 'link:', 'git:', 'git+', 'github:', 'gitlab:', 'bitbucket:', 'http:', 'https:',
+                       'workspace:')
+
+
+class AuditReport:
+    def __init__(self):
+        self.files = 0
+        self.dependencies = 0
+        self.findings = []
+
+    def __repr__(self):
+        return '<AuditReport of %d dependencies in %d files with %d findings>' % (
+            self.dependencies, self.files, len(self.findings)
+        )
+
+    def by_kind(self, kind):
+        return [finding for finding in self.findings if finding.kind == kind]
+
+
+class Interner:
+    """
+    Shares parsed Range and Version objects between identical strings
+    """
+
+    def __init__(self):
+        self.ranges = {}
+        self.versions = {}
+
+    def range(self, pattern, loose=False):
+        key = pattern, loose
+        if key not in self.ranges:
+            try:
+                self.ranges[key] = Range(pattern, loose=loose)
+            except ValueError:
+                self.ranges[key] = None
+        return self.ranges[key]
+
+    def version(self, version, loose=False):
+        key = version, loose
+        if key not in self.versions:
+            try:
+                self.versions[key] = Version(version, loose=loose)
+            except ValueError:
+                self.versions[key] = None
+        return self.versions[key]
+
+    def classify(self, declared, installed):
+        """
+        Returns the kind of finding for an installed version of a declared range or None if it satisfies it
+        """
+        if declared.startswith('npm:'):
+            declared = declared.rpartition('@')[2]
+        if declared.startswith(NON_SEMVER_PREFIXES):
+            return UNSUPPORTED
+        version_range, version = self.range(declared), self.version(installed)
+        if version_range is not None and version is not None:
+            if version in version_range:
+                return None
+            if version.pre_release and _matches_pre_release(version_range, version):
+                return PRE_RELEASE
+        loose_range, loose_version = self.range(declared, loose=True), self.version(installed, loose=True)
+        if loose_range is None:
+            return UNSUPPORTED
+        if loose_version is not None and loose_version in loose_range:
+            return LOOSE_MATCH
+        return VIOLATION
+
+
+def _matches_pre_release(version_range, version):
+    # whether a pre-release satisfies all comparators of an alternative as if the range opted into pre-releases,
+    # like npm's includePrerelease; build metadata is ignored
+    key = version._sort_key[:4]
+    return any(all(operator(key, limit[:4]) for operator, limit in group) for group in version_range.ranges)
+
+
+def _classify_pairs(pairs, interner=None):
+    interner = Interner() if interner is None else interner
+    return [interner.classify(declared, installed) for declared, installed in pairs]
+
+
+def iter_dependencies(path):
+    """
+    Yields (parent location, package, declared range, installed version or None, optional) for every dependency
+    declared in a lockfile; `path` may also be a package.json or a directory next to a lockfile
+    """
+    lockfile = _find_lockfile(path)
+    with open(lockfile, encoding='utf-8') as f:
+        lock = json.load(f)
+    if 'packages' in lock:
+        packages = lock['packages']
+    else:
+        packages = _flatten_v1(lock.get('dependencies') or {})
+        manifest = os.path.join(os.path.dirname(lockfile), 'package.json')
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as f:
+                packages[''] = json.load(f)
+    for location, entry in packages.items():
+        for name, declared, optional in _declared(entry, root=not location):
+            installed = _locate(packages, location, name)
+            yield location, name, declared, installed, optional
+
+
+def _find_lockfile(path):
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    if os.path.basename(path) in LOCKFILE_NAMES:
+        return path
+    for name in LOCKFILE_NAMES:
+        lockfile = os.path.join(directory, name)
+        if os.path.exists(lockfile):
+            return lockfile
+    raise FileNotFoundError('No lockfile found for %s' % path)
+
+
+def _flatten_v1(dependencies, location=''):
+    # lockfile version 1 nests dependencies; this maps them to version 2 style package locations
+    packages = {}
+    stack = [(location, dependencies)]
+    while stack:
+        parent, dependencies = stack.pop()
+        for name, entry in dependencies.items():
+            child = '%snode_modules/%s' % (parent + '/' if parent else '', name)
+            packages[child] = {
+                'version': entry.get('version'),
+                'dependencies': entry.get('requires') or {},
+                'optional': entry.get('optional', False),
+            }
+            if entry.get('dependencies'):
+                stack.append((child, entry['dependencies']))
+    return packages
+
+
+def _declared(entry, root=False):
+    fields = ['dependencies', 'optionalDependencies', 'peerDependencies']
+    if root:
+        fields.append('devDependencies')
+    peer_meta = entry.get('peerDependenciesMeta') or {}
+    for field in fields:
+        for name, declared in sorted((entry.get(field) or {}).items()):
+            optional = field == 'optionalDependencies' or (
+                field == 'peerDependencies' and (peer_meta.get(name) or {}).get('optional', False)
+            )
+            yield name, declared, optional
+
+
+def _locate(packages, location, name):
+    # node's module resolution: nearest node_modules folder walking up from the dependent
+    while True:
+        candidate = '%snode_modules/%s' % (location + '/' if location else '', name)
+        entry = packages.get(candidate)
+        if entry is not None:
+            if entry.get('link'):
+                entry = packages.get(entry.get('resolved'), {})
+            return entry.get('version')
+        if not location:
+            return None
+        location = location.rpartition('/node_modules/')[0] if '/node_modules/' in location else ''
+
+
+def audit(paths, workers=None, batch_size=50000):
+    """
+    Audits lockfiles (or package.json files or directories next to them) and returns an AuditReport;
+    unique (declared range, installed version) pairs are evaluated once, in batches spread over
+    `workers` processes if given, otherwise sharing one Interner
+    """
+    report = AuditReport()
+    interner = Interner()
+    verdicts = {}  # (declared, installed) → kind of finding or None
+    buffered = []
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers else None
+    try:
+        for path in paths:
+            report.files += 1
+            for location, name, declared, installed, optional in iter_dependencies(path):
+                report.dependencies += 1
+                if installed is None:
+                    if not optional:
+                        report.findings.append(Finding(MISSING, path, location, name, declared, None))
+                    continue
+                buffered.append((path, location, name, declared, installed))
+                if len(buffered) >= batch_size:
+                    _flush(report, buffered, verdicts, executor, workers, interner)
+        _flush(report, buffered, verdicts, executor, workers, interner)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return report
+
+
+def _flush(report, buffered, verdicts, executor, workers, interner):
+    pairs = list(set(
+        (declared, installed) for _, _, _, declared, installed in buffered
+        if (declared, installed) not in verdicts
+    ))
+    if executor is None:
+        kinds = _classify_pairs(pairs, interner)
+    else:
+        chunk_size = max(1, len(pairs) // (workers * 4))
+        chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+        kinds = [kind for chunk in executor.map(_classify_pairs, chunks) for kind in chunk]
+    verdicts.update(zip(pairs, kinds))
+    for path, location, name, declared, installed in buffered:
+        kind = verdicts[declared, installed]
+        if kind is not None:
+            report.findings.append(Finding(kind, path, location, name, declared, installed))
+    del buffered[:]
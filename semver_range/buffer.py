@@ -0,0 +1,165 @@
+"""
+Parsing of newline-delimited version lists directly from bytes, bytearray, memoryview or mmap buffers
+"""
+import array
+import re
+
+from semver_range import (
+    _NO_IDENTIFIERS, _NUMBER, _PRE_RELEASE_IDENTIFIER, ParseError, Range, Version, _parse_version,
+    _ranges_contain_key, identifiers_key,
+)
+
+# a strictly valid version filling a line, optionally ending with a carriage return, or any other line
+_LINE = re.compile((
+    r'(?:(%s)\.(%s)\.(%s)(?:-(%s(?:\.%s)*))?(?:\+([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?\r?(?=\n|\Z)|[^\n]*)\n?' % (
+        _NUMBER, _NUMBER, _NUMBER, _PRE_RELEASE_IDENTIFIER, _PRE_RELEASE_IDENTIFIER
+    )
+).encode('ascii'))
+_MAX_COLUMN_VALUE = (1 << 64) - 1
+
+
+class VersionBuffer:
+    """
+    Versions of a newline-delimited buffer parsed in one pass without decoding it: major, minor and patch go into
+    integer columns and the spans of lines, pre-release and build parts into offset columns, so that str and
+    Version objects are only created for entries that are looked up. Blank lines are skipped and invalid ones
+    listed in `errors` as (offset, ParseError); the buffer, e.g. an mmap, must stay open while in use
+    """
+
+    def __init__(self, buffer, loose=False):
+        self.loose = loose
+        self.errors = []
+        self._buffer = buffer
+        self._numbers = array.array('Q')  # major, minor and patch of each version
+        self._spans = array.array('Q')  # start and end of each version and of its pre-release and build parts
+        self._parsed = {}  # index → (string, parts) of versions parsed from decoded lines, e.g. loose ones
+        for match in _LINE.finditer(buffer):
+            if match.start(1) < 0:
+                self._parse_line(match)
+            else:
+                self._add(match)
+
+    def _add(self, match):
+        _, (major_start, major_end), (minor_start, minor_end), (patch_start, patch_end), pre_release, build = match.regs
+        end = build[1] if build[1] > 0 else pre_release[1] if pre_release[1] > 0 else patch_end
+        if major_end - major_start > 19 or minor_end - minor_start > 19 or patch_end - patch_start > 19:
+            # the numbers may not fit the columns
+            string = bytes(self._buffer[major_start:end]).decode('ascii')
+            self._add_parsed(major_start, string, _parse_version(string))
+            return
+        self._numbers.extend(map(int, match.group(1, 2, 3)))
+        self._spans.extend((major_start, end) + (pre_release if pre_release[0] > 0 else (0, 0)) + (
+            build if build[0] > 0 else (0, 0)
+        ))
+
+    def _parse_line(self, match):
+        line = bytes(self._buffer[match.start():match.end()]).rstrip(b'\n')
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        if not line:
+            return
+        try:
+            string = line.decode('utf-8')
+        except UnicodeDecodeError:
+            self.errors.append((match.start(), ParseError.NOT_A_STRING))
+            return
+        parts = _parse_version(string, loose=self.loose)
+        if isinstance(parts, ParseError):
+            self.errors.append((match.start(), parts))
+        else:
+            self._add_parsed(match.start(), string, parts)
+
+    def _add_parsed(self, offset, string, parts):
+        self._parsed[len(self)] = string, parts
+        self._numbers.extend(min(number, _MAX_COLUMN_VALUE) for number in parts[:3])
+        self._spans.extend((offset, offset, 0, 0, 0, 0))
+
+    def __len__(self):
+        return len(self._numbers) // 3
+
+    def __repr__(self):
+        return '<VersionBuffer of %d versions and %d errors>' % (len(self), len(self.errors))
+
+    def _index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('version index out of range')
+        return index
+
+    def _text(self, start, end):
+        return bytes(self._buffer[start:end]).decode('ascii') if end > start else None
+
+    def offset(self, index):
+        """
+        Offset in the buffer of the line of a version
+        """
+        return self._spans[6 * self._index(index)]
+
+    def string(self, index):
+        """
+        Version string as written in the buffer
+        """
+        index = self._index(index)
+        if index in self._parsed:
+            return self._parsed[index][0]
+        return self._text(*self._spans[6 * index:6 * index + 2])
+
+    def parts(self, index):
+        """
+        Parts of a version, as Version.to_parts
+        """
+        index = self._index(index)
+        if index in self._parsed:
+            return self._parsed[index][1]
+        _, _, pre_release_start, pre_release_end, build_start, build_end = self._spans[6 * index:6 * index + 6]
+        return tuple(self._numbers[3 * index:3 * index + 3]) + (
+            self._text(pre_release_start, pre_release_end), self._text(build_start, build_end),
+        )
+
+    def key(self, index):
+        """
+        Sort key of a version, as Version._sort_key; releases are keyed from the columns alone
+        """
+        index = self._index(index)
+        if index not in self._parsed and self._spans[6 * index + 3] == self._spans[6 * index + 5] == 0:
+            return tuple(self._numbers[3 * index:3 * index + 3]) + (_NO_IDENTIFIERS, _NO_IDENTIFIERS)
+        major, minor, patch, pre_release, build = self.parts(index)
+        return (
+            major, minor, patch,
+            identifiers_key(pre_release.split('.')) if pre_release else _NO_IDENTIFIERS,
+            identifiers_key(build.split('.')) if build else _NO_IDENTIFIERS,
+        )
+
+    def __getitem__(self, index):
+        index = self._index(index)
+        return Version._from_parsed(self.string(index), self.loose, self.parts(index))
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def sorted_indices(self, reverse=False):
+        """
+        Indices of the versions in the order of their sort keys, stable for equal keys
+        """
+        return sorted(range(len(self)), key=self.key, reverse=reverse)
+
+    def _matching(self, version_range):
+        if not isinstance(version_range, Range):
+            version_range = Range(version_range, loose=self.loose)
+        ranges = version_range.ranges
+        return (index for index in range(len(self)) if _ranges_contain_key(ranges, self.key(index)))
+
+    def satisfying(self, version_range):
+        """
+        Versions satisfying a range, in buffer order
+        """
+        return map(self.__getitem__, self._matching(version_range))
+
+    def lowest_version(self, version_range):
+        index = min(self._matching(version_range), key=self.key, default=None)
+        return None if index is None else self[index]
+
+    def highest_version(self, version_range):
+        index = max(self._matching(version_range), key=self.key, default=None)
+        return None if index is None else self[index]
@@ -0,0 +1,344 @@
+"""
+Opt-in on-disk caches: compiled ranges for fast cold starts and matching results across runs
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import struct
+import tempfile
+import time
+
+from semver_range import COMPILED_FORMAT, Range, Version, __version__
+
+_MAGIC = b'SVRC'
+_HEADER = struct.Struct('<4sHH')  # magic, compiled format, length of library version
+_COUNTS = struct.Struct('<II')  # number of ranges, length of the pattern blob
+
+
+class RangeCache:
+    """
+    Maps (pattern, loose) to compiled Ranges, backed by a file that is memory-mapped on load
+    and decoded one range at a time on first use; files written by another library version
+    or compiled format are ignored and replaced on save
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._mmap = None
+        self._index = {}  # (pattern, loose) → (start, end) in the memory-mapped file
+        self._ranges = {}  # (pattern, loose) → Range
+        self._dirty = False
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.save()
+        self.close()
+
+    def __len__(self):
+        return len(self._index.keys() | self._ranges.keys())
+
+    def __contains__(self, key):
+        return key in self._ranges or key in self._index
+
+    def range(self, pattern, loose=False):
+        """
+        Returns the compiled range for a pattern, compiling and remembering it if it is not cached
+        """
+        key = pattern, loose
+        version_range = self._ranges.get(key)
+        if version_range is None:
+            if key in self._index:
+                start, end = self._index[key]
+                version_range = Range.from_bytes(self._mmap[start:end])
+            else:
+                version_range = Range(pattern, loose=loose)
+                self._dirty = True
+            self._ranges[key] = version_range
+        return version_range
+
+    def _load(self):
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        if os.fstat(self._file.fileno()).st_size < _HEADER.size:
+            self._dirty = True
+            return self.close()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            valid = self._read_index()
+        except (struct.error, UnicodeDecodeError, ValueError):
+            valid = False
+        if not valid:
+            # written by another version or corrupt
+            self._index = {}
+            self._dirty = True
+            self.close()
+
+    def _read_index(self):
+        magic, compiled_format, version_length = _HEADER.unpack_from(self._mmap)
+        offset = _HEADER.size + version_length
+        version = self._mmap[_HEADER.size:offset].decode('utf-8')
+        if magic != _MAGIC or compiled_format != COMPILED_FORMAT or version != __version__:
+            return False
+        count, patterns_length = _COUNTS.unpack_from(self._mmap, offset)
+        offset += _COUNTS.size
+        patterns = self._mmap[offset:offset + patterns_length].decode('utf-8').split('\0')
+        offset += patterns_length
+        loose = self._mmap[offset:offset + count]
+        offset += count
+        ends = struct.unpack_from('<%dI' % count, self._mmap, offset)
+        start = offset + 4 * count
+        if count and (len(patterns) != count or ends[-1] != len(self._mmap)):
+            raise ValueError('cache file is truncated')
+        for key, end in zip(zip(patterns, map(bool, loose)), ends):
+            self._index[key] = start, end
+            start = end
+        return True
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def save(self):
+        """
+        Atomically writes the cache file if any range was added or the file was stale
+        """
+        if not self._dirty:
+            return
+        # NB: patterns are stored separated by NUL characters which valid ranges cannot contain
+        keys = sorted(key for key in self._index.keys() | self._ranges.keys() if '\0' not in key[0])
+        data = [
+            self._mmap[slice(*self._index[key])] if key in self._index else self._ranges[key].to_bytes()
+            for key in keys
+        ]
+        header = self._header(keys)
+        end = len(header) + 4 * len(keys)
+        ends = []
+        for item in data:
+            end += len(item)
+            ends.append(end)
+        content = header + struct.pack('<%dI' % len(ends), *ends) + b''.join(data)
+        # a file cannot be replaced while it is mapped on Windows
+        self.close()
+        self._index = {}
+        try:
+            self._write(content)
+        except BaseException:
+            self._load()
+            raise
+        self._dirty = False
+        self._load()
+
+    def _header(self, keys):
+        version = __version__.encode('utf-8')
+        patterns = '\0'.join(pattern for pattern, _ in keys).encode('utf-8')
+        return b''.join([
+            _HEADER.pack(_MAGIC, COMPILED_FORMAT, len(version)), version,
+            _COUNTS.pack(len(keys), len(patterns)), patterns, bytes(loose for _, loose in keys),
+        ])
+
+    def _write(self, content):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temporary_path = tempfile.mkstemp(dir=directory, prefix='.range-cache-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary_path, self.path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+
+_DIGESTS = {}  # version string → its hash, as the same versions are looked up again and again
+_DIGEST_MODULUS = 1 << 128
+
+
+def _version_digest(version):
+    digest = _DIGESTS.get(version)
+    if digest is None:
+        if len(_DIGESTS) >= 1 << 16:
+            _DIGESTS.clear()
+        digest = _DIGESTS[version] = int.from_bytes(hashlib.sha256(version.encode('utf-8')).digest()[:16], 'big')
+    return digest
+
+
+def versions_digest(versions):
+    """
+    Content hash of versions (or version strings) independent of their order, computed in one pass without
+    sorting as a sum of hashes of each version; versions listed more than once count each time
+    """
+    return (sum(map(_version_digest, map(str, versions))) % _DIGEST_MODULUS).to_bytes(16, 'big')
+
+
+_LOWEST, _HIGHEST, _SATISFYING = range(3)
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS results ('
+    ' range TEXT NOT NULL, loose INTEGER NOT NULL, digest BLOB NOT NULL, query INTEGER NOT NULL,'
+    ' answer TEXT, used INTEGER NOT NULL, PRIMARY KEY (range, loose, digest, query)'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS results_used ON results (used)',
+)
+_USED = 'UPDATE results SET used = ? WHERE range = ? AND loose = ? AND digest = ? AND query = ?'
+_FLUSH_INTERVAL = 1.0  # seconds that hits may go unrecorded
+
+
+class ResultCache:
+    """
+    Persistent sqlite cache of lowest, highest and all satisfying versions, keyed by the compiled form
+    of a range and a digest of the candidate versions so that unchanged version lists skip matching, in any order;
+    the least recently used results beyond max_entries are evicted. Writes are committed in short transactions
+    so that several processes can share a file
+    """
+
+    def __init__(self, path, max_entries=100000, loose=False):
+        self.path = path
+        self.max_entries = max_entries
+        self.loose = loose
+        self.hits = self.misses = 0
+        self._ranges = {}  # pattern → (Range, canonical form)
+        self._connection = sqlite3.connect(path)
+        self._used = {}  # key → clock of hits not yet written
+        self._flushed = time.monotonic()
+        self._setup()
+        self._size, self._clock = self._connection.execute('SELECT COUNT(*), MAX(used) FROM results').fetchone()
+        self._clock = self._clock or 0
+
+    def _setup(self):
+        execute = self._connection.execute
+        execute('PRAGMA journal_mode=WAL')
+        execute('PRAGMA synchronous=NORMAL')
+        for statement in _SCHEMA:
+            execute(statement)
+        meta = dict(execute('SELECT key, value FROM meta'))
+        expected = {'format': str(COMPILED_FORMAT), 'version': __version__}
+        if meta != expected:
+            # results of another library version may differ
+            execute('DELETE FROM results')
+            execute('DELETE FROM meta')
+            self._connection.executemany('INSERT INTO meta VALUES (?, ?)', expected.items())
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return self._size
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def flush(self):
+        """
+        Writes when results were last used, which hits only record in memory
+        """
+        self._transaction()
+
+    def _transaction(self, *statements):
+        # writes pending uses and statements in one short transaction; results are only a cache, so writes
+        # that time out waiting for another process are rolled back and skipped rather than raised
+        used = [(clock,) + key for key, clock in self._used.items()]
+        self._used = {}
+        self._flushed = time.monotonic()
+        try:
+            with self._connection:
+                self._connection.executemany(_USED, used)
+                for statement, parameters in statements:
+                    self._connection.execute(statement, parameters)
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def _range(self, version_range):
+        if isinstance(version_range, Range):
+            return version_range, ' || '.join(group.desc for group in version_range.ranges)
+        cached = self._ranges.get(version_range)
+        if cached is None:
+            parsed = Range(version_range, loose=self.loose)
+            cached = self._ranges[version_range] = parsed, ' || '.join(group.desc for group in parsed.ranges)
+        return cached
+
+    def _answer(self, query, version_range, versions, compute):
+        version_range, canonical = self._range(version_range)
+        versions = list(versions)
+        key = canonical, version_range.loose, versions_digest(versions), query
+        self._clock += 1
+        row = self._connection.execute(
+            'SELECT answer FROM results WHERE range = ? AND loose = ? AND digest = ? AND query = ?', key
+        ).fetchone()
+        if row is not None:
+            self.hits += 1
+            self._used[key] = self._clock
+            if len(self._used) >= 1000 or time.monotonic() - self._flushed >= _FLUSH_INTERVAL:
+                self.flush()
+            return version_range, row[0]
+        self.misses += 1
+        answer = compute(version_range, versions)
+        # another process may have stored the same result meanwhile
+        if self._transaction(('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)', key + (answer, self._clock))):
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+        return version_range, answer
+
+    def _evict(self):
+        # evicts a tenth more than needed so that eviction is not repeated on every insert
+        keep = self.max_entries * 9 // 10
+        self._transaction((
+            'DELETE FROM results WHERE used <= (SELECT used FROM results ORDER BY used DESC LIMIT 1 OFFSET ?)', (keep,)
+        ))
+        self._size = self._connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def lowest_version(self, version_range, versions):
+        version_range, answer = self._answer(_LOWEST, version_range, versions, _lowest)
+        return None if answer is None else Version(answer, loose=version_range.loose)
+
+    def highest_version(self, version_range, versions):
+        version_range, answer = self._answer(_HIGHEST, version_range, versions, _highest)
+        return None if answer is None else Version(answer, loose=version_range.loose)
+
+    def satisfying(self, version_range, versions):
+        """
+        Versions satisfying the range, lowest first
+        """
+        version_range, answer = self._answer(_SATISFYING, version_range, versions, _satisfying)
+        return [Version(version, loose=version_range.loose) for version in answer.split('\n')] if answer else []
+
+
+# results are stored as canonical version strings, several separated by line breaks
+
+def _lowest(version_range, versions):
+    version = version_range.lowest_version(versions)
+    return None if version is None else str(version)
+
+
+def _highest(version_range, versions):
+    version = version_range.highest_version(versions)
+    return None if version is None else str(version)
+
+
+def _satisfying(version_range, versions):
+    versions = (
+        version if isinstance(version, Version) else Version(version, loose=version_range.loose)
+        for version in versions
+    )
+    return '\n'.join(str(version) for version in sorted(filter(version_range.__contains__, versions)))
@@ -0,0 +1,366 @@
+"""
+Long-running daemon that keeps parsed versions, compiled ranges and version indexes warm in memory
+for short-lived processes, serving requests over a Unix domain socket
+
+Every request is one line of JSON, an object with an "op" and its parameters, or an array of such objects
+to send a batch in one round trip; each is answered by one line with an object (or array of objects)
+holding either a "result" or an "error", and the request's "id" if it had one:
+
+    {"op": "satisfies", "version": "1.2.3", "range": "^1.0.0"}  →  {"result": true}
+    {"op": "max_satisfying", "versions": ["1.0.0", "1.5.0"], "range": "~1.0"}  →  {"result": "1.0.0"}
+    {"op": "max_satisfying", "index": "react", "range": "^16"}  →  {"result": "16.14.0"}
+    {"op": "sort", "versions": ["1.10.0", "1.2.0"]}  →  {"result": ["1.2.0", "1.10.0"]}
+    {"op": "increment", "version": "1.2.3", "level": "minor"}  →  {"result": "1.3.0"}
+
+Named version lists ("indexes") are read from a JSON file mapping names to lists of versions
+or added with the "load" operation; "reload", or SIGHUP sent to the daemon, swaps in fresh caches
+and re-reads the file while requests already in progress finish with the old ones.
+
+Usage: python -m semver_range.daemon SOCKET_PATH [--versions FILE] [--loose]
+"""
+import argparse
+import errno
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+from semver_range import Range, ShardedCache, Version, VersionIndex, __version__
+
+
+class DaemonError(ValueError):
+    pass
+
+
+class _WarmCaches:
+    # NB: indexes memoize answers by range pattern, so ranges parsed again after eviction do not add entries
+    def __init__(self, loose, named_versions, max_ranges):
+        self.loose = loose
+        self.max_ranges = max_ranges
+        self.versions = ShardedCache(max_size=1 << 16)
+        self.ranges = ShardedCache(max_size=max_ranges)
+        self.indexes = ShardedCache(max_size=1 << 10)  # tuple of inline versions → VersionIndex
+        self.named_indexes = dict(
+            (name, self.new_index(versions)) for name, versions in named_versions.items()
+        )
+
+    def new_index(self, versions):
+        return VersionIndex(map(self.version, versions), loose=self.loose, max_ranges=self.max_ranges)
+
+    def version(self, version):
+        if not isinstance(version, str):
+            raise DaemonError('%r is not a version string' % (version,))
+        return self.versions.get(version, lambda: Version(version, loose=self.loose))
+
+    def range(self, pattern):
+        if not isinstance(pattern, str):
+            raise DaemonError('%r is not a range string' % (pattern,))
+        return self.ranges.get(pattern, lambda: Range(pattern, loose=self.loose))
+
+    def index(self, request):
+        if 'index' in request:
+            try:
+                return self.named_indexes[request['index']]
+            except (KeyError, TypeError):
+                raise DaemonError('unknown index %r' % (request['index'],))
+        versions = tuple(request['versions'])
+        return self.indexes.get(versions, lambda: self.new_index(versions))
+
+
+class Daemon:
+    """
+    Answers line-delimited JSON requests from warm caches, each index memoizing answers for up to max_ranges
+    range patterns; serve() listens on a Unix domain socket
+    """
+
+    def __init__(self, versions_file=None, loose=False, max_ranges=1 << 12):
+        self.versions_file = versions_file
+        self.loose = loose
+        self.max_ranges = max_ranges
+        self._loaded = {}  # name → versions added with the "load" operation, kept across reloads
+        self._lock = threading.Lock()
+        self._caches = None
+        self.reload()
+
+    def reload(self):
+        """
+        Swaps in empty caches and re-reads the versions file, if any; the current caches are kept
+        if the file cannot be read
+        """
+        with self._lock:
+            named_versions = {}
+            if self.versions_file:
+                with open(self.versions_file, encoding='utf-8') as f:
+                    named_versions.update(json.load(f))
+            named_versions.update(self._loaded)
+            self._caches = _WarmCaches(self.loose, named_versions, self.max_ranges)
+            return len(named_versions)
+
+    def load(self, name, versions):
+        """
+        Adds or replaces a named list of versions
+        """
+        versions = list(versions)
+        with self._lock:
+            caches = self._caches
+            index = caches.new_index(versions)
+            self._loaded[name] = versions
+            caches.named_indexes[name] = index
+        return len(index)
+
+    def respond(self, line):
+        """
+        Returns the response line, without a line break, for a request line
+        """
+        try:
+            request = json.loads(line.decode('utf-8') if isinstance(line, bytes) else line)
+        except ValueError:
+            response = {'error': 'request is not valid JSON'}
+        else:
+            caches = self._caches  # a batch is answered from the same caches even if reloaded meanwhile
+            if isinstance(request, list):
+                response = [self._respond(caches, item) for item in request]
+            else:
+                response = self._respond(caches, request)
+        return json.dumps(response, separators=(',', ':')).encode('utf-8')
+
+    def _respond(self, caches, request):
+        if not isinstance(request, dict):
+            return {'error': 'request is not an object'}
+        response = {'id': request['id']} if 'id' in request else {}
+        try:
+            operation = _OPERATIONS.get(request.get('op'))
+            if operation is None:
+                raise DaemonError('unknown operation %r' % (request.get('op'),))
+            response['result'] = operation(self, caches, request)
+        except KeyError as e:
+            response['error'] = 'missing parameter %s' % e
+        except (TypeError, ValueError) as e:
+            response['error'] = str(e)
+        return response
+
+    def _satisfies(self, caches, request):
+        return caches.version(request['version']) in caches.range(request['range'])
+
+    def _max_satisfying(self, caches, request):
+        version = caches.index(request).highest_version(caches.range(request['range']))
+        return None if version is None else str(version)
+
+    def _min_satisfying(self, caches, request):
+        version = caches.index(request).lowest_version(caches.range(request['range']))
+        return None if version is None else str(version)
+
+    def _sort(self, caches, request):
+        return sorted(request['versions'], key=lambda version: caches.version(version)._sort_key,
+                      reverse=bool(request.get('reverse')))
+
+    def _increment(self, caches, request):
+        return str(caches.version(request['version']).increment(request['level']))
+
+    def _load(self, caches, request):
+        if not isinstance(request['name'], str):
+            raise DaemonError('index name must be a string')
+        return self.load(request['name'], request['versions'])
+
+    def _reload(self, caches, request):
+        try:
+            return self.reload()
+        except OSError as e:
+            raise DaemonError('cannot read versions file: %s' % e)
+
+    def _ping(self, caches, request):
+        return __version__
+
+    def serve(self, path):
+        """
+        Returns a threading server bound to a Unix domain socket at path, replacing a stale socket file;
+        call serve_forever() on it. Raises OSError if another daemon is listening at path
+        """
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                _unlink_stale_socket(path)
+        except FileNotFoundError:
+            pass
+        return DaemonServer(path, self)
+
+
+def _unlink_stale_socket(path):
+    # a socket file is only stale if nothing accepts connections on it
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    else:
+        raise OSError(errno.EADDRINUSE, 'A daemon is already listening on %s' % path)
+    finally:
+        probe.close()
+
+
+_OPERATIONS = {
+    'satisfies': Daemon._satisfies,
+    'max_satisfying': Daemon._max_satisfying,
+    'min_satisfying': Daemon._min_satisfying,
+    'sort': Daemon._sort,
+    'increment': Daemon._increment,
+    'load': Daemon._load,
+    'reload': Daemon._reload,
+    'ping': Daemon._ping,
+}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(self.server.daemon.respond(line) + b'\n')
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, daemon):
+        self.daemon = daemon
+        self._bound = False
+        super().__init__(path, _RequestHandler)
+
+    def server_bind(self):
+        super().server_bind()
+        self._bound = True
+
+    def server_close(self):
+        super().server_close()
+        if not self._bound:  # binding failed, the socket file is not ours
+            return
+        try:
+            os.unlink(self.server_address)
+        except FileNotFoundError:
+            pass
+
+
+class Client:
+    """
+    Connection to a daemon; safe to share between threads, which then take turns
+    """
+
+    def __init__(self, path, timeout=None):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(path)
+        except OSError:
+            self._socket.close()
+            raise
+        self._file = self._socket.makefile('rwb')
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def _exchange(self, payload):
+        with self._lock:
+            self._file.write(json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n')
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError('daemon closed the connection')
+        return json.loads(line.decode('utf-8'))
+
+    def request(self, op, **params):
+        """
+        Sends one request and returns its result, raising DaemonError if it failed
+        """
+        params['op'] = op
+        response = self._exchange(params)
+        if 'error' in response:
+            raise DaemonError(response['error'])
+        return response['result']
+
+    def batch(self, requests):
+        """
+        Sends (op, params) pairs in one round trip and returns their results in order;
+        failed requests are returned as DaemonError instances in place of results
+        """
+        payload = [dict(params, op=op, id=request_id) for (op, params), request_id in zip(requests, self._ids)]
+        if not payload:
+            return []
+        responses = self._exchange(payload)
+        if not isinstance(responses, list):
+            raise DaemonError(responses.get('error', 'unexpected response'))
+        return [
+            DaemonError(response['error']) if 'error' in response else response['result']
+            for response in responses
+        ]
+
+    def satisfies(self, version, version_range):
+        return self.request('satisfies', version=str(version), range=str(version_range))
+
+    def max_satisfying(self, versions, version_range):
+        """
+        Highest version satisfying a range from a list of versions or the name of an index loaded in the daemon
+        """
+        return self.request('max_satisfying', range=str(version_range), **_versions_param(versions))
+
+    def min_satisfying(self, versions, version_range):
+        return self.request('min_satisfying', range=str(version_range), **_versions_param(versions))
+
+    def sort(self, versions, reverse=False):
+        return self.request('sort', versions=list(map(str, versions)), reverse=reverse)
+
+    def increment(self, version, level):
+        return self.request('increment', version=str(version), level=level)
+
+    def load(self, name, versions):
+        return self.request('load', name=name, versions=list(map(str, versions)))
+
+    def reload(self):
+        return self.request('reload')
+
+
+def _versions_param(versions):
+    if isinstance(versions, str):
+        return {'index': versions}
+    return {'versions': list(map(str, versions))}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m semver_range.daemon', description=__doc__.split('\n\n')[0])
+    parser.add_argument('socket', help='path of the Unix domain socket to listen on')
+    parser.add_argument('--versions', help='JSON file mapping index names to lists of versions')
+    parser.add_argument('--loose', action='store_true', help='parse versions and ranges loosely')
+    args = parser.parse_args(args)
+
+    daemon = Daemon(args.versions, loose=args.loose)
+
+    def reload(signum, frame):
+        try:
+            daemon.reload()
+        except (OSError, ValueError) as e:
+            print('Reload failed: %s' % e, file=sys.stderr)
+
+    signal.signal(signal.SIGHUP, reload)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = daemon.serve(args.socket)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
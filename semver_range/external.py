@@ -0,0 +1,173 @@
+"""
+External merge sort of version strings, or (package name, version string) pairs, too many to sort in memory
+
+Entries are keyed by an order-preserving byte encoding of the version sort key, so that no Version objects
+are kept and only bytes are compared; chunks that fit a memory budget are sorted and spilled to temporary files
+as runs of marshalled blocks, which are then merged lazily with heapq.merge.
+"""
+import heapq
+import itertools
+import marshal
+import operator
+import os
+import sys
+import tempfile
+
+from semver_range import _NO_IDENTIFIERS, _PARSE_ERROR_MESSAGES, ParseError, Version, _parse_version, identifiers_key
+
+_BLOCK_SIZE = 4096  # entries per marshalled block of a run
+_KEY = operator.itemgetter(0)
+_ENTRY_OVERHEAD = sys.getsizeof((None, None)) + 8  # (key, entry) tuple and its slot in the chunk
+
+
+def _number_bytes(value):
+    # length-prefixed big-endian, so shorter numbers sort first
+    length = (value.bit_length() + 7) // 8
+    if length > 0xff:
+        raise ValueError('%d is too large to sort' % value)
+    return bytes((length,)) + value.to_bytes(length, 'big')
+
+
+_SMALL_NUMBERS = [_number_bytes(value) for value in range(0x100)]
+
+
+def _small_number_bytes(value):
+    return _SMALL_NUMBERS[value] if value < 0x100 else _number_bytes(value)
+
+
+def _identifiers_bytes(key):
+    # an empty list sorts last, the end of a list before any further identifier
+    if key == _NO_IDENTIFIERS:
+        return b'\x02'
+    encoded = [b'\x01']
+    for alphanumeric, identifier in key[1]:
+        if alphanumeric:
+            encoded.append(b'\x02' + identifier.encode('ascii') + b'\x00')
+        else:
+            encoded.append(b'\x01' + _small_number_bytes(identifier))
+    encoded.append(b'\x00')
+    return b''.join(encoded)
+
+
+def _parts_bytes(parts):
+    major, minor, patch, pre_release, build = parts
+    return b''.join((
+        _small_number_bytes(major), _small_number_bytes(minor), _small_number_bytes(patch),
+        _identifiers_bytes(identifiers_key(pre_release.split('.'))) if pre_release else b'\x02',
+        _identifiers_bytes(identifiers_key(build.split('.'))) if build else b'\x02',
+    ))
+
+
+def byte_key(version, loose=False):
+    """
+    Bytes that compare like the strict ordering of versions, for a Version or a version string
+    """
+    if isinstance(version, Version):
+        return _parts_bytes(version.to_parts())
+    parts = _parse_version(version, loose=loose)
+    if isinstance(parts, ParseError):
+        raise ValueError(_PARSE_ERROR_MESSAGES[parts] % (version,))
+    return _parts_bytes(parts)
+
+
+def _entry(entry, loose, keys):
+    # (key, entry, approximate size) with the package name, if any, escaped and terminated to sort before
+    # the version; keys memoizes the keys of version strings, which tend to repeat
+    if isinstance(entry, str):
+        key = keys.get(entry)
+        if key is None:
+            key = keys[entry] = byte_key(entry, loose=loose)
+        return key, entry, _ENTRY_OVERHEAD + sys.getsizeof(entry)
+    name, version = entry
+    entry = name, version
+    key = keys.get(version)
+    if key is None:
+        key = keys[version] = byte_key(version, loose=loose)
+    key = name.encode('utf-8').replace(b'\x00', b'\x00\xff') + b'\x00\x00' + key
+    return key, entry, _ENTRY_OVERHEAD + sys.getsizeof(entry) + sys.getsizeof(name) + sys.getsizeof(version)
+
+
+def _write_run(entries, path):
+    with open(path, 'wb') as f:
+        while True:
+            block = list(itertools.islice(entries, _BLOCK_SIZE))
+            if not block:
+                return path
+            marshal.dump(block, f)
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                block = marshal.load(f)
+            except EOFError:
+                return
+            yield from block
+
+
+def _merge(runs):
+    return heapq.merge(*map(_read_run, runs), key=_KEY)
+
+
+class _Runs:
+    # runs by level, each merged from fan_in runs of the level below; all runs of a level hold entries
+    # that came before those of lower levels, which keeps the sort stable
+    def __init__(self, directory, fan_in):
+        self.directory = directory
+        self.fan_in = fan_in
+        self.levels = [[]]
+        self._names = itertools.count()
+
+    def _merge_into(self, runs):
+        path = _write_run(_merge(runs), os.path.join(self.directory, 'run-%d' % next(self._names)))
+        for run in runs:
+            os.unlink(run)
+        return path
+
+    def spill(self, chunk):
+        chunk.sort(key=_KEY)
+        self.levels[0].append(_write_run(iter(chunk), os.path.join(self.directory, 'run-%d' % next(self._names))))
+        for level, runs in enumerate(self.levels):
+            if len(runs) < self.fan_in:
+                break
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+            self.levels[level + 1].append(self._merge_into(runs))
+            self.levels[level] = []
+
+    def merged(self):
+        runs = [run for runs in reversed(self.levels) for run in runs]
+        while len(runs) > self.fan_in:
+            runs[:self.fan_in] = [self._merge_into(runs[:self.fan_in])]
+        return _merge(runs)
+
+
+def external_sort(entries, memory=64 << 20, loose=False, unique=False, directory=None, fan_in=64):
+    """
+    Lazily sorts version strings or (package name, version string) pairs, by name and then version, keeping
+    entries with equal keys in order or, if unique, only the first; memory is the approximate budget in bytes
+    of a chunk sorted in memory, runs are spilled to a temporary directory inside directory (or the system's)
+    and at most fan_in runs, each buffering a block of entries, are merged at a time. Raises ValueError
+    for invalid versions
+    """
+    with tempfile.TemporaryDirectory(prefix='semver-sort-', dir=directory) as spill_directory:
+        runs = _Runs(spill_directory, max(fan_in, 2))
+        chunk, size, keys = [], 0, {}
+        for entry in entries:
+            key, entry, entry_size = _entry(entry, loose, keys)
+            chunk.append((key, entry))
+            size += entry_size + sys.getsizeof(key)
+            if size >= memory:
+                runs.spill(chunk)
+                chunk, size, keys = [], 0, {}
+        if any(runs.levels):
+            runs.spill(chunk)
+            merged = runs.merged()
+        else:
+            chunk.sort(key=_KEY)
+            merged = chunk
+        if unique:
+            merged = (next(duplicates) for _, duplicates in itertools.groupby(merged, _KEY))
+        for _, entry in merged:
+            yield entry
@@ -0,0 +1,351 @@
+"""
+Differential fuzzing of the optimised engines against the reference Range and Version semantics
+
+Seeded, grammar-driven generators produce version strings and range patterns biased towards the odd cases
+(partial versions, x-ranges, hyphen ranges, pre-releases and build metadata); every engine is checked
+against Range.__contains__, Range.highest_version/lowest_version and Version ordering on the same input
+and disagreements are reported with the input minimised.
+
+Usage: python -m semver_range.fuzz [--iterations N] [--seed N] [--engine NAME]
+"""
+import argparse
+import collections
+import pickle
+import random
+import sys
+
+from semver_range import (
+    ParseError, Range, Version, VersionIndex, _parse_version, merge_sorted, parse_ranges_many, parse_versions_many,
+)
+from semver_range.external import byte_key, external_sort
+from semver_range.shared import SharedVersions, shared_memory
+
+Case = collections.namedtuple('Case', 'pattern versions loose')
+Counterexample = collections.namedtuple('Counterexample', 'engine case expected actual')
+
+_NUMBERS = ('0', '1', '2', '3', '10')
+_PRE_RELEASES = ('0', '1', 'alpha', 'alpha.1', 'beta', 'beta.2', 'beta.11', 'rc.1', 'x.7.z.92')
+_BUILDS = ('1', 'build', 'build.5', 'sha.5114f85', '001')
+_BLANKS = ('x', 'X', '*')
+_OPERATORS = ('', '=', '<', '<=', '>', '>=', '~', '~>', '^')
+_MUTATIONS = ('01', '', '.', '-', '+', '..', 'a', ' ', '-0a', '+!', '.x')
+_MALFORMED_PARTIALS = ('x.1', '1.x.2', '01.2.3', '1.2.3.4', 'a', '1.2.3-', '1..2')
+
+
+def random_version(rng, loose=False):
+    """
+    A version string, occasionally with a pre-release, build metadata or, if loose, a prefix; pre-releases
+    often have build metadata as both change where a version sorts
+    """
+    version = '.'.join(rng.choice(_NUMBERS) for _ in range(3))
+    pre_release = rng.random() < 0.3
+    if pre_release:
+        version += '-' + rng.choice(_PRE_RELEASES)
+    if rng.random() < (0.4 if pre_release else 0.15):
+        version += '+' + rng.choice(_BUILDS)
+    if loose and rng.random() < 0.3:
+        version = rng.choice(('v', '=', ' v', '= ')) + version
+    return version
+
+
+def mutated_version(rng, loose=False):
+    """
+    A version string with a random edit, usually making it invalid
+    """
+    version = random_version(rng, loose=loose)
+    position = rng.randint(0, len(version))
+    return version[:position] + rng.choice(_MUTATIONS) + version[position + rng.randint(0, 2):]
+
+
+def random_partial(rng):
+    """
+    A possibly partial version as used in ranges, e.g. 1.x or 2.0.*
+    """
+    if rng.random() < 0.02:
+        return rng.choice(_MALFORMED_PARTIALS)
+    given = rng.choice((0, 1, 2, 3, 3, 3))
+    if not given:
+        return rng.choice(_BLANKS)
+    parts = [rng.choice(_NUMBERS) for _ in range(given)]
+    if given < 3 and rng.random() < 0.5:
+        parts += [rng.choice(_BLANKS)] * rng.randint(1, 3 - given)
+    partial = '.'.join(parts)
+    if given == 3 and rng.random() < 0.25:
+        partial += '-' + rng.choice(_PRE_RELEASES)
+    return partial
+
+
+def random_range(rng):
+    """
+    A range pattern of up to three ||-separated alternatives of comparators or hyphen ranges
+    """
+    alternatives = []
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.15:
+            alternatives.append('%s - %s' % (random_partial(rng), random_partial(rng)))
+            continue
+        comparators = []
+        for _ in range(rng.randint(0, 3)):
+            operator = rng.choice(_OPERATORS)
+            comparators.append(operator + (' ' if operator and rng.random() < 0.1 else '') + random_partial(rng))
+        alternatives.append(' '.join(comparators))
+    return rng.choice(('||', ' || ')).join(alternatives)
+
+
+def random_case(rng, pool_size=12):
+    loose = rng.random() < 0.2
+    versions = [random_version(rng, loose=loose) for _ in range(pool_size)]
+    versions += [mutated_version(rng, loose=loose) for _ in range(rng.randint(0, 2))]
+    return Case(random_range(rng), versions, loose)
+
+
+def _outcome(function, *args):
+    # result of a function or ValueError if its input was invalid
+    try:
+        return function(*args)
+    except ValueError:
+        return ValueError
+
+
+def _versions(case):
+    # versions of a case that are valid, as the reference Version parses them
+    return [version for version in map(lambda version: _outcome(Version, version, case.loose), case.versions)
+            if version is not ValueError]
+
+
+def _reference_matches(case):
+    version_range = Range(case.pattern, loose=case.loose)
+    return [version in version_range for version in _versions(case)]
+
+
+def _compare(expected, actual):
+    try:
+        if expected == actual:
+            return None
+    except TypeError:  # versions do not compare with None
+        pass
+    return expected, actual
+
+
+def check_lazy(case):
+    def lazy():
+        version_range = Range(case.pattern, loose=case.loose, lazy=True)
+        matches = [version in version_range for version in _versions(case)]
+        if version_range.ranges != Range(case.pattern, loose=case.loose).ranges:
+            return 'compiled groups differ from eager compilation'
+        return matches
+
+    return _compare(_outcome(_reference_matches, case), _outcome(lazy))
+
+
+def check_compiled(case):
+    """
+    Ranges rebuilt from their binary and pickled forms and parsed in batches
+    """
+    def round_trips():
+        version_range = Range(case.pattern, loose=case.loose)
+        copies = [Range.from_bytes(version_range.to_bytes()), pickle.loads(pickle.dumps(version_range))]
+        (batched,), (error,) = parse_ranges_many([case.pattern], loose=case.loose)
+        if error is not None:
+            raise ValueError(error)
+        copies.append(batched)
+        results = [[version in copy for version in _versions(case)] for copy in copies]
+        return results[0] if all(result == results[0] for result in results) else results
+
+    return _compare(_outcome(_reference_matches, case), _outcome(round_trips))
+
+
+def _reference_extremes(case):
+    version_range = Range(case.pattern, loose=case.loose)
+    versions = _versions(case)
+    return version_range.lowest_version(versions), version_range.highest_version(versions)
+
+
+def check_indexed(case):
+    """
+    VersionIndex and top_satisfying answers
+    """
+    def indexed():
+        version_range = Range(case.pattern, loose=case.loose)
+        index = VersionIndex(_versions(case), loose=case.loose)
+        answers = index.lowest_version(version_range), index.highest_version(version_range)
+        top = version_range.top_satisfying(_versions(case), 1, highest=False), version_range.top_satisfying(
+            _versions(case), 1
+        )
+        if _compare(tuple([] if answer is None else [answer] for answer in answers), top):
+            return 'top_satisfying %s differs from VersionIndex %s' % (top, answers)
+        return answers
+
+    return _compare(_outcome(_reference_extremes, case), _outcome(indexed))
+
+
+def check_vectorized(case):
+    """
+    Matching on shared memory columns, when available
+    """
+    if shared_memory is None:
+        return None
+
+    def vectorized():
+        version_range = Range(case.pattern, loose=case.loose)
+        with SharedVersions.create(_versions(case)) as shared:
+            return shared.lowest_version(version_range), shared.highest_version(version_range)
+
+    return _compare(_outcome(_reference_extremes, case), _outcome(vectorized))
+
+
+def check_interval(case):
+    """
+    min_version, is_greater_than and is_less_than computed from bounds must agree with the versions that match;
+    like them, this ignores versions with build metadata
+    """
+    def violations():
+        version_range = Range(case.pattern, loose=case.loose)
+        versions = [version for version in _versions(case) if not version.build]
+        matching = [version for version in versions if version in version_range]
+        found = []
+        lowest = version_range.min_version()
+        if matching and (lowest is None or lowest not in version_range or lowest > min(matching)):
+            found.append('min_version %s' % lowest)
+        for version in versions:
+            if version_range.is_greater_than(version) and any(match >= version for match in matching):
+                found.append('is_greater_than %s' % version)
+            if version_range.is_less_than(version) and any(match <= version for match in matching):
+                found.append('is_less_than %s' % version)
+        return found
+
+    expected = ValueError if _outcome(Range, case.pattern, case.loose) is ValueError else []
+    return _compare(expected, _outcome(violations))
+
+
+def check_ordering(case):
+    """
+    Sorting and merging by sort keys, and externally by byte keys, must agree with the rich comparisons of Version
+    """
+    versions = _versions(case)
+    expected = []
+    for version in versions:
+        position = len(expected)
+        while position and version < expected[position - 1]:
+            position -= 1
+        expected.insert(position, version)
+    strict = [version for i, version in enumerate(expected) if not i or expected[i - 1] != version]
+    precedence = []
+    for version in expected:
+        if not precedence or not precedence[-1].has_same_precedence(version):
+            precedence.append(version)
+    halves = sorted(versions[::2]), sorted(versions[1::2])
+    actual = (sorted(versions), list(merge_sorted(*halves)), list(merge_sorted(*halves, dedupe='precedence')))
+    externally = [Version(version, loose=case.loose) for version in external_sort(
+        map(str, versions), memory=1000, loose=case.loose, fan_in=2
+    )]
+    by_byte_keys = sorted(versions, key=byte_key)
+    return _compare((expected, strict, precedence, expected, expected), actual + (externally, by_byte_keys))
+
+
+def check_parser(case):
+    """
+    Batch and strict fast path parsing must agree with Version, including on invalid strings
+    """
+    expected, actual = [], []
+    versions, errors = parse_versions_many(case.versions, loose=case.loose)
+    for string, version, error in zip(case.versions, versions, errors):
+        expected.append(_outcome(lambda: Version(string, loose=case.loose).to_parts()))
+        actual.append(ValueError if error is not None else version.to_parts())
+        if error is not None and not isinstance(error, ParseError):
+            actual[-1] = 'not a ParseError: %r' % (error,)
+        elif not case.loose and error is None and _parse_version(string, loose=True) != version.to_parts():
+            actual[-1] = 'loose parsing differs: %s' % (_parse_version(string, loose=True),)
+    return _compare(expected, actual)
+
+
+ENGINES = collections.OrderedDict([
+    ('lazy', check_lazy),
+    ('compiled', check_compiled),
+    ('indexed', check_indexed),
+    ('vectorized', check_vectorized),
+    ('interval', check_interval),
+    ('ordering', check_ordering),
+    ('parser', check_parser),
+])
+
+
+def _failure(check, case):
+    try:
+        return check(case)
+    except Exception as e:
+        return None, '%s: %s' % (type(e).__name__, e)
+
+
+def _reductions(case):
+    # smaller cases to try, simplest changes first
+    if case.loose:
+        yield case._replace(loose=False)
+    for i in range(len(case.versions)):
+        yield case._replace(versions=case.versions[:i] + case.versions[i + 1:])
+    alternatives = case.pattern.split('||')
+    for i in range(len(alternatives)):
+        if len(alternatives) > 1:
+            yield case._replace(pattern='||'.join(alternatives[:i] + alternatives[i + 1:]))
+        tokens = alternatives[i].split()
+        for j in range(len(tokens)):
+            alternative = ' '.join(tokens[:j] + tokens[j + 1:])
+            yield case._replace(pattern='||'.join(alternatives[:i] + [alternative] + alternatives[i + 1:]))
+    for i, version in enumerate(case.versions):
+        for separator in ('+', '-'):
+            if separator in version:
+                yield case._replace(versions=case.versions[:i] + [version.split(separator)[0]] + case.versions[i + 1:])
+
+
+def minimise(check, case):
+    """
+    Greedily shrinks a failing case while the check still fails
+    """
+    reduced = True
+    while reduced:
+        reduced = False
+        for candidate in _reductions(case):
+            if _failure(check, candidate) is not None:
+                case, reduced = candidate, True
+                break
+    return case
+
+
+def run(iterations=500, seed=0, engines=None, pool_size=12):
+    """
+    Checks engines (names from ENGINES, all by default) on random cases and returns a list of
+    minimised counterexamples, at most one per engine
+    """
+    rng = random.Random(seed)
+    engines = collections.OrderedDict((name, ENGINES[name]) for name in engines or ENGINES)
+    counterexamples = []
+    for _ in range(iterations):
+        case = random_case(rng, pool_size=pool_size)
+        for name, check in list(engines.items()):
+            if _failure(check, case) is None:
+                continue
+            case = minimise(check, case)
+            expected, actual = _failure(check, case)
+            counterexamples.append(Counterexample(name, case, expected, actual))
+            del engines[name]
+        if not engines:
+            break
+    return counterexamples
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m semver_range.fuzz', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', action='append', choices=list(ENGINES), help='engine to check, all by default')
+    args = parser.parse_args(args)
+    counterexamples = run(args.iterations, args.seed, args.engine)
+    for counterexample in counterexamples:
+        print('%s disagrees on %r\n  expected %r\n  actual   %r' % counterexample)
+    if counterexamples:
+        sys.exit(1)
+    print('No disagreements in %d cases' % args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""
+Streaming ingestion of registry dumps into per-package version indexes
+
+A dump is newline-delimited JSON, possibly gzipped, with one package document per line such as
+{"_id": "react", "name": "react", "versions": {"16.14.0": {...}, ...}} or an _all_docs row holding one in "doc".
+Lines are decoded one at a time and only the version keys are parsed, in bulk, so memory stays bounded
+by the largest package. Indexes are yielded as VersionIndexes or written to index files, optionally
+split into shards by a crc32 of the package name and built by several processes.
+"""
+import concurrent.futures
+import gzip
+import json
+import os
+import re
+import struct
+import tempfile
+import zlib
+
+from semver_range import (
+    COMPILED_FORMAT, VersionIndex, _read_string, _read_versions, _write_string, dump_versions, parse_versions_many,
+)
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_MAGIC = b'SVIX'
+_HEADER = struct.Struct('<4sH')  # magic, compiled format
+_RECORD = struct.Struct('<I')  # length of a package record: its name followed by its versions as dump_versions
+_NAME_PATTERN = r'\s*\{\s*"(?:_id|id|name)"\s*:\s*"([^"\\]*)"'
+_NAMES = {
+    str: re.compile(_NAME_PATTERN),
+    bytes: re.compile(_NAME_PATTERN.encode('ascii')),
+}
+
+
+class Progress:
+    """
+    Counters updated during ingestion, may be read from another thread: lines and bytes (or characters)
+    of the documents considered, how many of those were not package documents, packages, and valid
+    and invalid versions
+    """
+    __slots__ = ('lines', 'bytes', 'invalid_lines', 'packages', 'versions', 'invalid_versions')
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def __repr__(self):
+        return '<Progress %s>' % ' '.join('%s=%d' % (name, getattr(self, name)) for name in self.__slots__)
+
+    def update(self, other):
+        """
+        Adds the counters of another Progress, e.g. of one shard
+        """
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+def shard_of(name, shards):
+    """
+    Shard of a package name, a crc32 of its UTF-8 encoding modulo the number of shards
+    """
+    if isinstance(name, str):
+        name = name.encode('utf-8')
+    return zlib.crc32(name) % shards
+
+
+def open_dump(path):
+    """
+    Opens a dump for reading lines as bytes, decompressing it if it is gzipped
+    """
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    return gzip.open(path, 'rb') if magic == _GZIP_MAGIC else open(path, 'rb')
+
+
+def _package(line):
+    # name and version strings of a package document line, or None
+    try:
+        document = json.loads(line.decode('utf-8') if isinstance(line, bytes) else line)
+    except ValueError:
+        return None
+    if isinstance(document, dict) and isinstance(document.get('doc'), dict):
+        document = document['doc']
+    if not isinstance(document, dict):
+        return None
+    name = document.get('name') or document.get('_id')
+    versions = document.get('versions') or {}  # unpublished packages have none
+    if not isinstance(name, str) or not isinstance(versions, (dict, list)):
+        return None
+    return name, list(versions)
+
+
+def _line_shard(line, shards):
+    # shard of a line from the leading name if it can be matched without decoding, or None
+    match = _NAMES[type(line)].match(line)
+    return None if match is None else shard_of(match.group(1), shards)
+
+
+def _documents(source, shards, shard, progress):
+    # (shard, package name, version strings) of the packages of one shard, or of all if shard is None
+    if isinstance(source, str):
+        with open_dump(source) as lines:
+            yield from _documents(lines, shards, shard, progress)
+        return
+    for line in source:
+        if not line.strip():
+            continue
+        line_shard = _line_shard(line, shards) if shards > 1 else 0
+        if shard is not None and line_shard not in (None, shard):
+            continue
+        package = _package(line)
+        if line_shard is None:  # lines that are not package documents count towards the first shard
+            line_shard = 0 if package is None else shard_of(package[0], shards)
+        if shard is not None and line_shard != shard:
+            continue
+        progress.lines += 1
+        progress.bytes += len(line)
+        if package is None:
+            progress.invalid_lines += 1
+            continue
+        progress.packages += 1
+        yield (line_shard,) + package
+
+
+def _indexes(source, loose, shards, shard, progress):
+    for line_shard, name, strings in _documents(source, shards, shard, progress):
+        versions, _ = parse_versions_many(strings, loose=loose)
+        versions = [version for version in versions if version is not None]
+        progress.versions += len(versions)
+        progress.invalid_versions += len(strings) - len(versions)
+        yield line_shard, name, VersionIndex(versions, loose=loose)
+
+
+def iter_indexes(source, loose=False, shard=0, shards=1, progress=None):
+    """
+    Yields (package name, VersionIndex) for the package documents of a dump, given as a path or an iterable
+    of str or bytes lines, skipping invalid versions; with shards > 1 only packages of one shard are
+    yielded and other shards' lines are mostly skipped without being decoded.
+    Counts are added to progress if given
+    """
+    progress = Progress() if progress is None else progress
+    for _, name, index in _indexes(source, loose, shards, shard, progress):
+        yield name, index
+
+
+class _IndexWriter:
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC, COMPILED_FORMAT))
+
+    def write(self, name, index):
+        record = bytearray()
+        _write_string(record, name)
+        record += dump_versions(index)
+        self._file.write(_RECORD.pack(len(record)))
+        self._file.write(record)
+
+    def close(self):
+        self._file.close()
+
+
+def write_indexes(source, path, loose=False, shard=0, shards=1, progress=None):
+    """
+    Writes the indexes iter_indexes yields into an index file, see read_indexes, and returns the Progress
+    """
+    progress = Progress() if progress is None else progress
+    writer = _IndexWriter(path)
+    try:
+        for name, index in iter_indexes(source, loose=loose, shard=shard, shards=shards, progress=progress):
+            writer.write(name, index)
+    finally:
+        writer.close()
+    return progress
+
+
+def read_indexes(path, loose=False):
+    """
+    Yields (package name, VersionIndex) from an index file one package at a time
+    """
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size or _HEADER.unpack(header) != (_MAGIC, COMPILED_FORMAT):
+            raise ValueError('%s is not an index file of this format' % path)
+        while True:
+            size = f.read(_RECORD.size)
+            if not size:
+                return
+            record = f.read(_RECORD.unpack(size)[0]) if len(size) == _RECORD.size else b''
+            try:
+                name, offset = _read_string(record, 0)
+                versions, offset = _read_versions(record, offset)
+                if offset != len(record):
+                    raise ValueError('unexpected trailing data in the record of %s' % name)
+            except (IndexError, UnicodeDecodeError, ValueError) as e:
+                raise ValueError('Invalid index file %s: %s' % (path, e))
+            yield name, VersionIndex(versions, loose=loose)
+
+
+def shard_paths(directory, shards):
+    return [os.path.join(directory, 'shard-%d.svix' % shard) for shard in range(shards)]
+
+
+def _split_dump(source, paths, shards):
+    # writes the lines of a dump into one file per shard, decoding only lines whose shard cannot be matched
+    if isinstance(source, str):
+        with open_dump(source) as lines:
+            return _split_dump(lines, paths, shards)
+    files = [open(path, 'wb') for path in paths]
+    try:
+        for line in source:
+            if isinstance(line, str):
+                line = line.encode('utf-8')
+            if not line.strip():
+                continue
+            shard = _line_shard(line, shards)
+            if shard is None:
+                package = _package(line)
+                shard = 0 if package is None else shard_of(package[0], shards)
+            files[shard].write(line if line.endswith(b'\n') else line + b'\n')
+    finally:
+        for f in files:
+            f.close()
+
+
+def ingest(source, directory, shards=1, loose=False, workers=None, progress=None):
+    """
+    Writes the indexes of a dump, at a path or as an iterable of lines, into one index file per shard
+    in a directory, see shard_paths, and returns their paths. The dump is read once; with `workers` processes
+    its lines are first split into temporary files per shard, which the processes index one shard at a time.
+    Counts are added to progress if given, in parallel when a shard is done
+    """
+    progress = Progress() if progress is None else progress
+    paths = shard_paths(directory, shards)
+    if not workers:
+        writers = [_IndexWriter(path) for path in paths]
+        try:
+            for shard, name, index in _indexes(source, loose, shards, None, progress):
+                writers[shard].write(name, index)
+        finally:
+            for writer in writers:
+                writer.close()
+        return paths
+    with tempfile.TemporaryDirectory(prefix='semver-ingest-', dir=directory) as split_directory:
+        split_paths = [os.path.join(split_directory, 'shard-%d.json' % shard) for shard in range(shards)]
+        _split_dump(source, split_paths, shards)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(write_indexes, split_path, path, loose)
+                for split_path, path in zip(split_paths, paths)
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                progress.update(future.result())
+    return paths
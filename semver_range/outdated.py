@@ -0,0 +1,95 @@
+"""
+Bulk npm-outdated style planning: current, wanted, latest and latest-in-major versions for whole manifests
+"""
+import collections
+
+from semver_range import Range, Version, VersionIndex, parse_versions_many
+
+
+class Outdated(collections.namedtuple('Outdated', 'package declared current wanted latest latest_in_major')):
+    """
+    Versions of one dependency: current is installed (or None), wanted is the highest satisfying the declared range,
+    latest the highest release and latest_in_major the highest release with the major version of current,
+    or of wanted when not installed
+    """
+    __slots__ = ()
+
+    @property
+    def is_outdated(self):
+        """
+        Whether the dependency is missing or the wanted or latest version differs from the current one
+        """
+        return any(
+            version is not None and (self.current is None or version != self.current)
+            for version in (self.wanted, self.latest)
+        )
+
+
+class Planner:
+    """
+    Answers Outdated rows for many dependencies: each package's versions are fetched from the provider,
+    parsed and sorted once into a VersionIndex that answers with binary searches, and each declared range
+    is parsed once; the provider needs a `versions(package)` method, e.g. resolver.DictProvider
+    """
+
+    def __init__(self, provider, loose=False):
+        self.provider = provider
+        self.loose = loose
+        self._indexes = {}
+        self._ranges = {}
+
+    def index(self, package):
+        """
+        VersionIndex of a package's published versions, skipping invalid ones
+        """
+        index = self._indexes.get(package)
+        if index is None:
+            versions, _ = parse_versions_many(self.provider.versions(package), loose=self.loose)
+            index = VersionIndex([version for version in versions if version is not None], loose=self.loose)
+            self._indexes[package] = index
+        return index
+
+    def range(self, pattern):
+        """
+        Parsed range or None if the declared specifier is not a semver range, e.g. a git url or a dist-tag
+        """
+        if pattern not in self._ranges:
+            try:
+                self._ranges[pattern] = Range(pattern, loose=self.loose)
+            except (TypeError, ValueError):
+                self._ranges[pattern] = None
+        return self._ranges[pattern]
+
+    def _current(self, version):
+        if version is None or isinstance(version, Version):
+            return version
+        try:
+            return Version(version, loose=self.loose)
+        except ValueError:
+            return None
+
+    def plan(self, manifest, installed=None):
+        """
+        Outdated rows, in manifest order, for a mapping of package name → declared range
+        given a mapping of package name → installed version
+        """
+        installed = installed or {}
+        rows = []
+        for package, declared in manifest.items():
+            index = self.index(package)
+            current = self._current(installed.get(package))
+            version_range = self.range(declared)
+            wanted = None if version_range is None else index.highest_version(version_range)
+            reference = current or wanted
+            rows.append(Outdated(
+                package, declared, current, wanted, index.latest(),
+                None if reference is None else index.latest(reference.major),
+            ))
+        return rows
+
+
+def plan(manifest, installed, provider, loose=False):
+    """
+    Outdated rows for every dependency of a manifest, see Planner.plan
+    """
+    return Planner(provider, loose=loose).plan(manifest, installed)
@@ -0,0 +1,393 @@
+"""
+Resolution of multi-package dependency graphs using Range and Version
+
+The solver follows PubGrub (https://github.com/dart-lang/pub/blob/master/doc/solver.md)
+over the finite sets of versions a provider publishes: a term is the set of "worlds"
+a package can be in, i.e. some of its versions and/or None when it is not selected at all.
+"""
+import collections
+
+from semver_range import Range, ShardedCache, Version
+
+
+class ResolutionError(ValueError):
+    pass
+
+
+class DictProvider:
+    """
+    Package metadata provider backed by a mapping of
+    package name → version string → mapping of dependency name → range pattern
+    """
+
+    def __init__(self, packages):
+        self.packages = packages
+
+    def versions(self, package):
+        return list(self.packages.get(package, ()))
+
+    def dependencies(self, package, version):
+        return self.packages[package][version] or {}
+
+
+class Resolver:
+    """
+    Conflict-driven backtracking resolver that picks the highest satisfying version of every package;
+    the provider needs `versions(package)` and `dependencies(package, version)` methods.
+    Memoized metadata is shared by concurrent resolve() calls from several threads.
+    """
+
+    def __init__(self, provider, loose=False):
+        self.provider = provider
+        self.loose = loose
+        self._ranges = ShardedCache()
+        self._candidates = {}
+        self._dependencies = {}
+        self._matching = {}
+        self._matching_sets = {}
+        self._dependents = {}
+        self._universes = {}
+
+    def universe(self, package):
+        """
+        All worlds of a package: any of its versions or None when it is not selected
+        """
+        universe = self._universes.get(package)
+        if universe is None:
+            universe = self._universes.setdefault(package, frozenset(self.candidates(package)) | {None})
+        return universe
+
+    def range(self, pattern):
+        return self._ranges.get(pattern, lambda: Range(pattern, loose=self.loose))
+
+    def candidates(self, package):
+        """
+        Versions of a package, highest first, mapped to the provider's version strings
+        """
+        candidates = self._candidates.get(package)
+        if candidates is None:
+            candidates = {}
+            for version in self.provider.versions(package):
+                try:
+                    candidates[Version(version, loose=self.loose)] = version
+                except ValueError:
+                    continue
+            candidates = self._candidates.setdefault(package, collections.OrderedDict(
+                (version, candidates[version]) for version in sorted(candidates, reverse=True)
+            ))
+        return candidates
+
+    def matching(self, package, ranges):
+        """
+        Versions of a package satisfying all given ranges, highest first
+        """
+        ranges = dict((version_range.pattern, version_range) for version_range in ranges)
+        key = package, frozenset(ranges)
+        matching = self._matching.get(key)
+        if matching is None:
+            matching = self._matching.setdefault(key, [
+                version for version in self.candidates(package)
+                if all(version in version_range for version_range in ranges.values())
+            ])
+        return matching
+
+    def matching_set(self, package, version_range):
+        key = package, version_range.pattern
+        matching = self._matching_sets.get(key)
+        if matching is None:
+            matching = self._matching_sets.setdefault(key, frozenset(self.matching(package, (version_range,))))
+        return matching
+
+    def dependencies(self, package, version):
+        key = package, version
+        dependencies = self._dependencies.get(key)
+        if dependencies is None:
+            source = self.candidates(package)[version]
+            dependencies = self.provider.dependencies(package, source)
+            dependencies = self._dependencies.setdefault(key, tuple(
+                (dependency, self.range(dependencies[dependency])) for dependency in sorted(dependencies)
+            ))
+        return dependencies
+
+    def dependents(self, package, dependency):
+        """
+        Versions of a package grouped by the pattern of the range they require of a dependency
+        """
+        key = package, dependency
+        dependents = self._dependents.get(key)
+        if dependents is None:
+            dependents = {}
+            for version in self.candidates(package):
+                for other, version_range in self.dependencies(package, version):
+                    if other == dependency:
+                        dependents.setdefault(version_range.pattern, set()).add(version)
+            dependents = self._dependents.setdefault(key, dict(
+                (pattern, frozenset(versions)) for pattern, versions in dependents.items()
+            ))
+        return dependents
+
+    def resolve(self, requirements):
+        """
+        Resolves a mapping of package name → range pattern into a mapping of package name → Version
+        """
+        return _Solver(self, requirements).solve()
+
+
+def resolve(provider, requirements, loose=False):
+    return Resolver(provider, loose=loose).resolve(requirements)
+
+
+_ROOT = object()  # virtual package that depends on the requirements being resolved
+_ROOT_UNIVERSE = frozenset([_ROOT, None])
+
+
+class _Incompatibility:
+    """
+    Terms, mapping packages to sets of worlds, which cannot all hold at once; the cause is either
+    a description template and its arguments for external facts or the pair of incompatibilities it was derived from
+    """
+    __slots__ = ('terms', 'cause')
+
+    def __init__(self, terms, cause):
+        self.terms = terms
+        self.cause = cause
+
+    def external_causes(self):
+        causes, stack, seen = [], [self], set()
+        while stack:
+            incompatibility = stack.pop()
+            if id(incompatibility) in seen:
+                continue
+            seen.add(id(incompatibility))
+            if isinstance(incompatibility.cause[0], _Incompatibility):
+                stack.extend(reversed(incompatibility.cause))
+                continue
+            description = incompatibility.cause[0] % incompatibility.cause[1:]
+            if description not in causes:
+                causes.append(description)
+        return causes
+
+
+class _Assignment:
+    __slots__ = ('package', 'term', 'level', 'cause')
+
+    def __init__(self, package, term, level, cause=None):
+        self.package = package
+        self.term = term
+        self.level = level
+        self.cause = cause  # None for decisions
+
+
+class _Solver:
+    def __init__(self, resolver, requirements):
+        self.resolver = resolver
+        self.requirements = requirements
+        self.incompatibilities = {}  # package → incompatibilities involving it
+        self.dependencies = set()  # (package, dependency, range) already turned into incompatibilities
+        self.assignments = []
+        self.terms = {}  # package → intersection of its assigned terms
+        self.decisions = {}  # package → chosen version
+        self.required = set()  # packages that must be selected but have not been decided yet
+        self._add_incompatibility(self._incompatibility({_ROOT: frozenset([None])}, ('root is required',)))
+
+    def solve(self):
+        package = _ROOT
+        while package is not None:
+            self._propagate(package)
+            package = self._choose()
+        self.decisions.pop(_ROOT)
+        return self.decisions
+
+    def _universe(self, package):
+        if package is _ROOT:
+            return _ROOT_UNIVERSE
+        return self.resolver.universe(package)
+
+    def _term(self, package):
+        term = self.terms.get(package)
+        return self._universe(package) if term is None else term
+
+    def _level(self):
+        return len(self.decisions)
+
+    def _incompatibility(self, terms, cause):
+        # terms allowing every world always hold so they are left out
+        terms = dict(item for item in terms.items() if item[1] != self._universe(item[0]))
+        return _Incompatibility(terms, cause)
+
+    def _add_incompatibility(self, incompatibility):
+        for package in incompatibility.terms:
+            self.incompatibilities.setdefault(package, []).append(incompatibility)
+
+    def _assign(self, assignment):
+        self.assignments.append(assignment)
+        self._update_term(assignment)
+
+    def _update_term(self, assignment):
+        package = assignment.package
+        term = self.terms[package] = self._term(package) & assignment.term
+        if None in term or package in self.decisions:
+            self.required.discard(package)
+        else:
+            self.required.add(package)
+
+    def _backtrack(self, level):
+        while self.assignments and self.assignments[-1].level > level:
+            assignment = self.assignments.pop()
+            if assignment.cause is None:
+                del self.decisions[assignment.package]
+        self.terms = {}
+        self.required = set()
+        for assignment in self.assignments:
+            self._update_term(assignment)
+
+    def _propagate(self, package):
+        changed = [package]
+        while changed:
+            package = changed.pop()
+            for incompatibility in reversed(self.incompatibilities.get(package, ())):
+                unsatisfied = self._almost_satisfied(incompatibility)
+                if unsatisfied is False:
+                    continue
+                if unsatisfied is not None:
+                    self._derive(unsatisfied, incompatibility)
+                    changed.append(unsatisfied)
+                    continue
+                incompatibility = self._resolve_conflict(incompatibility)
+                unsatisfied = self._almost_satisfied(incompatibility)
+                self._derive(unsatisfied, incompatibility)
+                changed = [unsatisfied]
+                break
+
+    def _almost_satisfied(self, incompatibility):
+        """
+        Returns None if all terms are satisfied, the package of the single term which is not
+        but might be or False otherwise
+        """
+        unsatisfied = None
+        terms = self.terms
+        for package, term in incompatibility.terms.items():
+            current = terms.get(package)
+            if current is None:
+                current = self._universe(package)
+            if current <= term:
+                continue
+            if unsatisfied is not None or not current & term:
+                return False
+            unsatisfied = package
+        return unsatisfied
+
+    def _derive(self, package, incompatibility):
+        term = self._universe(package) - incompatibility.terms[package]
+        self._assign(_Assignment(package, term, self._level(), incompatibility))
+
+    def _satisfier(self, package, term):
+        """
+        Returns the earliest assignment after which the partial solution satisfies a term
+        """
+        current = self._universe(package)
+        for assignment in self.assignments:
+            if assignment.package == package:
+                current = current & assignment.term
+                if current <= term:
+                    return assignment
+        raise AssertionError('term is not satisfied')
+
+    def _resolve_conflict(self, incompatibility):
+        derived = False
+        while not self._is_failure(incompatibility):
+            package, satisfier, previous_level = self._most_recent_satisfier(incompatibility)
+            if satisfier.cause is None or previous_level < satisfier.level:
+                self._backtrack(previous_level)
+                if derived:
+                    self._add_incompatibility(incompatibility)
+                return incompatibility
+            terms = dict(item for item in satisfier.cause.terms.items() if item[0] != package)
+            for other, term in incompatibility.terms.items():
+                if other != package:
+                    terms[other] = terms[other] & term if other in terms else term
+            difference = satisfier.term - incompatibility.terms[package]
+            if difference:
+                terms[package] = self._universe(package) - difference
+            incompatibility = self._incompatibility(terms, (incompatibility, satisfier.cause))
+            derived = True
+        raise ResolutionError('Requirements cannot be satisfied: %s' % '; '.join(incompatibility.external_causes()))
+
+    def _is_failure(self, incompatibility):
+        terms = incompatibility.terms
+        return not terms or (len(terms) == 1 and terms.get(_ROOT) == frozenset([_ROOT]))
+
+    def _most_recent_satisfier(self, incompatibility):
+        satisfiers = sorted(
+            (self.assignments.index(self._satisfier(package, term)), package)
+            for package, term in incompatibility.terms.items()
+        )
+        index, package = satisfiers[-1]
+        satisfier = self.assignments[index]
+        previous_level = max([1] + [self.assignments[i].level for i, _ in satisfiers[:-1]])
+        difference = satisfier.term - incompatibility.terms[package]
+        if difference:
+            previous_level = max(
+                previous_level, self._satisfier(package, self._universe(package) - difference).level
+            )
+        return package, satisfier, previous_level
+
+    def _choose(self):
+        """
+        Decides on the highest allowed version of the most constrained package
+        or returns None when all required packages have been decided
+        """
+        if not self.required:
+            return None
+        package = min(self.required, key=lambda p: (len(self.terms[p]), _sort_name(p)))
+        if package is _ROOT:
+            version, dependencies = _ROOT, [(name, self.resolver.range(self.requirements[name]))
+                                            for name in sorted(self.requirements)]
+        else:
+            version = next((version for version in self.resolver.candidates(package)
+                            if version in self.terms[package]), None)
+            if version is None:
+                self._add_incompatibility(self._incompatibility(
+                    {package: self.terms[package]}, ('no allowed version of %s exists', package)
+                ))
+                return package
+            dependencies = self.resolver.dependencies(package, version)
+        if not self._add_dependencies(package, version, dependencies):
+            self.decisions[package] = version
+            self._assign(_Assignment(package, frozenset([version]), self._level()))
+        return package
+
+    def _add_dependencies(self, package, version, dependencies):
+        """
+        Adds incompatibilities for the dependencies of a version returning whether any conflicts already
+        """
+        conflict = False
+        for dependency, version_range in dependencies:
+            if package is _ROOT:
+                versions, description = frozenset([_ROOT]), ('root requires %s %s', dependency, version_range)
+            else:
+                versions = self.resolver.dependents(package, dependency)[version_range.pattern]
+                description = ('%s %s depend%s on %s %s', package, _describe_versions(versions),
+                               's' if len(versions) == 1 else '', dependency, version_range)
+            if (package, dependency, version_range.pattern) in self.dependencies:
+                continue
+            self.dependencies.add((package, dependency, version_range.pattern))
+            incompatibility = self._incompatibility({
+                package: versions,
+                dependency: self.resolver.universe(dependency) - self.resolver.matching_set(dependency, version_range),
+            }, description)
+            self._add_incompatibility(incompatibility)
+            conflict = conflict or all(
+                self._term(other) <= term for other, term in incompatibility.terms.items() if other != package
+            )
+        return conflict
+
+
+def _describe_versions(versions):
+    if len(versions) == 1:
+        return '%s' % next(iter(versions))
+    return '%s to %s' % (min(versions), max(versions))
+
+
+def _sort_name(package):
+    return '' if package is _ROOT else package
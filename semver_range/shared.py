@@ -0,0 +1,206 @@
+"""
+Sorted columnar encoding of versions in shared memory for matching in several processes without copying
+"""
+import array
+import struct
+
+from semver_range import Version, Range, _NO_IDENTIFIERS, _ranges_contain_key, _search_keys, identifiers_key
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+_MAGIC = b'SVSM'
+_FORMAT = 1
+_HEADER = struct.Struct('<4sIQQ')  # magic, format, number of versions, size of the suffix heap
+
+
+def _require_shared_memory():
+    if shared_memory is None:
+        raise ImportError('Shared memory needs Python 3.8 or later')
+
+
+class SharedVersions:
+    """
+    Unique versions sorted by precedence, published as columns in a named shared memory block:
+    major, minor and patch as 64-bit integers and pre-release/build suffixes as offsets into a text heap.
+    Other processes attach by name, or receive an instance pickled as just its name, and match ranges
+    directly on the buffer; only versions that are returned are turned into Version objects.
+    Range patterns are parsed loosely if loose is set
+    """
+
+    def __init__(self, shm, owner=False, loose=False):
+        self._shm = shm
+        self._owner = owner
+        self.loose = loose
+        buffer = shm.buf
+        magic, compiled_format, count, heap_size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC or compiled_format != _FORMAT:
+            raise ValueError('%s is not a shared version block' % shm.name)
+        self._count = count
+        offset = _HEADER.size
+        columns = []
+        for _ in range(3):
+            columns.append(buffer[offset:offset + 8 * count].cast('Q'))
+            offset += 8 * count
+        self._major, self._minor, self._patch = columns
+        self._suffix_offsets = buffer[offset:offset + 4 * (count + 1)].cast('I')
+        offset += 4 * (count + 1)
+        self._heap = buffer[offset:offset + heap_size]
+
+    @classmethod
+    def create(cls, versions, name=None, loose=False):
+        """
+        Publishes versions (or version strings) into a new shared memory block; the creating
+        instance unlinks the block when closed
+        """
+        _require_shared_memory()
+        unique = {}
+        for version in versions:
+            if not isinstance(version, Version):
+                version = Version(version, loose=loose)
+            unique.setdefault(version._sort_key, version)
+        columns, suffixes = ([], [], []), []
+        suffix_offsets, position = array.array('I', [0]), 0
+        for key in sorted(unique):
+            version = unique[key]
+            for column, part in zip(columns, key):
+                column.append(part)
+            suffix = ''
+            if version.pre_release:
+                suffix += '-' + version.pre_release
+            if version.build:
+                suffix += '+' + version.build
+            suffixes.append(suffix.encode('ascii'))
+            position += len(suffixes[-1])
+            suffix_offsets.append(position)
+        content = [_HEADER.pack(_MAGIC, _FORMAT, len(unique), position)]
+        for column in columns:
+            content.append(array.array('Q', column).tobytes())
+        content.append(suffix_offsets.tobytes())
+        content.append(b''.join(suffixes))
+        content = b''.join(content)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(len(content), 1))
+        shm.buf[:len(content)] = content
+        return cls(shm, owner=True, loose=loose)
+
+    @classmethod
+    def attach(cls, name, loose=False):
+        _require_shared_memory()
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13 cannot opt out of tracking
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, loose=loose)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __reduce__(self):
+        return self.attach, (self.name, self.loose)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        return '<SharedVersions %s of %d versions>' % (self.name, len(self))
+
+    def close(self):
+        """
+        Detaches from the block, which is also removed if this instance created it
+        """
+        if self._shm is None:
+            return
+        self._detach()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def _detach(self):
+        # views into the buffer must be released before the memory can be unmapped; some are missing
+        # if the block was not a valid one
+        for name in ('_major', '_minor', '_patch', '_suffix_offsets', '_heap'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._shm.close()
+
+    def __del__(self):
+        if getattr(self, '_shm', None) is not None:
+            self._detach()
+
+    def __len__(self):
+        return self._count
+
+    def _suffix(self, index):
+        start, end = self._suffix_offsets[index], self._suffix_offsets[index + 1]
+        if start == end:
+            return None, None
+        suffix = bytes(self._heap[start:end]).decode('ascii')
+        if suffix.startswith('-'):
+            pre_release, _, build = suffix[1:].partition('+')
+            return pre_release, build or None
+        return None, suffix[1:]
+
+    def key(self, index):
+        """
+        Sort key of the version at an index, as Version._sort_key
+        """
+        pre_release, build = self._suffix(index)
+        return (
+            self._major[index], self._minor[index], self._patch[index],
+            identifiers_key(pre_release.split('.')) if pre_release else _NO_IDENTIFIERS,
+            identifiers_key(build.split('.')) if build else _NO_IDENTIFIERS,
+        )
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('version index out of range')
+        parts = (self._major[index], self._minor[index], self._patch[index]) + self._suffix(index)
+        version = Version._from_parsed(None, False, parts)
+        return Version._from_parsed(str(version), False, parts)
+
+    def __iter__(self):
+        return map(self.__getitem__, range(self._count))
+
+    def _range(self, version_range):
+        return version_range if isinstance(version_range, Range) else Range(version_range, loose=self.loose)
+
+    def satisfying(self, version_range):
+        """
+        Versions satisfying a range, lowest first
+        """
+        ranges = self._range(version_range).ranges
+        return map(self.__getitem__, (
+            index for index in range(self._count) if _ranges_contain_key(ranges, self.key(index))
+        ))
+
+    def _search(self, version_range, highest):
+        # the columns are sorted, so ranges are matched by binary search as in VersionIndex
+        index = _search_keys(_Keys(self), self._range(version_range).ranges, highest)
+        return None if index is None else self[index]
+
+    def lowest_version(self, version_range):
+        return self._search(version_range, highest=False)
+
+    def highest_version(self, version_range):
+        return self._search(version_range, highest=True)
+
+
+class _Keys:
+    # sequence of the sort keys of shared versions, decoded when accessed
+    def __init__(self, shared):
+        self._shared = shared
+
+    def __len__(self):
+        return len(self._shared)
+
+    def __getitem__(self, index):
+        return self._shared.key(index)
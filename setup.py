@@ -14,7 +14,7 @@ setup(
     version='0.0.3',
     author='Igor Ushkarev',
     url='https://github.com/ushkarev/semver_range',
-    py_modules=['semver_range'],
+    packages=['semver_range'],
     license='MIT',
     description='Python package that mimics npm’s “semver” package',
     long_description=README,
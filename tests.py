@@ -1,8 +1,39 @@
+import asyncio
+import collections
+import concurrent.futures
+import gzip
+import io
+import itertools
+import json
+import mmap
+import operator
+import os
+import pickle
+import random
+import socket
+import sqlite3
 import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 
 
-from semver_range import Version, Range
+from semver_range import (
+    ParseError, Range, ShardedCache, Version, VersionIndex, __version__, coerce, dump_versions, group_latest,
+    load_versions, merge_sorted, unique, parse_ranges_many, parse_versions_many, scan_versions,
+)
+from semver_range import audit, fuzz
+from semver_range.buffer import VersionBuffer
+from semver_range.cache import RangeCache, ResultCache, versions_digest
+from semver_range.daemon import Client, Daemon, DaemonError
+from semver_range.external import byte_key, external_sort
+from semver_range.ingest import Progress, ingest, iter_indexes, read_indexes, shard_of, write_indexes
+from semver_range.outdated import Outdated, Planner, plan
+from semver_range.shared import SharedVersions, shared_memory
+from semver_range.aio import MetadataCache, resolve_iter
+from semver_range.resolver import DictProvider, ResolutionError, resolve
 
 
 class VersionTestCase(unittest.TestCase):
@@ -35,6 +66,64 @@ class VersionTestCase(unittest.TestCase):
             self.assertEqual(loose, strict)
             self.assertTrue(loose.has_same_precedence(strict))
 
+    def test_immutable(self):
+        version = Version('1.2.3')
+        hash(version)
+        with self.assertRaises(AttributeError):
+            version.major = 2
+        with self.assertRaises(AttributeError):
+            del version.pre_release
+        with self.assertRaises(AttributeError):
+            version.extra = 1
+        self.assertEqual(version, '1.2.3')
+
+    def test_hash(self):
+        # versions equal strings, so they must hash like them
+        versions = {Version('1.2.3'): 1, Version('1.2.3-beta.1+build'): 2}
+        self.assertIn('1.2.3', versions)
+        self.assertEqual(versions['1.2.3-beta.1+build'], 2)
+        self.assertEqual({'1.2.3', '2.0.0'} & {Version('1.2.3')}, {'1.2.3'})
+
+    def test_serialisation(self):
+        versions = [Version('1.2.3'), Version('300.20000.1-x.7+b.0'), Version(' v1.2.3-beta.01', loose=True)]
+        for version in versions:
+            copies = [pickle.loads(pickle.dumps(version, protocol)) for protocol in range(pickle.HIGHEST_PROTOCOL + 1)]
+            for copy in copies + [Version.from_bytes(version.to_bytes())]:
+                self.assertEqual((copy.version, copy.loose, copy.to_parts()),
+                                 (version.version, version.loose, version.to_parts()))
+        self.assertEqual(Version('1.2.3').to_bytes(), b'V\x00\x01\x02\x03')
+        self.assertEqual(load_versions(dump_versions(versions)), versions)
+        self.assertEqual(load_versions(dump_versions([])), [])
+        for data in [b'', b'V\x00\x01', Version('1.2.3').to_bytes() + b'\x00', Range('1.2.3').to_bytes()]:
+            with self.assertRaises(ValueError):
+                Version.from_bytes(data)
+
+    def test_parse_many(self):
+        data = [
+            ['1.2.3-beta.1+build.5', None, None],
+            [None, ParseError.NOT_A_STRING, ParseError.NOT_A_STRING],
+            ['', ParseError.EMPTY, ParseError.EMPTY],
+            ['1.2', ParseError.NOT_NUMERIC, ParseError.NOT_NUMERIC],
+            ['01.2.3', ParseError.LEADING_ZERO, None],
+            ['1.2.3-beta.01', ParseError.INVALID_PRE_RELEASE, None],
+            ['1.2.3-', ParseError.INVALID_PRE_RELEASE, ParseError.INVALID_PRE_RELEASE],
+            ['1.2.3+', ParseError.INVALID_BUILD, ParseError.INVALID_BUILD],
+            ['1.2.3foo', ParseError.INVALID_SUFFIX, None],
+            ['v1.2.3', ParseError.NOT_NUMERIC, None],
+        ]
+        strings = [string for string, _, _ in data]
+        for loose, column in ((False, 1), (True, 2)):
+            versions, errors = parse_versions_many(strings, loose=loose)
+            self.assertEqual(errors, [row[column] for row in data])
+            for string, version, error in zip(strings, versions, errors):
+                if error is None:
+                    self.assertEqual(version, Version(string, loose=loose))
+                    self.assertEqual(version.to_parts(), Version(string, loose=loose).to_parts())
+                else:
+                    self.assertIsNone(version)
+                    with self.assertRaises(ValueError):
+                        Version(string, loose=loose)
+
     def test_versions(self):
         data = [
             ['0.0.0', '0.0.0-foo'],
@@ -252,6 +341,67 @@ class VersionTestCase(unittest.TestCase):
             version = Version(version, loose=loose)
             self.assertEqual(version.increment(level, identifier=identifier), expected, msg=msg)
 
+    def test_group_latest(self):
+        versions = ['1.0.0', '1.2.0', '1.2.5', '1.10.1', '2.0.0-rc.1', '1.10.0', '2.0.0-beta.2', '2.0.0-beta.10',
+                    '0.9.0', '3.0.0-beta.1', '2.0.0', Version('1.2.4')]
+        self.assertEqual(list(group_latest(versions).items()), [
+            ((0, 9), '0.9.0'), ((1, 0), '1.0.0'), ((1, 2), '1.2.5'), ((1, 10), '1.10.1'), ((2, 0), '2.0.0'),
+        ])
+        self.assertEqual(group_latest(versions, by='major'), {0: '0.9.0', 1: '1.10.1', 2: '2.0.0'})
+        self.assertEqual(group_latest(versions, by='major', include_prerelease=True)[3], '3.0.0-beta.1')
+        self.assertEqual(list(group_latest(versions, by='prerelease').items()), [
+            ('rc', '2.0.0-rc.1'), (None, '2.0.0'), ('beta', '3.0.0-beta.1'),
+        ])
+        self.assertEqual(group_latest(['v1.2.3', '=1.2.4'], loose=True), {(1, 2): '1.2.4'})
+        self.assertEqual(group_latest([]), {})
+        with self.assertRaises(ValueError):
+            group_latest(versions, by='patch')
+        with self.assertRaises(ValueError):
+            group_latest(['v1.2.3'])
+
+    def test_unique(self):
+        versions = ['1.0.0+build.2', '1.0.0', '1.0.0-beta', '1.0.0+build.1', '1.0.0-rc.1', Version('1.0.0'), '0.9.0',
+                    '1.0.0+build.2']
+        self.assertEqual([str(version) for version in unique(versions)], [
+            '1.0.0+build.2', '1.0.0', '1.0.0-beta', '1.0.0+build.1', '1.0.0-rc.1', '0.9.0',
+        ])
+        self.assertEqual([str(version) for version in unique(versions, by='precedence')], [
+            '1.0.0+build.2', '1.0.0-beta', '0.9.0',
+        ])
+        self.assertEqual([str(version) for version in unique(versions, by='release')], ['1.0.0+build.2', '0.9.0'])
+        self.assertEqual(unique(['v1.0.0', '=1.0.0'], loose=True), ['1.0.0'])
+        with self.assertRaises(ValueError):
+            unique(versions, by='patch')
+
+        pairs = itertools.product(map(Version, map(str, versions)), repeat=2)
+        for a, b in pairs:
+            self.assertEqual(a.has_same_precedence(b), a.precedence_key == b.precedence_key)
+            self.assertEqual(a.precedes(b), a.precedence_key < b.precedence_key)
+
+    def test_merge_sorted(self):
+        mirrors = [
+            ['1.0.0', '1.1.0-beta', '1.1.0+build.2', '1.1.0', '2.0.0'],
+            ['0.9.0', '1.1.0-alpha', '1.1.0', '3.0.0'],
+            [Version('1.0.0'), Version('1.1.0+build.1'), Version('2.0.0')],
+            [],
+        ]
+        self.assertEqual([str(version) for version in merge_sorted(*mirrors)], [
+            '0.9.0', '1.0.0', '1.1.0-alpha', '1.1.0-beta', '1.1.0+build.1', '1.1.0+build.2', '1.1.0', '2.0.0', '3.0.0',
+        ])
+        self.assertEqual([str(version) for version in merge_sorted(*mirrors, dedupe='precedence')], [
+            '0.9.0', '1.0.0', '1.1.0-alpha', '1.1.0+build.1', '2.0.0', '3.0.0',
+        ])
+        self.assertEqual([str(version) for version in merge_sorted(*mirrors, dedupe='release')], [
+            '0.9.0', '1.0.0', '1.1.0-alpha', '2.0.0', '3.0.0',
+        ])
+        self.assertEqual(list(merge_sorted(['1.0.0', '2.0.0'], ['1.0.0'], dedupe=None)), ['1.0.0', '1.0.0', '2.0.0'])
+        self.assertEqual(list(merge_sorted(['v1.0.0'], ['=1.0.1'], loose=True)), ['1.0.0', '1.0.1'])
+        self.assertEqual(list(merge_sorted()), [])
+        endless = ('1.%d.0' % minor for minor in itertools.count())
+        self.assertEqual(list(itertools.islice(merge_sorted(endless, ['1.1.0']), 3)), ['1.0.0', '1.1.0', '1.2.0'])
+        with self.assertRaises(ValueError):
+            merge_sorted(['1.0.0'], dedupe='loose')
+
 
 class RangeTestCase(unittest.TestCase):
     # largely taken from https://github.com/npm/node-semver/blob/master/test/index.js
@@ -541,8 +691,8 @@ class RangeTestCase(unittest.TestCase):
             ['^1.2.0-alpha', '1.2.0-pre'],
             ['^0.0.1-alpha', '0.0.1-beta'],
         ]
-        for pattern, version in data:
-            pattern = Range(pattern)
+        for (pattern, version), lazy in itertools.product(data, (False, True)):
+            pattern = Range(pattern, lazy=lazy)
             self.assertIn(
                 version,
                 pattern,
@@ -561,8 +711,8 @@ class RangeTestCase(unittest.TestCase):
             ['~v0.5.4-pre', '0.5.5'],
             ['~v0.5.4-pre', '0.5.4'],
         ]
-        for pattern, version in data:
-            pattern = Range(pattern, loose=True)
+        for (pattern, version), lazy in itertools.product(data, (False, True)):
+            pattern = Range(pattern, loose=True, lazy=lazy)
             self.assertIn(
                 version,
                 pattern,
@@ -630,8 +780,8 @@ class RangeTestCase(unittest.TestCase):
             ['^1.2', '1.1.9'],
             ['^1.2.3', '2.0.0-pre'],
         ]
-        for pattern, version in data:
-            pattern = Range(pattern)
+        for (pattern, version), lazy in itertools.product(data, (False, True)):
+            pattern = Range(pattern, lazy=lazy)
             self.assertNotIn(
                 version,
                 pattern,
@@ -650,8 +800,8 @@ class RangeTestCase(unittest.TestCase):
             # node's semver doesn't consider these a loose range:
             ['~v0.5.4-beta', '0.5.4-alpha'],
         ]
-        for pattern, version in data:
-            pattern = Range(pattern, loose=True)
+        for (pattern, version), lazy in itertools.product(data, (False, True)):
+            pattern = Range(pattern, loose=True, lazy=lazy)
             self.assertNotIn(
                 version,
                 pattern,
@@ -670,6 +820,56 @@ class RangeTestCase(unittest.TestCase):
             with self.assertRaises(ValueError, msg='Pattern should be invalid %s' % pattern):
                 Range(pattern, loose=True)
 
+    def test_immutable(self):
+        pattern = Range('^1.2.3', lazy=True)
+        for name in ('pattern', 'loose', 'ranges', '_ranges', 'extra'):
+            with self.assertRaises(AttributeError):
+                setattr(pattern, name, None)
+        self.assertIn('1.5.0', pattern)
+
+    def test_lazy(self):
+        pattern = Range('^1.0.0 || ^2.0.0 || 1.2.3 - 1.4 || ^3.0.0', lazy=True)
+        self.assertEqual(len(pattern._ranges), 1, msg='Hyphen ranges are not simple so are compiled eagerly')
+        self.assertIn('1.3.0', pattern)
+        self.assertEqual(len(pattern._ranges), 1)
+        self.assertIn('2.1.0', pattern)
+        self.assertEqual(len(pattern._ranges), 3)
+        self.assertNotIn('5.0.0', pattern)
+        self.assertEqual(len(pattern._ranges), 4)
+        self.assertEqual(pattern.ranges, Range(pattern.pattern).ranges)
+        for invalid in ['^1 || blerg', '^1 || ^01.2.3', '1.x.3 || 1']:
+            with self.assertRaises(ValueError, msg='Pattern should be invalid %s' % invalid):
+                Range(invalid, lazy=True)
+
+    def test_compact_representation(self):
+        pattern = Range('>=1.2.3-beta.1 <2 || ^1.5 || >=1.5.0 <2.0.0', loose=True)
+        self.assertFalse(hasattr(pattern, '__dict__'))
+        self.assertEqual([group.desc for group in pattern.ranges], ['>=1.2.3-beta.1 <2.0.0', '>=1.5.0 <2.0.0'])
+        self.assertEqual(pattern.ranges[0], ((operator.ge, Version('1.2.3-beta.1')._sort_key),
+                                             (operator.lt, Version('2.0.0')._sort_key)))
+        self.assertTrue(pattern.ranges[0](Version('1.2.3-beta.2')))
+        self.assertFalse(pattern.ranges[1](Version('1.2.3-beta.2')))
+
+    def test_serialisation(self):
+        versions = ['1.2.3-beta.2', '1.3.0', '1.5.9', '3.1.0']
+        for pattern in [Range('>=1.2.3-beta.1+b <2 || ~1.5 || 3.x'), Range('v1.2 - 1.4', loose=True), Range('*')]:
+            copies = [pickle.loads(pickle.dumps(pattern, protocol)) for protocol in range(pickle.HIGHEST_PROTOCOL + 1)]
+            for copy in copies + [Range.from_bytes(pattern.to_bytes())]:
+                self.assertEqual((copy.pattern, copy.loose, copy.ranges),
+                                 (pattern.pattern, pattern.loose, pattern.ranges))
+                self.assertEqual([version in copy for version in versions],
+                                 [version in pattern for version in versions])
+        for data in [b'R', Range('1.2.3').to_bytes()[:-1], Version('1.2.3').to_bytes()]:
+            with self.assertRaises(ValueError):
+                Range.from_bytes(data)
+
+    def test_parse_many(self):
+        ranges, errors = parse_ranges_many(['^1.2', 'blerg', 1, '^1.2', '>=1.2.3-beta <2'])
+        self.assertEqual(errors, [None, ParseError.INVALID_RANGE, ParseError.NOT_A_STRING, None, None])
+        self.assertIs(ranges[0], ranges[3])
+        self.assertEqual([str(r) if r else None for r in ranges], ['^1.2', None, None, '^1.2', '>=1.2.3-beta <2'])
+        self.assertIn('1.2.3-beta.1', ranges[4])
+
     def test_min_satisfying(self):
         data = [
             [['1.2.3', '1.2.4'], '1.2', '1.2.3'],
@@ -710,6 +910,1229 @@ class RangeTestCase(unittest.TestCase):
             pattern = Range(pattern, loose=True)
             self.assertEqual(pattern.highest_version(versions), expected)
 
+    def test_top_satisfying(self):
+        versions = ['1.2.3', '1.2.4', '1.3.0-beta', '1.3.0', '2.0.0', '1.2.4', '0.9.0', '1.2.4+build.1']
+        pattern = Range('^1.2.3')
+        self.assertEqual(pattern.top_satisfying(versions, 3), ['1.3.0', '1.2.4', '1.2.4'])
+        self.assertEqual(pattern.top_satisfying(iter(versions), 2, highest=False), ['1.2.3', '1.2.4+build.1'])
+        self.assertEqual(pattern.top_satisfying(versions, 10), sorted(
+            (version for version in map(Version, versions) if version in pattern), reverse=True
+        ))
+        self.assertEqual(pattern.top_satisfying(versions, 0), [])
+        self.assertEqual(Range('>3').top_satisfying(versions, 5), [])
+
+    def test_simplify(self):
+        versions = ['1.1.0', '1.2.0', '1.2.1', '1.3.0', '2.0.0', '2.1.0', '3.0.0', '1.3.0-beta', '2.1.0']
+        data = [
+            ['1.2.0 || 1.2.1 || 1.3.0 || ^1.2.1', '1.2.0 - 1.2.1 || 1.3.0'],
+            ['>=1.2.0 <1.3.0 || 2.1.0 || 2.0.0', '1.2.0 - 1.2.1 || 2.0.0 - 2.1.0'],
+            ['1.1.0||1.2.0||1.2.1||1.3.0||2.0.0||2.1.0', '<=1.2.1 || 1.3.0 - 2.1.0'],
+            ['1.1.0||1.2.0||1.2.1||1.3.0||2.0.0||2.1.0||3.0.0', '<=1.2.1 || >=1.3.0'],
+            ['>=2.0.0 || 1.1.0 || 1.2.0', '<=1.2.0 || >=2.0.0'],
+            ['^1.0.0 || ^2.0.0 || 3.0.0', '<=1.2.1 || >=1.3.0'],
+            ['>9', None],
+            # 1.2.0 - 2.1.0 would not match the pre-release, so the range is kept
+            ['1.2.0 || 1.2.1 || 1.3.0 || 2.0.0 || 2.1.0 || ~1.2.0-alpha', None],
+        ]
+        for pattern, expected in data:
+            version_range = Range(pattern)
+            simplified = version_range.simplify(iter(versions))
+            self.assertEqual(str(simplified), expected or str(version_range), pattern)
+            self.assertEqual([version in simplified for version in map(Version, versions)],
+                             [version in version_range for version in map(Version, versions)], pattern)
+        self.assertIsInstance(Range('v1.2.0 || v1.2.1', loose=True).simplify(versions), Range)
+        self.assertTrue(Range('v1.2.0 || v1.2.1 || v1.3.0', loose=True).simplify(versions).loose)
+
+    def test_min_version(self):
+        data = [
+            ['*', '0.0.0'],
+            ['* || >=2', '0.0.0'],
+            ['>=2 || >1.0.0', '1.0.1'],
+            ['>=1.0.0', '1.0.0'],
+            ['>1.0.0', '1.0.1'],
+            ['<=2.0.0', '0.0.0'],
+            ['1.x', '1.0.0'],
+            ['>1.0', '1.1.0'],
+            ['2.0.0 - 2.1', '2.0.0'],
+            ['^1.0.0-0', '1.0.0-0'],
+            ['>1.0.0-0', '1.0.0'],  # unlike npm, pre-releases do not satisfy exclusive comparators
+            ['<=1.2.3-rc', '0.0.0-0'],
+            ['>=1.2.3-beta <1.2.3', '1.2.3-beta'],
+            ['>=1.0.0 <1.0.0', None],
+            ['<0.0.0-beta', None],
+            ['>*', None],
+        ]
+        for pattern, expected in data:
+            version = Range(pattern).min_version()
+            self.assertEqual(version, expected, msg='Minimum version of %s should be %s' % (pattern, expected))
+            if version is not None:
+                self.assertIn(version, Range(pattern))
+
+    def test_outside(self):
+        greater = [
+            ['~1.2.2', '1.3.0'],
+            ['1.0.0 - 2.0.0', '2.0.1'],
+            ['1.0.0', '1.0.1-beta1'],
+            ['<=2.0.0', '2.1.1'],
+            ['^1', '2.0.0'],
+            ['<1.2.3-beta || =1.2.2', '1.2.3-beta'],
+        ]
+        less = [
+            ['~1.2.2', '1.2.1'],
+            ['1.0.0 - 2.0.0', '0.9.9'],
+            ['>1.0.0', '1.0.0'],
+            ['>=1.0.0-beta.2 || 2.x', '1.0.0-beta.1'],
+            ['*', '0.0.0-0'],
+        ]
+        neither = [
+            ['~1.2.2', '1.2.4'],
+            ['*', '1.2.3'],
+            ['<1.0.0 || >2.0.0', '1.5.0'],
+            ['^1.0.0', '1.5.0-beta'],
+            ['>=1.2.3-beta', '9.0.0-beta'],
+            ['<=1.2.3-rc', '0.0.1-alpha'],
+        ]
+        for data, is_greater, is_less in [(greater, True, False), (less, False, True), (neither, False, False)]:
+            for pattern, version in data:
+                msg = '%s and %s' % (pattern, version)
+                pattern = Range(pattern)
+                self.assertEqual(pattern.is_greater_than(version), is_greater, msg=msg)
+                self.assertEqual(pattern.outside(version, '>'), is_greater, msg=msg)
+                self.assertEqual(pattern.is_less_than(version), is_less, msg=msg)
+                self.assertEqual(pattern.outside(version, '<'), is_less, msg=msg)
+        # vacuously true when no version satisfies the range
+        self.assertTrue(Range('<*').is_greater_than('0.0.0'))
+        self.assertTrue(Range('<*').is_less_than('0.0.0'))
+        with self.assertRaises(ValueError):
+            Range('*').outside('1.0.0', '=')
+
+    def test_bounds_against_versions(self):
+        versions = sorted(Version('%d.%d.%d%s' % (major, minor, patch, pre_release))
+                          for major, minor, patch in itertools.product(range(4), range(3), range(3))
+                          for pre_release in ('', '-0', '-beta', '-beta.2', '-rc'))
+        rng = random.Random(39)
+        partials = ['*', '1', '1.1', '1.1.1', '2.0.0-beta', '1.1.1-rc', '0.1', '2.x', '0.0.0']
+        for _ in range(500):
+            groups = (' '.join(rng.choice(['', '^', '~', '>', '>=', '<', '<=']) + rng.choice(partials)
+                               for _ in range(rng.randint(1, 2)))
+                      for _ in range(rng.randint(1, 2)))
+            pattern = Range(' || '.join(groups))
+            matching = [version for version in versions if version in pattern]
+            lowest = pattern.min_version()
+            if matching:
+                self.assertIn(lowest, pattern)
+                self.assertLessEqual(lowest, matching[0])
+            for version in versions:
+                if pattern.is_greater_than(version):
+                    self.assertTrue(all(match < version for match in matching))
+                if pattern.is_less_than(version):
+                    self.assertTrue(all(match > version for match in matching))
+
+
+class ScanTestCase(unittest.TestCase):
+    text = 'built 1.2.3-beta.1+exp.sha.5114f85 with node v18.17.0, python3.8 and 1.2.3.4; 01.02.03 is loose\n'
+
+    def test_coerce(self):
+        data = [
+            ['v2', '2.0.0'],
+            ['version 1.2 is out', '1.2.0'],
+            ['42.6.7.9.3-alpha', '42.6.7'],
+            ['1.2.3-beta+build', '1.2.3'],
+            ['node-12', '12.0.0'],
+            ['.5.6.7', '5.6.7'],
+            ['python3.8', '3.8.0'],
+            ['12345678901234567.1', '1.0.0'],
+        ]
+        for text, expected in data:
+            self.assertEqual(str(coerce(text)), expected, msg='Coerced %s' % text)
+        self.assertIsNone(coerce('no version'))
+        self.assertIsNone(coerce('12345678901234567'))
+        for value in (None, b'1.2.3', ['1.2.3'], True):
+            self.assertIsNone(coerce(value), msg='Coerced %r' % (value,))
+        self.assertEqual(coerce(42), '42.0.0')
+        self.assertEqual(coerce(1.5), '1.5.0')
+
+    def test_scan(self):
+        full = [(6, '1.2.3-beta.1+exp.sha.5114f85'), (46, '18.17.0'), (69, '1.2.3'), (78, '1.2.3')]
+        partial = [(6, '1.2.3'), (46, '18.17.0'), (61, '3.8.0'), (69, '1.2.3'), (78, '1.2.3')]
+        self.assertEqual([(offset, str(version)) for offset, version in scan_versions([self.text])], full)
+        self.assertEqual([(offset, str(version)) for offset, version in scan_versions([self.text], partial=True)],
+                         partial)
+
+    def test_chunk_boundaries(self):
+        for partial in (False, True):
+            expected = list(scan_versions([self.text * 3], partial=partial))
+            for chunk_size in range(1, 20):
+                self.assertEqual(list(scan_versions(io.StringIO(self.text * 3), chunk_size, partial)), expected)
+                self.assertEqual(list(scan_versions(io.BytesIO((self.text * 3).encode()), chunk_size, partial)),
+                                 expected)
+
+
+class VersionBufferTestCase(unittest.TestCase):
+    data = (b'1.2.3\n1.10.0-beta.2+exp.sha.5114f85\r\n\n2.0.0-rc.1\nv1.2.4\n01.2.3\n1.2\n1.2.3-\xff\n'
+            b'99999999999999999999.0.0\n0.0.0+build\n1.2.3')
+
+    def test_parse(self):
+        expected = ['1.2.3', '1.10.0-beta.2+exp.sha.5114f85', '2.0.0-rc.1', '99999999999999999999.0.0', '0.0.0+build',
+                    '1.2.3']
+        for data in (self.data, bytearray(self.data), memoryview(self.data)):
+            versions = VersionBuffer(data)
+            self.assertEqual(len(versions), 6)
+            self.assertEqual([versions.string(i) for i in range(len(versions))], expected)
+            self.assertEqual([version.to_parts() for version in versions],
+                             [Version(version).to_parts() for version in expected])
+            self.assertEqual([versions.key(i) for i in range(len(versions))],
+                             [Version(version)._sort_key for version in expected])
+            self.assertEqual(versions.errors, [
+                (49, ParseError.NOT_NUMERIC), (56, ParseError.LEADING_ZERO), (63, ParseError.NOT_NUMERIC),
+                (67, ParseError.NOT_A_STRING),
+            ])
+            self.assertEqual(versions.offset(1), 6)
+            self.assertEqual(versions.parts(2), (2, 0, 0, 'rc.1', None))
+            self.assertEqual(versions[-1], '1.2.3')
+            with self.assertRaises(IndexError):
+                versions[6]
+
+    def test_loose(self):
+        versions = VersionBuffer(self.data, loose=True)
+        self.assertEqual([versions.string(i) for i in range(len(versions))][3:5], ['v1.2.4', '01.2.3'])
+        self.assertEqual([versions.parts(3), versions.parts(4)], [(1, 2, 4, None, None), (1, 2, 3, None, None)])
+        self.assertTrue(versions[3].loose)
+        self.assertEqual(len(versions.errors), 2)
+
+    def test_matching(self):
+        versions = VersionBuffer(self.data, loose=True)
+        expected = sorted(versions)
+        self.assertEqual([versions[i] for i in versions.sorted_indices()], expected)
+        self.assertEqual([versions[i] for i in versions.sorted_indices(reverse=True)], expected[::-1])
+        for pattern in ('^1.2.0', '>=1.2.3 <2', '*', '>=2.0.0-0', '>999', '<1.0.0'):
+            version_range = Range(pattern)
+            self.assertEqual(list(versions.satisfying(version_range)),
+                             [version for version in versions if version in version_range])
+            self.assertEqual(versions.lowest_version(pattern), version_range.lowest_version(list(versions)))
+            self.assertEqual(versions.highest_version(version_range), version_range.highest_version(list(versions)))
+
+    def test_mmap(self):
+        with tempfile.TemporaryFile() as f:
+            f.write((self.data + b'\n') * 1000)
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                versions = VersionBuffer(buffer)
+                self.assertEqual(len(versions), 6000)
+                self.assertEqual(versions.offset(6), len(self.data) + 1)
+                self.assertEqual(len(versions.errors), 4000)
+                self.assertEqual(versions.highest_version('^1'), '1.2.3')
+                self.assertEqual(versions.highest_version('*'), '99999999999999999999.0.0')
+                self.assertEqual(versions.lowest_version('<1'), '0.0.0+build')
+                del versions
+
+
+class RangeCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'ranges.cache')
+
+    def test_round_trip(self):
+        patterns = [('^1.2.3', False), ('>=1.2.3-beta <2 || 3.x', False), ('v1.2 - 1.4', True), ('^1.2.3', True)]
+        with RangeCache(self.path) as cache:
+            for pattern, loose in patterns:
+                cache.range(pattern, loose)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['ranges.cache'])
+        with RangeCache(self.path) as cache:
+            self.assertEqual(len(cache), 4)
+            for pattern, loose in patterns:
+                self.assertIn((pattern, loose), cache)
+                cached = cache.range(pattern, loose)
+                self.assertEqual((cached.pattern, cached.loose, cached.ranges),
+                                 (pattern, loose, Range(pattern, loose=loose).ranges))
+            self.assertFalse(cache._dirty)
+            cache.range('~2')
+        self.assertEqual(len(RangeCache(self.path)), 5)
+
+    def test_invalidation(self):
+        with RangeCache(self.path) as cache:
+            cache.range('^1.2.3')
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        for stale in [content[:4] + b'\xff\xff' + content[6:], content[:-1], content[:3], b'']:
+            with open(self.path, 'wb') as f:
+                f.write(stale)
+            with RangeCache(self.path) as cache:
+                self.assertEqual(len(cache), 0)
+                self.assertTrue(cache._dirty)
+            self.assertFalse(RangeCache(self.path)._dirty, msg='Stale cache should have been rewritten')
+
+    def test_save_unmapped(self):
+        with RangeCache(self.path) as cache:
+            cache.range('^1.2.3')
+        cache = RangeCache(self.path)
+        self.addCleanup(cache.close)
+        cache.range('~2')
+        replace, mapped = os.replace, []
+
+        def failing_replace(source, destination):
+            mapped.append(cache._mmap is not None)
+            raise PermissionError('in use')
+
+        self.addCleanup(setattr, os, 'replace', replace)
+        os.replace = failing_replace
+        with self.assertRaises(PermissionError):
+            cache.save()
+        self.assertEqual(mapped, [False], msg='The mapped file cannot be replaced on Windows')
+        self.assertTrue(cache._dirty)
+        self.assertEqual(str(cache.range('^1.2.3')), '^1.2.3')
+        os.replace = replace
+        cache.save()
+        self.assertEqual(len(RangeCache(self.path)), 2)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['ranges.cache'])
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    versions = ['1.0.0', '1.2.0', '1.10.0', '2.0.0-beta', '2.0.0']
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'results.sqlite')
+
+    def test_digest(self):
+        digest = versions_digest(self.versions)
+        self.assertEqual(versions_digest(iter(self.versions)), digest)
+        self.assertEqual(versions_digest(map(Version, self.versions)), digest)
+        self.assertNotEqual(versions_digest(self.versions[1:]), digest)
+        self.assertNotEqual(versions_digest(self.versions + ['1.2.0']), digest)
+        self.assertEqual(versions_digest(reversed(self.versions)), digest)
+        self.assertNotEqual(versions_digest(self.versions[:1] * 2), versions_digest(self.versions[:1]))
+
+    def test_order(self):
+        with ResultCache(self.path) as cache:
+            self.assertEqual(cache.satisfying('^1.0.0', self.versions), ['1.0.0', '1.2.0', '1.10.0'])
+            self.assertEqual(cache.satisfying('^1.0.0', self.versions[::-1]), ['1.0.0', '1.2.0', '1.10.0'])
+            self.assertEqual(cache.satisfying('^1.0.0', self.versions + ['1.2.0']),
+                             ['1.0.0', '1.2.0', '1.2.0', '1.10.0'])
+            self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_persistence(self):
+        with ResultCache(self.path) as cache:
+            self.assertEqual(cache.highest_version('^1.0.0', self.versions), '1.10.0')
+            self.assertEqual(cache.lowest_version('^1.0.0', self.versions), '1.0.0')
+            self.assertEqual(cache.satisfying('>=1.2.0', self.versions), ['1.2.0', '1.10.0', '2.0.0'])
+            self.assertIsNone(cache.highest_version('^3', self.versions))
+            self.assertEqual(cache.satisfying('^3', self.versions), [])
+            self.assertEqual((cache.hits, cache.misses), (0, 5))
+        with ResultCache(self.path) as cache:
+            self.assertEqual(len(cache), 5)
+            self.assertEqual(cache.highest_version('>=1.0.0 <2.0.0', reversed(self.versions)), '1.10.0')
+            self.assertEqual(cache.lowest_version(Range('^1'), self.versions), '1.0.0')
+            self.assertEqual(cache.satisfying('>=1.2', self.versions), ['1.2.0', '1.10.0', '2.0.0'])
+            self.assertIsNone(cache.highest_version('^3', self.versions))
+            self.assertEqual(cache.satisfying('^3.0.0', self.versions), [])
+            self.assertEqual((cache.hits, cache.misses), (5, 0))
+            self.assertEqual(cache.highest_version('^1.0.0', self.versions + ['1.11.0']), '1.11.0')
+            self.assertEqual(cache.misses, 1)
+            with self.assertRaises(ValueError):
+                cache.highest_version('^1.0.0', ['v1.12.0'])
+        with ResultCache(self.path, loose=True) as cache:
+            self.assertEqual(cache.highest_version('^1.0.0', ['v1.12.0']), '1.12.0')
+            self.assertEqual(cache.misses, 1)
+
+    def test_loose(self):
+        versions = ['1.2.3-beta.01', 'v1.2.4']
+        for _ in range(2):  # computed, then read back
+            with ResultCache(self.path, loose=True) as cache:
+                self.assertEqual(cache.lowest_version('>=1.2.3-beta.0', versions), Version('1.2.3-beta.01', loose=True))
+                self.assertEqual(cache.highest_version(Range('>=1.2.3-beta.0', loose=True), versions), '1.2.4')
+                self.assertEqual(cache.satisfying('>=1.2.3-beta.0', versions), [
+                    Version('1.2.3-beta.01', loose=True), Version('1.2.4'),
+                ])
+                self.assertTrue(cache.lowest_version('>=1.2.3-beta.0', versions).loose)
+        self.assertEqual((cache.hits, cache.misses), (4, 0))
+
+    def test_eviction(self):
+        with ResultCache(self.path, max_entries=20) as cache:
+            for minor in range(50):
+                cache.highest_version('^1.%d' % minor, self.versions)
+                cache.highest_version('^1.0.0', self.versions)
+                self.assertLessEqual(len(cache), 20)
+        with ResultCache(self.path) as cache:
+            self.assertLessEqual(len(cache), 20)
+            cache.highest_version('^1.0.0', self.versions)
+            cache.highest_version('^1.49', self.versions)
+            self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_invalidation(self):
+        with ResultCache(self.path) as cache:
+            cache.highest_version('^1.0.0', self.versions)
+        connection = sqlite3.connect(self.path)
+        connection.execute("UPDATE meta SET value = '0' WHERE key = 'format'")
+        connection.commit()
+        connection.close()
+        with ResultCache(self.path) as cache:
+            self.assertEqual(len(cache), 0)
+
+    def test_shared_file(self):
+        first, second = ResultCache(self.path), ResultCache(self.path)
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+        self.assertEqual(first.highest_version('^1.0.0', self.versions), '1.10.0')
+        self.assertEqual(first.highest_version('^1.0.0', self.versions), '1.10.0')
+        start = time.monotonic()
+        self.assertEqual(second.highest_version('^1.0.0', self.versions), '1.10.0')
+        self.assertEqual(second.lowest_version('^1.0.0', self.versions), '1.0.0')
+        self.assertLess(time.monotonic() - start, 1, msg='Writes should not wait for the other instance')
+        self.assertEqual(first.lowest_version('^1.0.0', self.versions), '1.0.0')
+        self.assertEqual((first.hits, first.misses, second.hits, second.misses), (2, 1, 1, 1))
+
+        errors = []
+
+        def query():
+            try:
+                with ResultCache(self.path) as cache:
+                    for minor in range(20):
+                        self.assertEqual(cache.satisfying('~1.%d' % (minor % 3), self.versions),
+                                         [['1.0.0'], [], ['1.2.0']][minor % 3])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=query) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class VersionIndexTestCase(unittest.TestCase):
+    def test_sorted_set(self):
+        index = VersionIndex(['1.2.3', '1.0.0', '1.2.3', '2.0.0-beta', '0.1.0'])
+        self.assertEqual(list(index), ['0.1.0', '1.0.0', '1.2.3', '2.0.0-beta'])
+        index.add('1.1.0')
+        index.add('1.0.0')
+        self.assertEqual(list(index), ['0.1.0', '1.0.0', '1.1.0', '1.2.3', '2.0.0-beta'])
+        self.assertIn('1.1.0', index)
+        index.remove('1.1.0')
+        self.assertNotIn('1.1.0', index)
+        with self.assertRaises(KeyError):
+            index.remove('1.1.0')
+        index.discard('1.1.0')
+        self.assertEqual(len(index), 4)
+
+    def test_satisfying(self):
+        versions = ['1.1.0', '1.2.0', '1.2.1', '1.3.0', '2.0.0b1', '2.0.0b2', '2.0.0', '2.1.0']
+        index = VersionIndex(versions, loose=True)
+        for pattern in ['~2.0.0', '1.2', '^1.0.0', '>=1.3.0', '<1.0.0', '2.0.0b2 - 2.0.0']:
+            version_range = Range(pattern, loose=True)
+            self.assertEqual(index.highest_version(pattern), version_range.highest_version(versions))
+            self.assertEqual(index.lowest_version(pattern), version_range.lowest_version(versions))
+
+    def test_memoized_answers(self):
+        index = VersionIndex(['1.0.0', '1.1.0', '2.0.0'])
+        caret = Range('^1.0.0')
+        self.assertEqual(index.highest_version(caret), '1.1.0')
+        self.assertEqual(index.lowest_version(caret), '1.0.0')
+        self.assertIsNone(index.highest_version('>=3'))
+
+        index.add('1.5.0')
+        index.add('0.9.0')
+        index.add('3.1.0')
+        self.assertEqual(index.highest_version(caret), '1.5.0')
+        self.assertEqual(index.lowest_version(caret), '1.0.0')
+        self.assertEqual(index.highest_version('>=3'), '3.1.0')
+
+        index.remove('1.5.0')
+        index.remove('1.0.0')
+        self.assertEqual(index.highest_version(caret), '1.1.0')
+        self.assertEqual(index.lowest_version(caret), '1.1.0')
+        index.remove('1.1.0')
+        self.assertIsNone(index.highest_version(caret))
+
+    def test_memo_is_keyed_by_pattern_and_bounded(self):
+        index = VersionIndex(['1.0.0', '1.1.0', '2.0.0'], max_ranges=8)
+        for _ in range(100):
+            self.assertEqual(index.highest_version(Range('^1')), '1.1.0')
+        self.assertEqual(index.highest_version('^1'), '1.1.0')
+        self.assertEqual(len(index._cache), 1)
+        for minor in range(50):
+            self.assertEqual(index.lowest_version(Range('>=1.%d' % minor)), '1.1.0' if minor == 1 else (
+                '1.0.0' if not minor else '2.0.0'
+            ))
+        self.assertEqual(len(index._cache), 8)
+        index.add('1.5.0')
+        self.assertEqual(index.highest_version('^1'), '1.5.0')
+        self.assertEqual(index.lowest_version(Range('>=1.2', loose=True)), '1.5.0')
+
+    def test_latest(self):
+        index = VersionIndex(['1.0.0', '1.2.0', '1.3.0-beta', '2.0.0', '2.1.0-rc.1', '3.0.0-alpha', '0.5.0'])
+        self.assertEqual(index.latest(), '2.0.0')
+        self.assertEqual(index.latest(include_prerelease=True), '3.0.0-alpha')
+        self.assertEqual(index.latest(1), '1.2.0')
+        self.assertEqual(index.latest(1, include_prerelease=True), '1.3.0-beta')
+        self.assertEqual(index.latest(0), '0.5.0')
+        self.assertIsNone(index.latest(3))
+        self.assertIsNone(index.latest(4))
+        self.assertIsNone(VersionIndex().latest())
+
+    def test_binary_search(self):
+        versions = ['0.0.0+build.5', '1.2.3-beta', '1.2.3+build', '1.2.3', '1.2.4+1', '1.2.4', '2.0.0-rc.1', '2.0.0']
+        index = VersionIndex(versions)
+        for pattern in ['<*', '>1.2.3 <1.2.4', '>=1.2.3-beta <1.2.3', '<=1.2.3', '^1 || >=2.0.0-rc.1', '>2', '*']:
+            version_range = Range(pattern)
+            self.assertEqual(index.highest_version(version_range), version_range.highest_version(versions))
+            self.assertEqual(index.lowest_version(version_range), version_range.lowest_version(versions))
+        for versions, pattern in [
+            (['1.2.3-rc.1+build.7'], '1.2.3-rc.1 >1.5.0'),
+            (['0.0.0-0+b'], '<=1.0.0-beta >=2.0.0'),
+            (['1.0.0-beta+b', '1.0.0-beta', '1.0.0-beta.1+b'], '<=1.0.0-beta+x >=2.0.0'),
+        ]:
+            version_range, index = Range(pattern), VersionIndex(versions)
+            self.assertEqual(index.highest_version(version_range), version_range.highest_version(versions))
+            self.assertEqual(index.lowest_version(version_range), version_range.lowest_version(versions))
+            self.assertIsNotNone(index.highest_version(version_range))
+
+
+class OutdatedTestCase(unittest.TestCase):
+    provider = DictProvider({
+        'a': dict.fromkeys(['1.0.0', '1.1.0', '1.2.0', '2.0.0', '2.1.0', '3.0.0-beta.1', 'not a version']),
+        'b': dict.fromkeys(['0.1.0', '0.1.1', '0.2.0']),
+        'c': dict.fromkeys(['1.0.0']),
+    })
+
+    def test_plan(self):
+        manifest = collections.OrderedDict([
+            ('a', '^1.0.0'), ('b', '~0.1.0'), ('c', '^1.0.0'), ('d', '*'), ('e', 'github:user/e'), ('f', '^1'),
+        ])
+        rows = plan(manifest, {'a': '1.0.0', 'c': '1.0.0', 'f': '1.0.0'}, self.provider)
+        self.assertEqual([row.package for row in rows], list(manifest))
+        self.assertEqual(rows[0], Outdated('a', '^1.0.0', '1.0.0', '1.2.0', '2.1.0', '1.2.0'))
+        self.assertEqual(rows[1], Outdated('b', '~0.1.0', None, '0.1.1', '0.2.0', '0.2.0'))
+        self.assertEqual(rows[2], Outdated('c', '^1.0.0', '1.0.0', '1.0.0', '1.0.0', '1.0.0'))
+        self.assertEqual(rows[3], Outdated('d', '*', None, None, None, None))
+        self.assertEqual(rows[4], Outdated('e', 'github:user/e', None, None, None, None))
+        self.assertEqual(rows[5], Outdated('f', '^1', '1.0.0', None, None, None))
+        self.assertEqual([row.is_outdated for row in rows], [True, True, False, False, False, False])
+
+    def test_shared_indexes(self):
+        planner = Planner(self.provider)
+        rows = planner.plan(dict(('dependency-%d' % i, '^1.%d' % (i % 3)) for i in range(50)))
+        self.assertEqual(len(rows), 50)
+        first = planner.plan({'a': '^1.1'}, {'a': '2.0.0'})[0]
+        self.assertIs(planner.index('a'), planner.index('a'))
+        self.assertEqual((first.wanted, first.latest_in_major), ('1.2.0', '2.1.0'))
+        self.assertTrue(first.is_outdated)
+
+
+class IngestTestCase(unittest.TestCase):
+    documents = [
+        {'_id': 'a', 'name': 'a', 'versions': {'1.0.0': {'main': 'index.js'}, '1.2.0': {}, '0.9.0': {}, 'bad': {}}},
+        {'id': 'b', 'doc': {'_id': 'b', 'versions': {'2.0.0-beta': {}, '1.0.0': {}}}},
+        {'versions': ['1.0.0'], 'name': 'c\u00e9'},
+        {'name': 'd', 'versions': {}},
+    ] + [{'name': 'package-%d' % i, 'versions': ['1.%d.0' % j for j in range(i % 5)]} for i in range(40)]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.lines = [json.dumps(document) for document in self.documents] + ['', 'not json', '[1, 2]']
+        self.path = os.path.join(self.directory, 'dump.json.gz')
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            f.write('\n'.join(self.lines) + '\n')
+
+    def assertIndexes(self, indexes, shards=range(3)):
+        indexes = dict((name, list(map(str, index))) for name, index in indexes)
+        expected = {'a': ['0.9.0', '1.0.0', '1.2.0'], 'b': ['1.0.0', '2.0.0-beta'], 'c\u00e9': ['1.0.0'], 'd': []}
+        expected.update(('package-%d' % i, ['1.%d.0' % j for j in range(i % 5)]) for i in range(40))
+        self.assertEqual(indexes, dict((name, versions) for name, versions in expected.items()
+                                       if shard_of(name, 3) in shards))
+
+    def test_iter_indexes(self):
+        progress = Progress()
+        self.assertIndexes(iter_indexes(self.path, progress=progress))
+        self.assertEqual((progress.lines, progress.invalid_lines, progress.packages), (46, 2, 44))
+        self.assertEqual((progress.versions, progress.invalid_versions), (86, 1))
+        self.assertIndexes(iter_indexes(iter(self.lines)))
+        self.assertIndexes(iter_indexes(line.encode('utf-8') for line in self.lines))
+        index = dict(iter_indexes(self.lines))['a']
+        self.assertEqual(index.highest_version('^1'), '1.2.0')
+
+    def test_shards(self):
+        progress, indexes = Progress(), []
+        for shard in range(3):
+            shard_progress = Progress()
+            shard_indexes = list(iter_indexes(self.path, shard=shard, shards=3, progress=shard_progress))
+            self.assertTrue(all(shard_of(name, 3) == shard for name, _ in shard_indexes))
+            progress.update(shard_progress)
+            indexes.extend(shard_indexes)
+        self.assertIndexes(indexes)
+        self.assertEqual((progress.lines, progress.invalid_lines, progress.packages), (46, 2, 44))
+
+    def test_index_files(self):
+        path = os.path.join(self.directory, 'indexes')
+        progress = write_indexes(self.lines, path, shard=1, shards=3)
+        self.assertIndexes(read_indexes(path), shards=[1])
+        self.assertEqual(progress.packages, len(list(read_indexes(path))))
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 1)
+        with self.assertRaises(ValueError):
+            list(read_indexes(path))
+        with self.assertRaises(ValueError):
+            list(read_indexes(self.path))
+
+    def test_ingest(self):
+        for workers in (None, 2):
+            directory = os.path.join(self.directory, str(workers))
+            os.mkdir(directory)
+            progress = Progress()
+            paths = ingest(self.path, directory, shards=3, workers=workers, progress=progress)
+            self.assertEqual(len(paths), 3)
+            for shard, path in enumerate(paths):
+                self.assertTrue(all(shard_of(name, 3) == shard for name, _ in read_indexes(path)))
+            self.assertIndexes(itertools.chain.from_iterable(map(read_indexes, paths)))
+            self.assertEqual((progress.lines, progress.packages, progress.versions), (46, 44, 86))
+
+    def test_ingest_reads_dump_once(self):
+        module = sys.modules[ingest.__module__]
+        log = os.path.join(self.directory, 'opened')
+        open_dump = module.open_dump
+
+        def logged_open_dump(path):
+            with open(log, 'a') as f:  # appended to by forked workers too
+                f.write(path + '\n')
+            return open_dump(path)
+
+        self.addCleanup(setattr, module, 'open_dump', open_dump)
+        module.open_dump = logged_open_dump
+        directory = os.path.join(self.directory, 'indexes')
+        os.mkdir(directory)
+        progress = Progress()
+        paths = ingest(self.path, directory, shards=3, workers=2, progress=progress)
+        self.assertIndexes(itertools.chain.from_iterable(map(read_indexes, paths)))
+        self.assertEqual((progress.lines, progress.invalid_lines, progress.packages), (46, 2, 44))
+        with open(log) as f:
+            self.assertEqual([path for path in f.read().splitlines() if path == self.path], [self.path])
+        self.assertEqual(sorted(os.listdir(directory)), ['shard-0.svix', 'shard-1.svix', 'shard-2.svix'])
+
+
+class ExternalSortTestCase(unittest.TestCase):
+    versions = [
+        '1.0.0', '1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-alpha.beta', '1.0.0-beta', '1.0.0-beta.2', '1.0.0-beta.11',
+        '1.0.0-rc.1', '1.0.0+build.1', '1.0.0-rc.1+build.1', '2.0.0', '2.1.0', '2.1.1', '10.0.0', '256.0.0',
+        '1.0.0-1', '1.0.0-1000', '1.0.0-a-', '1.0.0-a', '1.2.3+001', '1.2.3+1', '99999999999999999999.0.0',
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_byte_key(self):
+        expected = sorted(map(Version, self.versions))
+        self.assertEqual(sorted(self.versions, key=byte_key), expected)
+        self.assertEqual(sorted(map(Version, self.versions), key=byte_key), expected)
+        self.assertEqual(byte_key('v1.2.3', loose=True), byte_key('1.2.3'))
+        self.assertEqual(byte_key('1.2.3+001'), byte_key('1.2.3+1'))
+        with self.assertRaises(ValueError):
+            byte_key('1.2')
+
+    def test_sort(self):
+        versions = self.versions * 20
+        random.Random(1).shuffle(versions)
+        expected = sorted(versions, key=lambda version: Version(version)._sort_key)
+        for memory, fan_in in ((1 << 20, 64), (2000, 2), (5000, 3)):
+            self.assertEqual(list(external_sort(versions, memory=memory, fan_in=fan_in, directory=self.directory)),
+                             expected)
+            self.assertEqual(os.listdir(self.directory), [])
+        # versions such as 1.2.3+001 and 1.2.3+1 are equal but hash like their different strings
+        unique_keys = collections.OrderedDict((Version(version)._sort_key, version) for version in reversed(expected))
+        self.assertEqual(list(external_sort(iter(versions), memory=2000, unique=True)),
+                         sorted(unique_keys.values(), key=lambda version: Version(version)._sort_key))
+        self.assertEqual(list(external_sort([])), [])
+
+    def test_pairs(self):
+        pairs = [(name, version) for version in self.versions for name in ('b', 'a', 'a\x00', 'ab', '\u00e9')]
+        random.Random(2).shuffle(pairs)
+
+        def key(pair):
+            return pair[0], Version(pair[1])._sort_key
+
+        expected = sorted(pairs, key=key)
+        self.assertEqual(list(external_sort(pairs, memory=3000, fan_in=2)), expected)
+        self.assertEqual(list(external_sort(pairs + [['a', '1.0.0']], memory=3000, unique=True)), [
+            next(duplicates) for _, duplicates in itertools.groupby(expected, key)
+        ])
+
+    def test_invalid(self):
+        entries = external_sort(['1.0.0', 'v1.0.0', '2.0.0'], memory=1000, directory=self.directory)
+        with self.assertRaises(ValueError):
+            list(entries)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(list(external_sort(['2.0.0', 'v1.0.0'], loose=True)), ['v1.0.0', '2.0.0'])
+
+
+class ThreadSafetyTestCase(unittest.TestCase):
+    def run_threads(self, target, count=8):
+        errors = []
+
+        def run(n):
+            try:
+                target(n)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(n,)) for n in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_lazy_range(self):
+        alternatives = ['^%d.0.0' % major for major in range(1, 21)]
+        versions = ['%d.1.0' % major for major in range(1, 26)]
+        for _ in range(20):
+            pattern = Range(' || '.join(alternatives), lazy=True)
+
+            def match(n):
+                for version in versions[n:] + versions[:n]:
+                    self.assertEqual(version in pattern, int(version.split('.')[0]) <= 20)
+
+            self.run_threads(match)
+            self.assertEqual(pattern.ranges, Range(pattern.pattern).ranges)
+
+    def test_lazy_range_against_eager(self):
+        # threads finishing the compilation of the last alternatives must not make others miss a match
+        alternatives = ['~1.%d.0' % minor for minor in range(8)]
+        eager = Range(' || '.join(alternatives))
+        versions = ['1.%d.3' % minor for minor in range(10)]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+        for _ in range(300):
+            pattern = Range(eager.pattern, lazy=True)
+
+            def match(n):
+                version = versions[-3 - n % 4]
+                self.assertEqual(version in pattern, version in eager, version)
+
+            self.run_threads(match)
+
+    def test_version_index(self):
+        index = VersionIndex(['1.0.0', '1.1.0', '3.0.0'])
+
+        def churn(n):
+            for i in range(200):
+                version = '2.%d.%d' % (n, i)
+                index.add(version)
+                self.assertIn(version, index)
+                self.assertEqual(index.highest_version('^1'), '1.1.0')
+                self.assertEqual(index.highest_version('^2').major, 2)
+                if i % 2:
+                    index.remove(version)
+
+        self.run_threads(churn)
+        self.assertEqual(len(index), 3 + 8 * 100)
+        self.assertEqual(index.highest_version('^2'), '2.7.198')
+        self.assertEqual(index.lowest_version('^2'), '2.0.0')
+
+    def test_sharded_cache(self):
+        cache = ShardedCache(shards=4, max_size=64)
+        results = [[] for _ in range(8)]
+
+        def intern(n):
+            for i in range(500):
+                results[n].append(cache.get(i % 40, lambda: Range('^%d' % (i % 40))))
+
+        self.run_threads(intern)
+        for n in range(1, 8):
+            self.assertTrue(all(a is b for a, b in zip(results[0], results[n])))
+        self.assertLessEqual(len(cache), 64)
+
+
+def highest_shared_version(arguments):
+    shared, pattern = arguments
+    version = shared.highest_version(pattern)
+    return version and str(version)
+
+
+@unittest.skipIf(shared_memory is None, 'shared memory needs Python 3.8 or later')
+class SharedVersionsTestCase(unittest.TestCase):
+    versions = ['1.2.3', '1.0.0', '1.2.3', '2.0.0-beta.2', '2.0.0-beta.10', '2.0.0', '2.1.0+build.5', '0.1.0',
+                '3.0.0-rc.1+exp.sha.5114f85']
+
+    def test_columns(self):
+        with SharedVersions.create(self.versions) as shared:
+            expected = sorted(set(map(Version, self.versions)))
+            self.assertEqual(len(shared), len(expected))
+            self.assertEqual(list(shared), expected)
+            self.assertEqual([str(version) for version in shared], [str(version) for version in expected])
+            self.assertEqual([shared.key(i) for i in range(len(shared))], [v._sort_key for v in expected])
+            self.assertEqual(shared[-1], '3.0.0-rc.1+exp.sha.5114f85')
+            with self.assertRaises(IndexError):
+                shared[len(shared)]
+
+    def test_matching(self):
+        index = VersionIndex(self.versions)
+        with SharedVersions.create(self.versions) as shared, SharedVersions.attach(shared.name) as attached:
+            for pattern in ['^1.0.0', '~1.2', '>=2.0.0-beta.3', '>3.0.0', '*', '2.0.0-beta.2 - 2.0.0 || 0.x']:
+                self.assertEqual(attached.highest_version(pattern), index.highest_version(pattern))
+                self.assertEqual(attached.lowest_version(pattern), index.lowest_version(pattern))
+                expected = sorted(set(version for version in map(Version, self.versions) if version in Range(pattern)))
+                self.assertEqual(list(attached.satisfying(pattern)), expected)
+
+    def test_binary_search(self):
+        versions = ['%d.%d.%d' % parts for parts in itertools.product(range(4), range(20), range(10))]
+        with SharedVersions.create(versions + ['2.0.0-rc.1+build'], loose=True) as shared:
+            keys = []
+            key = shared.key
+            shared.key = lambda index: keys.append(index) or key(index)
+            self.assertEqual(shared.highest_version('~2.5'), '2.5.9')
+            self.assertEqual(shared.lowest_version('>1.19.9'), '2.0.0')
+            self.assertEqual(shared.lowest_version('>=2.0.0-0'), '2.0.0-rc.1+build')
+            self.assertEqual(shared.highest_version('v2.0.0-rc.1 >5'), '2.0.0-rc.1+build')
+            self.assertEqual(shared.lowest_version(Range('>=v3.19.9', loose=True)), '3.19.9')
+            self.assertLess(len(keys), 100)
+            self.assertIsNone(shared.highest_version('>4'))
+            self.assertEqual(list(shared.satisfying('=v1.2.3')), ['1.2.3'])
+            self.assertTrue(pickle.loads(pickle.dumps(shared)).loose)
+
+    def test_invalid_block(self):
+        block = shared_memory.SharedMemory(create=True, size=64)
+        self.addCleanup(block.unlink)
+        unraisable = []
+        hook, sys.unraisablehook = sys.unraisablehook, unraisable.append
+        self.addCleanup(setattr, sys, 'unraisablehook', hook)
+        with self.assertRaises(ValueError):
+            SharedVersions(block)
+        self.assertEqual(unraisable, [], msg='Failed instances should be finalised without errors')
+
+    def test_worker_processes(self):
+        patterns = ['^1', '^2', '<0.1.0', '>=3.0.0-rc']
+        with SharedVersions.create(self.versions) as shared:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(highest_shared_version, [(shared, pattern) for pattern in patterns]))
+        self.assertEqual(results, ['1.2.3', '2.1.0+build.5', None, '3.0.0-rc.1+exp.sha.5114f85'])
+
+
+class DaemonTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.versions_file = os.path.join(self.directory.name, 'versions.json')
+        with open(self.versions_file, 'w') as f:
+            json.dump({'react': ['15.6.2', '16.0.0', '16.14.0', '17.0.2']}, f)
+
+    def test_protocol(self):
+        daemon = Daemon(self.versions_file)
+
+        def respond(request):
+            return json.loads(daemon.respond(json.dumps(request).encode('utf-8')).decode('utf-8'))
+
+        self.assertEqual(respond({'op': 'satisfies', 'version': '1.2.3', 'range': '^1.0.0', 'id': 7}),
+                         {'id': 7, 'result': True})
+        self.assertEqual(respond({'op': 'max_satisfying', 'versions': ['1.0.0', '1.5.0', '2.0.0'], 'range': '^1'}),
+                         {'result': '1.5.0'})
+        self.assertEqual(respond({'op': 'min_satisfying', 'index': 'react', 'range': '>=16'}), {'result': '16.0.0'})
+        self.assertEqual(respond({'op': 'sort', 'versions': ['1.10.0', '1.2.0', '1.2.0-beta']}),
+                         {'result': ['1.2.0-beta', '1.2.0', '1.10.0']})
+        self.assertEqual(respond({'op': 'increment', 'version': '1.2.3', 'level': 'minor'}), {'result': '1.3.0'})
+        self.assertEqual(respond([{'op': 'ping'}, {'op': 'increment', 'version': '1.2.3', 'level': 'huge'}, 3]), [
+            {'result': __version__},
+            {'error': 'Unknown level huge'},
+            {'error': 'request is not an object'},
+        ])
+        self.assertEqual(respond({'op': 'satisfies', 'version': '1.2.3'}), {'error': "missing parameter 'range'"})
+        self.assertEqual(respond({'op': 'max_satisfying', 'index': 'vue', 'range': '*'}),
+                         {'error': "unknown index 'vue'"})
+        self.assertIn('error', respond({'op': 'fly'}))
+        self.assertEqual(json.loads(daemon.respond(b'{').decode('utf-8')), {'error': 'request is not valid JSON'})
+
+    def test_bounded_memos(self):
+        daemon = Daemon(self.versions_file, max_ranges=32)
+        caches = daemon._caches
+        index = caches.named_indexes['react']
+
+        def request(pattern):
+            response = daemon.respond(json.dumps({'op': 'max_satisfying', 'index': 'react', 'range': pattern}))
+            return json.loads(response.decode('utf-8'))['result']
+
+        for cycle in range(3):
+            for minor in range(200):
+                self.assertEqual(request('~16.%d' % minor), '16.14.0' if minor == 14 else (
+                    '16.0.0' if not minor else None
+                ))
+            self.assertLessEqual(len(caches.ranges), 32)
+            self.assertLessEqual(len(index._cache), 32)
+        for _ in range(3):
+            caches.ranges.clear()
+            self.assertEqual(request('^16'), '16.14.0')
+        self.assertEqual(sum(pattern == '^16' for pattern, _ in index._cache), 1)
+
+    def test_socket(self):
+        daemon = Daemon(self.versions_file)
+        path = os.path.join(self.directory.name, 'daemon.sock')
+        server = daemon.serve(path)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with Client(path, timeout=10) as client:
+                self.assertTrue(client.satisfies('1.2.3', '1.x'))
+                self.assertEqual(client.max_satisfying('react', '^16'), '16.14.0')
+                self.assertEqual(client.max_satisfying(['1.0.0', '1.1.0'], Range('~1.0')), '1.0.0')
+                self.assertEqual(client.sort(['2.0.0', '1.0.0'], reverse=True), ['2.0.0', '1.0.0'])
+                self.assertEqual(client.increment(Version('1.2.3-beta.1'), 'prerelease'), '1.2.3-beta.2')
+                results = client.batch([('satisfies', {'version': '1.0.0', 'range': '<1'}), ('fly', {})])
+                self.assertEqual(results[0], False)
+                self.assertIsInstance(results[1], DaemonError)
+                with self.assertRaises(DaemonError):
+                    client.satisfies('1', '1.x')
+
+                self.assertEqual(client.load('vue', ['2.6.14', '3.2.0']), 2)
+                with open(self.versions_file, 'w') as f:
+                    json.dump({'react': ['18.2.0']}, f)
+                self.assertEqual(client.reload(), 2)
+                self.assertEqual(client.max_satisfying('react', '*'), '18.2.0')
+                self.assertEqual(client.max_satisfying('vue', '^3'), '3.2.0')
+                with open(self.versions_file, 'w') as f:
+                    f.write('{')
+                with self.assertRaises(DaemonError):
+                    client.reload()
+                self.assertEqual(client.max_satisfying('react', '*'), '18.2.0')
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.assertFalse(os.path.exists(path))
+
+    def test_socket_in_use(self):
+        daemon = Daemon(self.versions_file)
+        path = os.path.join(self.directory.name, 'daemon.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        server = daemon.serve(path)
+        try:
+            with self.assertRaises(OSError):
+                daemon.serve(path)
+            self.assertTrue(os.path.exists(path), msg='A live daemon\'s socket should be kept')
+        finally:
+            server.server_close()
+        self.assertFalse(os.path.exists(path))
+
+
+class ResolverTestCase(unittest.TestCase):
+    def test_highest_versions(self):
+        provider = DictProvider({
+            'a': {'1.0.0': {'b': '^1.0.0'}, '1.1.0': {'b': '^1.2.0'}, '2.0.0-beta': {}},
+            'b': {'1.0.0': None, '1.2.0': {'c': '~0.1'}, '1.3.0': {'c': '~0.1'}, '2.0.0': {}},
+            'c': {'0.1.0': {}, '0.1.5': {}, '0.2.0': {}},
+        })
+        self.assertEqual(resolve(provider, {'a': '^1'}), {'a': '1.1.0', 'b': '1.3.0', 'c': '0.1.5'})
+        self.assertEqual(resolve(provider, {'a': '^1', 'b': '<1.3'}), {'a': '1.1.0', 'b': '1.2.0', 'c': '0.1.5'})
+        self.assertEqual(resolve(provider, {'a': '^1', 'b': '<1.2'}), {'a': '1.0.0', 'b': '1.0.0'})
+
+    def test_backtracking(self):
+        provider = DictProvider({
+            'a': {'2.0.0': {'x': '2'}, '1.0.0': {'x': '1'}},
+            'b': {'2.0.0': {'y': '2'}, '1.0.0': {'y': '1'}},
+            'x': {'1.0.0': {}, '2.0.0': {'z': '2'}},
+            'y': {'1.0.0': {}, '2.0.0': {'z': '1'}},
+            'z': {'1.0.0': {}, '2.0.0': {}},
+        })
+        solution = resolve(provider, {'a': '*', 'b': '*'})
+        self.assertIn(solution, [
+            {'a': '2.0.0', 'b': '1.0.0', 'x': '2.0.0', 'y': '1.0.0', 'z': '2.0.0'},
+            {'a': '1.0.0', 'b': '2.0.0', 'x': '1.0.0', 'y': '2.0.0', 'z': '1.0.0'},
+        ])
+
+    def test_unsatisfiable(self):
+        provider = DictProvider({
+            'a': {'1.0.0': {'c': '^1'}},
+            'b': {'1.0.0': {'c': '^2'}, '2.0.0': {'c': '^3'}},
+            'c': {'1.0.0': {}, '2.0.0': {}},
+        })
+        with self.assertRaises(ResolutionError):
+            resolve(provider, {'a': '*', 'b': '*'})
+        with self.assertRaises(ResolutionError):
+            resolve(provider, {'d': '*'})
+
+    def test_against_exhaustive_search(self):
+        rng = random.Random(26)
+        names = 'abcde'
+        versions = ['1.0.0', '1.1.0', '2.0.0']
+        patterns = ['^1', '^2', '~1.1', '*', '<2', '>=1.1.0']
+        for _ in range(100):
+            packages = {}
+            for name in names:
+                packages[name] = {}
+                for version in versions:
+                    later = [n for n in names if n != name]
+                    dependencies = rng.sample(later, rng.randint(0, min(2, len(later))))
+                    packages[name][version] = dict((n, rng.choice(patterns)) for n in dependencies)
+            requirements = {'a': rng.choice(patterns), 'b': rng.choice(patterns)}
+            expected = self._exhaustive(packages, requirements)
+            try:
+                solution = resolve(DictProvider(packages), requirements)
+            except ResolutionError:
+                self.assertIsNone(expected, msg='%r with %r is solvable' % (packages, requirements))
+                continue
+            self.assertIsNotNone(expected)
+            self.assertTrue(self._valid(packages, requirements, solution), msg=solution)
+
+    def _valid(self, packages, requirements, solution):
+        wanted = dict((name, [pattern]) for name, pattern in requirements.items())
+        for name in solution:
+            for dependency, pattern in packages[name][str(solution[name])].items():
+                wanted.setdefault(dependency, []).append(pattern)
+        return set(wanted) == set(solution) and all(
+            solution[name] in Range(pattern) for name in wanted for pattern in wanted[name]
+        )
+
+    def _exhaustive(self, packages, requirements):
+        names = sorted(packages)
+        for choice in itertools.product(*[[None] + list(packages[name]) for name in names]):
+            solution = dict((name, Version(version)) for name, version in zip(names, choice) if version)
+            if self._valid(packages, requirements, solution):
+                return solution
+
+
+class FakeRegistry:
+    def __init__(self, packages):
+        self.packages = packages
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    async def _request(self, *key):
+        self.requests.append(key)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            for _ in range(3):
+                await asyncio.sleep(0)
+        finally:
+            self.active -= 1
+
+    async def versions(self, package):
+        await self._request(package)
+        if package not in self.packages:
+            raise LookupError(package)
+        return list(self.packages[package])
+
+    async def dependencies(self, package, version):
+        await self._request(package, version)
+        return self.packages[package][version]
+
+
+class AsyncResolutionTestCase(unittest.TestCase):
+    packages = {
+        'a': {'1.0.0': {'b': '^1.0.0', 'c': '*'}, '1.1.0': {'b': '^1.2.0', 'c': '~0.1'}, '2.0.0-beta': {}},
+        'b': {'1.0.0': None, '1.2.0': {'c': '~0.1'}, '1.3.0': {'c': '~0.1', 'd': '1'}, '2.0.0': {}},
+        'c': {'0.1.0': {}, '0.1.5': {}, '0.2.0': {'d': '2'}},
+        'd': {'1.0.0': {}, '2.0.0': {}},
+    }
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    async def collect(self, iterator):
+        results = []
+        async for result in iterator:
+            results.append(result)
+        return results
+
+    def test_resolution(self):
+        registry = FakeRegistry(self.packages)
+        results = self.run_async(self.collect(resolve_iter(registry, {'a': '^1', 'c': '*'}, concurrency=2)))
+        self.assertEqual(sorted((package, str(version)) for package, version in results), [
+            ('a', '1.1.0'), ('b', '1.3.0'), ('c', '0.1.5'), ('c', '0.2.0'), ('d', '1.0.0'), ('d', '2.0.0'),
+        ])
+        self.assertLessEqual(registry.max_active, 2)
+        self.assertEqual(len(registry.requests), len(set(registry.requests)), msg='Requests should be deduplicated')
+
+    def test_failures(self):
+        with self.assertRaises(ResolutionError):
+            self.run_async(self.collect(resolve_iter(FakeRegistry(self.packages), {'a': '>=3'})))
+        with self.assertRaises(LookupError):
+            self.run_async(self.collect(resolve_iter(FakeRegistry(self.packages), {'e': '*'})))
+
+    def test_cache(self):
+        registry = FakeRegistry(self.packages)
+        cache = MetadataCache(registry, concurrency=1)
+
+        async def query():
+            versions = await asyncio.gather(*(cache.versions('b') for _ in range(5)))
+            highest = await cache.highest_version('b', '<2')
+            return versions, highest
+
+        versions, highest = self.run_async(query())
+        self.assertEqual(list(versions[0]), ['2.0.0', '1.3.0', '1.2.0', '1.0.0'])
+        self.assertEqual(highest, '1.3.0')
+        self.assertEqual(registry.requests, [('b',)])
+
+    def test_cache_across_loops(self):
+        registry = FakeRegistry(self.packages)
+        cache = MetadataCache(registry, concurrency=1)
+
+        async def query(packages):
+            return await asyncio.gather(*(cache.versions(package) for package in packages))
+
+        async def abandon(package):
+            cache.versions(package)
+
+        self.run_async(query('abc'))
+        self.run_async(abandon('d'))  # the request is left unfinished when its loop closes
+        versions = self.run_async(query('abcd'))
+        self.assertEqual([list(package_versions)[0] for package_versions in versions], [
+            '2.0.0-beta', '2.0.0', '0.2.0', '2.0.0',
+        ])
+        self.assertEqual(registry.requests, [('a',), ('b',), ('c',), ('d',), ('d',)])
+        resolved = self.run_async(self.collect(resolve_iter(cache, {'b': '^1'})))
+        self.assertEqual(sorted(str(version) for _, version in resolved), ['0.1.5', '1.0.0', '1.3.0'])
+
+    def test_early_stop(self):
+        def settling():
+            return [task for task in asyncio.all_tasks() if '_settle' in repr(task)]
+
+        async def first(cache, requirements):
+            async with resolve_iter(cache, requirements) as resolution:
+                async for result in resolution:
+                    return result, settling()
+
+        async def failing(cache):
+            try:
+                await self.collect(resolve_iter(cache, {'a': '^1', 'e': '*'}))
+            except LookupError:
+                return settling()
+
+        cache = MetadataCache(FakeRegistry(self.packages))
+        result, running = self.run_async(first(cache, {'a': '^1', 'c': '*'}))
+        self.assertIn(result, [('a', '1.1.0'), ('c', '0.2.0')])
+        self.assertTrue(running)
+        self.assertTrue(all(task.cancelled() or task.done() for task in running))
+        self.assertEqual(self.run_async(failing(cache)), [])
+        results = self.run_async(self.collect(resolve_iter(cache, {'a': '^1'})))
+        self.assertEqual(sorted((package, str(version)) for package, version in results), [
+            ('a', '1.1.0'), ('b', '1.3.0'), ('c', '0.1.5'), ('d', '1.0.0'),
+        ], msg='Cancelled resolutions should leave the cache usable')
+
+
+class AuditTestCase(unittest.TestCase):
+    def write_files(self, files):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name, content in files.items():
+            with open(os.path.join(directory.name, name), 'w') as f:
+                json.dump(content, f)
+        return directory.name
+
+    def assertFindings(self, report, expected):  # noqa: N802
+        findings = sorted((finding.kind, finding.parent, finding.package, finding.installed)
+                          for finding in report.findings)
+        self.assertEqual(findings, sorted(expected))
+
+    def test_lockfile_v2(self):
+        directory = self.write_files({'package-lock.json': {'lockfileVersion': 2, 'packages': {
+            '': {'dependencies': {'a': '^1.2.0', 'b': '~2.0.0', 'c': '>=1', 'd': 'github:x/d', 'e': '^1.0.0'},
+                 'devDependencies': {'f': '1.x'}, 'optionalDependencies': {'g': '^1.0.0'}},
+            'node_modules/a': {'version': '1.4.0', 'dependencies': {'b': '^1.0.0', 'h': '^1.0.0'}},
+            'node_modules/a/node_modules/b': {'version': '1.9.9'},
+            'node_modules/b': {'version': '2.1.0'},
+            'node_modules/c': {'version': '1.5.0-beta.1'},
+            'node_modules/d': {'version': '1.0.0'},
+            'node_modules/e': {'version': 'v1.2.3'},
+            'node_modules/f': {'link': True, 'resolved': 'packages/f'},
+            'packages/f': {'version': '1.0.0', 'dependencies': {'a': '^2.0.0'}},
+        }}})
+        report = audit.audit([directory])
+        self.assertEqual(report.files, 1)
+        self.assertEqual(report.dependencies, 10)
+        self.assertFindings(report, [
+            (audit.VIOLATION, '', 'b', '2.1.0'),
+            (audit.PRE_RELEASE, '', 'c', '1.5.0-beta.1'),
+            (audit.UNSUPPORTED, '', 'd', '1.0.0'),
+            (audit.LOOSE_MATCH, '', 'e', 'v1.2.3'),
+            (audit.MISSING, 'node_modules/a', 'h', None),
+            (audit.VIOLATION, 'packages/f', 'a', '1.4.0'),
+        ])
+
+    def test_lockfile_v1(self):
+        directory = self.write_files({
+            'package.json': {'dependencies': {'a': '^1.0.0', 'b': '^2.0.0'}},
+            'package-lock.json': {'lockfileVersion': 1, 'dependencies': {
+                'a': {'version': '1.0.0', 'requires': {'b': '^1.0.0'},
+                      'dependencies': {'b': {'version': '1.1.0', 'requires': {'c': '^3.0.0'}}}},
+                'b': {'version': '2.0.1'},
+                'c': {'version': '2.0.0'},
+            }},
+        })
+        report = audit.audit([os.path.join(directory, 'package.json')])
+        self.assertEqual(report.dependencies, 4)
+        self.assertFindings(report, [(audit.VIOLATION, 'node_modules/a/node_modules/b', 'c', '2.0.0')])
+
+    def test_batches_and_workers(self):
+        packages = {'': {'dependencies': dict(('p%d' % i, '^1.%d.0' % (i % 7)) for i in range(500))}}
+        for i in range(500):
+            packages['node_modules/p%d' % i] = {'version': '1.%d.0' % (i % 11)}
+        directory = self.write_files({'package-lock.json': {'lockfileVersion': 3, 'packages': packages}})
+        expected = sorted(audit.audit([directory]).findings)
+        self.assertEqual(len(expected), len([i for i in range(500) if i % 11 < i % 7]))
+        self.assertEqual(sorted(audit.audit([directory, directory], batch_size=64).findings), sorted(expected * 2))
+        self.assertEqual(sorted(audit.audit([directory], workers=2, batch_size=100).findings), expected)
+
+        interners = []
+
+        class Interner(audit.Interner):
+            def __init__(self):
+                super().__init__()
+                interners.append(self)
+
+        self.addCleanup(setattr, audit, 'Interner', audit.Interner)
+        audit.Interner = Interner
+        self.assertEqual(sorted(audit.audit([directory], batch_size=64).findings), expected)
+        self.assertEqual(len(interners), 1, msg='Batches should share parsed ranges and versions')
+
+    def test_pre_release(self):
+        interner = audit.Interner()
+        for declared, installed, kind in [
+            ('<1.2.0', '1.2.0-beta', audit.PRE_RELEASE),
+            ('>=1', '1.5.0-beta.1', audit.PRE_RELEASE),
+            ('^1.2.0', '1.4.0-rc.1+build', audit.PRE_RELEASE),
+            ('^1.2.0-alpha', '1.2.0-beta', None),
+            ('>=1.2.3', '1.2.3-rc.1', audit.VIOLATION),
+            ('^1.2.0', '1.1.0-beta', audit.VIOLATION),
+            ('1.2.0 || 2.x', '2.0.0-beta', audit.VIOLATION),
+            ('1.2.0 || >=2.0.0-0', '2.0.0-beta', None),
+        ]:
+            self.assertEqual(interner.classify(declared, installed), kind, msg='%s %s' % (declared, installed))
+
+
+class FuzzTestCase(unittest.TestCase):
+    def test_generators(self):
+        cases = [fuzz.random_case(random.Random(43)) for _ in range(2)]
+        self.assertEqual(cases[0], cases[1])
+        rng = random.Random(43)
+        versions = [fuzz.random_version(rng) for _ in range(200)]
+        self.assertEqual(parse_versions_many(versions)[1], [None] * 200)
+        patterns = [fuzz.random_range(rng) for _ in range(200)]
+        self.assertGreater(parse_ranges_many(patterns)[1].count(None), 150)
+
+    def test_engines_agree(self):
+        for engine in fuzz.ENGINES:
+            self.assertEqual(fuzz.run(iterations=150, seed=43, engines=[engine]), [])
+
+    def test_minimise(self):
+        def check(case):
+            if '^' in case.pattern and any('-' in version for version in case.versions):
+                return 'no pre-releases', case.versions
+
+        case = fuzz.Case('^1.0.0 >=0.1.0 || 2.x', ['1.0.0', '1.2.0-beta+build.5', '3.0.0'], True)
+        self.assertEqual(fuzz.minimise(check, case), fuzz.Case('^1.0.0', ['1.2.0-beta'], False))
+
 
 class CodeStyleTestCase(unittest.TestCase):
     def test_code_style(self):